@@ -0,0 +1,123 @@
+import atexit
+import os
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, update
+
+from models import db, User
+
+
+class ActivityTracker:
+    # Буферизует last_activity в памяти и пишет в БД одним UPDATE на пачку,
+    # вместо commit на каждый запрос.
+
+    def __init__(self, app=None):
+        self.app = None
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._seen = {}
+        self._requests = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._atexit = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('ACTIVITY_GRANULARITY', 60)
+        app.config.setdefault('ACTIVITY_FLUSH_INTERVAL', 30)
+        app.config.setdefault('ACTIVITY_FLUSH_THRESHOLD', 500)
+        self.granularity = timedelta(seconds=int(app.config['ACTIVITY_GRANULARITY']))
+        self.flush_interval = float(app.config['ACTIVITY_FLUSH_INTERVAL'])
+        self.flush_threshold = int(app.config['ACTIVITY_FLUSH_THRESHOLD'])
+        app.extensions['activity'] = self
+        if not self._atexit:
+            # Трекер один на процесс, приложений может быть несколько (тесты, CLI)
+            atexit.register(self.shutdown)
+            self._atexit = True
+
+    def touch(self, user_id, last_known=None):
+        now = datetime.utcnow()
+        with self._lock:
+            previous = self._seen.get(user_id, last_known)
+            if previous is not None and now - previous < self.granularity:
+                return
+            self._pending[user_id] = now
+            self._seen[user_id] = now
+            self._requests += 1
+            should_flush = self._requests >= self.flush_threshold
+        self._ensure_flusher()
+        if should_flush:
+            self.flush()
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            self._seen.clear()
+            self._requests = 0
+
+    def pending(self, user_id):
+        with self._lock:
+            return self._pending.get(user_id)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._requests = 0
+            cutoff = datetime.utcnow() - self.granularity
+            self._seen = {uid: ts for uid, ts in self._seen.items() if ts >= cutoff}
+        if not pending:
+            return 0
+        rows = [{'uid': uid, 'ts': ts} for uid, ts in pending.items()]
+        stmt = (
+            update(User.__table__)
+            .where(User.__table__.c.id == bindparam('uid'))
+            .values(last_activity=bindparam('ts'))
+        )
+        try:
+            with self.app.app_context():
+                with db.engine.begin() as conn:
+                    conn.execute(stmt, rows)
+        except Exception:
+            # Не теряем отметки: вернём их в буфер, если там нет более свежих
+            with self._lock:
+                for uid, ts in pending.items():
+                    self._pending.setdefault(uid, ts)
+            raise
+        return len(rows)
+
+    def _ensure_flusher(self):
+        # После fork (gunicorn --preload) поток родителя не наследуется
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='activity-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                if self.app is not None:
+                    self.app.logger.exception('Не удалось сохранить last_activity')
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout=self.flush_interval)
+        try:
+            self.flush()
+        except Exception:
+            if self.app is not None:
+                self.app.logger.exception('Не удалось сохранить last_activity при остановке')
+
+
+activity = ActivityTracker()
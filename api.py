@@ -0,0 +1,309 @@
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from functools import wraps
+
+from flask import Blueprint, abort, current_app, request
+from flask_login import current_user
+from werkzeug.exceptions import HTTPException
+
+from http_cache import conditional_page, catalog_validator, product_validator
+from models import db, Product, ProductCategory, CartItem, Order, OrderItem, from_minor_units
+from pagination import paginate
+from routing import reads_from_replica
+import cart_store
+import images
+import search_index
+import stock
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен; без него — стандартный json
+    orjson = None
+
+# JSON API для мобильного клиента и SPA: /api/v1/…. Запросы выбирают только
+# нужные столбцы (строки Row, без объектов ORM), ответ сериализуется сразу в
+# байты. ?fields=id,name,price — какие поля товара вернуть; списки
+# постраничные по курсору: next_cursor/prev_cursor → ?after=… / ?before=….
+# Каталог отдаёт ETag по тем же валидаторам, что и HTML-страницы (304 до
+# запросов к БД); корзина и заказы — ETag по телу ответа.
+
+blueprint = Blueprint('api', __name__, url_prefix='/api/v1')
+
+PRODUCT_FIELDS = {
+    'id': Product.id,
+    'name': Product.name,
+    'short_description': Product.short_description,
+    'long_description': Product.long_description,
+    'price': Product.price_cents,
+    'price_cents': Product.price_cents,
+    'category_id': Product.category_id,
+    'image_url': Product.image_url,
+    'seller_id': Product.seller_id,
+    'updated_at': Product.updated_at,
+}
+# В списках по умолчанию без длинного описания
+LIST_FIELDS = tuple(field for field in PRODUCT_FIELDS if field != 'long_description')
+
+
+def _price(cents):
+    return str(from_minor_units(cents))
+
+
+def _image(value):
+    return images.image_url(value, 'card') or None
+
+
+CONVERTERS = {'price': _price, 'image_url': _image}
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Неподдерживаемый тип в ответе API: {type(value).__name__}')
+
+
+def dumps(payload):
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=_default).encode()
+
+
+def _response(payload, status=200):
+    return current_app.response_class(dumps(payload), status=status, mimetype='application/json')
+
+
+def _private(payload):
+    # Корзина и заказы: только браузеру пользователя, 304 по хэшу тела
+    response = _response(payload)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
+
+
+def _not_personalized():
+    # Данные каталога в API одинаковы для всех пользователей
+    return False
+
+
+def _login_required(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_authenticated:
+            abort(401, description='Требуется вход.')
+        return view(*args, **kwargs)
+    return wrapper
+
+
+@blueprint.errorhandler(HTTPException)
+def _http_error(exc):
+    return _response({'error': {'status': exc.code, 'message': exc.description}}, exc.code)
+
+
+def _fields(default):
+    raw = request.args.get('fields')
+    if not raw:
+        return default
+    fields = tuple(dict.fromkeys(field.strip() for field in raw.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in PRODUCT_FIELDS]
+    if not fields or unknown:
+        abort(400, description=f"Неизвестные поля: {', '.join(unknown) or raw}. "
+                               f"Доступны: {', '.join(PRODUCT_FIELDS)}.")
+    return fields
+
+
+def _columns(fields):
+    # id выбирается всегда: это ключ курсора
+    return [PRODUCT_FIELDS[field].label(field) for field in dict.fromkeys(('id',) + fields)]
+
+
+def _items(rows, fields):
+    converters = [(field, CONVERTERS.get(field)) for field in fields]
+    items = []
+    for row in rows:
+        mapping = row._mapping
+        item = {}
+        for field, convert in converters:
+            value = mapping[field]
+            item[field] = convert(value) if convert is not None and value is not None else value
+        items.append(item)
+    return items
+
+
+def _page(page, fields):
+    return _response({
+        'items': _items(page.items, fields),
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+    })
+
+
+@blueprint.route('/categories')
+@reads_from_replica
+@conditional_page(catalog_validator, personalized=_not_personalized)
+def categories():
+    rows = (
+        db.session.query(ProductCategory.id, ProductCategory.name, ProductCategory.slug)
+        .order_by(ProductCategory.position, ProductCategory.id)
+    )
+    return _response({'items': [{'id': row.id, 'name': row.name, 'slug': row.slug} for row in rows]})
+
+
+@blueprint.route('/products')
+@reads_from_replica
+@conditional_page(catalog_validator, personalized=_not_personalized)
+def products():
+    # ?category=belts (slug или название), ?seller_id=…
+    fields = _fields(LIST_FIELDS)
+    query = db.session.query(*_columns(fields))
+    if request.args.get('category'):
+        value = request.args['category']
+        category_id = (
+            db.session.query(ProductCategory.id)
+            .filter((ProductCategory.name == value) | (ProductCategory.slug == value))
+            .scalar()
+        )
+        if category_id is None:
+            abort(404, description='Категория не найдена.')
+        query = query.filter(Product.category_id == category_id)
+    seller_id = request.args.get('seller_id')
+    if seller_id is not None:
+        if not seller_id.isdecimal():
+            abort(400, description='seller_id: требуется целое число.')
+        query = query.filter(Product.seller_id == int(seller_id))
+    return _page(paginate(query, (Product.id,)), fields)
+
+
+@blueprint.route('/products/<int:product_id>')
+@reads_from_replica
+@conditional_page(product_validator, personalized=_not_personalized)
+def product(product_id):
+    fields = _fields(tuple(PRODUCT_FIELDS))
+    row = db.session.query(*_columns(fields)).filter(Product.id == product_id).first()
+    if row is None:
+        abort(404, description='Товар не найден.')
+    return _response(_items([row], fields)[0])
+
+
+@blueprint.route('/search')
+@reads_from_replica
+@conditional_page(catalog_validator, personalized=_not_personalized)
+def search():
+    fields = _fields(LIST_FIELDS)
+    query = request.args.get('q', '').strip()
+    return _page(search_index.search_products(query, columns=_columns(fields)), fields)
+
+
+def _cart_payload(user_id):
+    now = datetime.utcnow()
+    rows = (
+        db.session.query(
+            CartItem.product_id, CartItem.quantity, CartItem.reserved, CartItem.reserved_until,
+            Product.name, Product.price_cents,
+        )
+        .join(Product, Product.id == CartItem.product_id)
+        .filter(CartItem.user_id == user_id)
+        .order_by(CartItem.added_at, Product.id)
+        .all()
+    )
+    items = []
+    total = 0
+    for row in rows:
+        reserved = row.reserved > 0 and row.reserved_until is not None and row.reserved_until > now
+        items.append({
+            'product_id': row.product_id,
+            'name': row.name,
+            'price': _price(row.price_cents or 0),
+            'quantity': row.quantity,
+            'reserved_until': row.reserved_until if reserved else None,
+        })
+        total += (row.price_cents or 0) * row.quantity
+    return {'items': items, 'total': _price(total)}
+
+
+@blueprint.route('/cart')
+@reads_from_replica
+@_login_required
+def cart():
+    return _private(_cart_payload(current_user.id))
+
+
+@blueprint.route('/cart/items', methods=['POST'])
+@_login_required
+def add_cart_item():
+    # {"product_id": 1, "quantity": 2}; только JSON, так что чужой сайт
+    # не отправит его без CORS-preflight
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        abort(400, description='Ожидается JSON-объект.')
+    product_id, quantity = data.get('product_id'), data.get('quantity', 1)
+    if not isinstance(product_id, int) or not isinstance(quantity, int) or not 1 <= quantity <= 100:
+        abort(400, description='Нужны целые product_id и quantity от 1 до 100.')
+    row = db.session.query(Product.id, Product.name, Product.stock).filter(Product.id == product_id).first()
+    if row is None:
+        abort(404, description='Товар не найден.')
+    try:
+        stock.reserve(current_user.id, row, quantity)
+    except stock.OutOfStock:
+        db.session.rollback()
+        abort(409, description=f'Товара «{row.name}» не хватает.')
+    db.session.commit()
+    return _private(_cart_payload(current_user.id))
+
+
+@blueprint.route('/cart/items/<int:product_id>', methods=['DELETE'])
+@_login_required
+def remove_cart_item(product_id):
+    # Как /remove_from_cart: убирает одну единицу товара
+    stock.release_one(current_user.id, product_id)
+    if not cart_store.remove(current_user.id, product_id):
+        db.session.rollback()
+        abort(404, description='Товара нет в корзине.')
+    db.session.commit()
+    return _private(_cart_payload(current_user.id))
+
+
+@blueprint.route('/orders')
+@_login_required
+def orders():
+    # Заказы пользователя, новые сверху; позиции всех заказов страницы — одним запросом
+    page = paginate(
+        db.session.query(Order.id, Order.created_at, Order.address, Order.phone, Order.size, Order.email)
+        .filter(Order.user_id == current_user.id),
+        (Order.created_at, Order.id),
+        descending=True,
+    )
+    lines = {row.id: [] for row in page.items}
+    if lines:
+        rows = (
+            db.session.query(OrderItem.order_id, OrderItem.product_id, OrderItem.quantity,
+                             OrderItem.price_cents, Product.name)
+            .outerjoin(Product, Product.id == OrderItem.product_id)
+            .filter(OrderItem.order_id.in_(lines))
+            .order_by(OrderItem.id)
+        )
+        for row in rows:
+            lines[row.order_id].append(row)
+    items = []
+    for order in page.items:
+        items.append({
+            'id': order.id,
+            'created_at': order.created_at,
+            'address': order.address,
+            'phone': order.phone,
+            'size': order.size,
+            'email': order.email,
+            'items': [
+                {'product_id': line.product_id, 'name': line.name, 'quantity': line.quantity,
+                 'price': _price(line.price_cents or 0)}
+                for line in lines[order.id]
+            ],
+            'total': _price(sum((line.price_cents or 0) * line.quantity for line in lines[order.id])),
+        })
+    return _private({'items': items, 'next_cursor': page.next_cursor, 'prev_cursor': page.prev_cursor})
+
+
+def init_app(app):
+    app.register_blueprint(blueprint)
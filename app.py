@@ -1,32 +1,117 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, abort
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_login import LoginManager, login_user, login_required, logout_user, current_user
-from flask_mail import Mail, Message
-from models import db, User, Product, Order
-from forms import ProductForm
-from datetime import datetime
+from models import db, User, Product, Order, OrderItem
+from activity import activity
+from identity import identity_cache
+from catalog import catalog, find_category
+from pagination import paginate
+import querycount
+import database
+from orders import place_order
+import cart_store
+import images
+import static_assets
+from fragments import fragments
+from instrumentation import metrics, timed
+import http_cache
+from http_cache import conditional_page, catalog_validator, product_validator
+from routing import reads_from_replica
+from mail_queue import mail_queue
+import search_index
+from suggest import suggestions
+import synthetic
+import product_import
+import passwords
+import sales
+import stock
+import api
+import query_plans
+import startup
+from forms import ProductForm, EditProductForm, ProductImportForm
 from dotenv import load_dotenv
 from sqlalchemy.exc import IntegrityError
-from werkzeug.utils import secure_filename
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload, selectinload
 
 load_dotenv()
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///your_database.db'
+    database.configure(app)
     app.config['MAIL_SERVER'] = os.getenv('MAIL_SERVER')
-    app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT'))
+    app.config['MAIL_PORT'] = int(os.getenv('MAIL_PORT', 25))
     app.config['MAIL_USE_TLS'] = os.getenv('MAIL_USE_TLS') == 'True'
     app.config['MAIL_USERNAME'] = os.getenv('MAIL_USERNAME')
     app.config['MAIL_PASSWORD'] = os.getenv('MAIL_PASSWORD')
-    app.config['UPLOAD_FOLDER'] = os.path.join('static', 'uploads')
+    app.config['UPLOAD_FOLDER'] = os.path.join(app.static_folder, 'uploads')
+    app.config['IMAGE_WORKERS'] = int(os.getenv('IMAGE_WORKERS', 2))
+    app.config['IMAGE_MISSING_TTL'] = float(os.getenv('IMAGE_MISSING_TTL', 30))
+    app.config['FRAGMENT_CACHE_SIZE'] = int(os.getenv('FRAGMENT_CACHE_SIZE', 2048))
+    app.config['FRAGMENT_CACHE_URL'] = os.getenv('FRAGMENT_CACHE_URL')  # redis://… — общий кэш
+    app.config['STATIC_OFFLOAD'] = os.getenv('STATIC_OFFLOAD')  # x-accel / x-sendfile
+    app.config['STATIC_ACCEL_PREFIX'] = os.getenv('STATIC_ACCEL_PREFIX', '/protected/')
+    app.config['MAIL_QUEUE_WORKERS'] = int(os.getenv('MAIL_QUEUE_WORKERS', 2))
+    app.config['MAIL_QUEUE_BATCH_SIZE'] = int(os.getenv('MAIL_QUEUE_BATCH_SIZE', 20))
+    app.config['MAIL_QUEUE_MAX_ATTEMPTS'] = int(os.getenv('MAIL_QUEUE_MAX_ATTEMPTS', 6))
+    app.config['MAIL_QUEUE_BACKOFF'] = int(os.getenv('MAIL_QUEUE_BACKOFF', 30))
+    app.config['CATALOG_CATEGORY_LIMIT'] = int(os.getenv('CATALOG_CATEGORY_LIMIT', 12))
+    app.config['HTTP_CACHE_S_MAXAGE'] = int(os.getenv('HTTP_CACHE_S_MAXAGE', 60))
+    app.config['HTTP_CACHE_SWR'] = int(os.getenv('HTTP_CACHE_SWR', 300))
+    app.config['CATALOG_STATE_TTL'] = float(os.getenv('CATALOG_STATE_TTL', 2))
+    app.config['QUERY_BUDGET'] = int(os.getenv('QUERY_BUDGET')) if os.getenv('QUERY_BUDGET') else None
+    app.config['QUERY_BUDGETS'] = querycount.parse_budgets(os.getenv('QUERY_BUDGETS', ''))
+    app.config['ACTIVITY_GRANULARITY'] = int(os.getenv('ACTIVITY_GRANULARITY', 60))
+    app.config['ACTIVITY_FLUSH_INTERVAL'] = float(os.getenv('ACTIVITY_FLUSH_INTERVAL', 30))
+    app.config['ACTIVITY_FLUSH_THRESHOLD'] = int(os.getenv('ACTIVITY_FLUSH_THRESHOLD', 500))
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED') == '1'
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    app.config['PROFILE_SLOW_MS'] = int(os.getenv('PROFILE_SLOW_MS', 500))
+    app.config['PROFILE_DIR'] = os.getenv('PROFILE_DIR')
+    app.config['PASSWORD_HASH_METHOD'] = os.getenv('PASSWORD_HASH_METHOD', passwords.DEFAULT_METHOD)
+    app.config['ARGON2_TIME_COST'] = int(os.getenv('ARGON2_TIME_COST', 2))
+    app.config['ARGON2_MEMORY_COST'] = int(os.getenv('ARGON2_MEMORY_COST', 19456))
+    app.config['ARGON2_PARALLELISM'] = int(os.getenv('ARGON2_PARALLELISM', 1))
+    app.config['PASSWORD_POOL'] = os.getenv('PASSWORD_POOL', 'thread')
+    app.config['PASSWORD_WORKERS'] = int(os.getenv('PASSWORD_WORKERS', 2))
+    app.config['PASSWORD_MAX_PENDING'] = int(os.getenv('PASSWORD_MAX_PENDING', 16))
+    app.config['LOGIN_RATE_IP'] = os.getenv('LOGIN_RATE_IP', '20/60')
+    app.config['LOGIN_RATE_EMAIL'] = os.getenv('LOGIN_RATE_EMAIL', '5/300')
+    app.config['JINJA_CACHE_DIR'] = os.getenv('JINJA_CACHE_DIR', os.path.join(app.instance_path, 'jinja_cache'))
+    app.config['TEMPLATE_WARMUP'] = os.getenv('TEMPLATE_WARMUP', '1') == '1'
+    app.config['SUGGEST_LIMIT'] = int(os.getenv('SUGGEST_LIMIT', 10))
+    app.config['SUGGEST_SCAN'] = int(os.getenv('SUGGEST_SCAN', 300))
+    app.config['SUGGEST_MAX_NAMES'] = int(os.getenv('SUGGEST_MAX_NAMES', 200_000))
+    app.config['SUGGEST_REFRESH_SECONDS'] = float(os.getenv('SUGGEST_REFRESH_SECONDS', 10))
+    app.config['SUGGEST_WARMUP'] = os.getenv('SUGGEST_WARMUP', '1') == '1'
+    app.config['CART_RESERVATION_TTL'] = int(os.getenv('CART_RESERVATION_TTL', 900))
+    if config:
+        app.config.update(config)  # Тесты и скрипты: поверх окружения, до init_app расширений
 
     db.init_app(app)
-    migrate = Migrate(app, db)
-    mail = Mail(app)
+    database.init_app(app)
+    querycount.init_app(app)
+    metrics.init_app(app)
+    passwords.init_app(app)
+    sales.init_app(app)
+    stock.init_app(app)
+    activity.init_app(app)
+    identity_cache.init_app(app)
+    search_index.init_app(app)
+    suggestions.init_app(app)
+    synthetic.init_app(app)
+    product_import.init_app(app)
+    query_plans.init_app(app)
+    startup.init_app(app)  # flask db … и Flask-Mail подключаются при первом использовании
+    mail_queue.init_app(app)
+    images.init_app(app)
+    static_assets.init_app(app)
+    fragments.init_app(app)
+    http_cache.init_app(app)
+    api.init_app(app)
 
     login_manager = LoginManager(app)
     login_manager.login_view = 'login'
@@ -35,7 +120,8 @@ def create_app():
 
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        # Снимок из кэша (id, username, email, role); ORM-строка — current_user.load()
+        return identity_cache.get(int(user_id))
 
     @app.cli.command('init-db')
     def init_db():
@@ -50,9 +136,18 @@ def create_app():
 
     @app.before_request
     def update_last_activity():
+        if static_assets.is_static_request():
+            return
         if current_user.is_authenticated:
-            current_user.last_activity = datetime.utcnow()
-            db.session.commit()
+            activity.touch(current_user.id, current_user.last_activity)
+
+    @app.before_request
+    def migrate_session_cart():
+        # Корзины из старых cookie-сессий переносим в БД при первом запросе
+        if static_assets.is_static_request():
+            return
+        if 'cart' in session and current_user.is_authenticated:
+            cart_store.merge_session_cart(current_user.id, session)
 
     @app.route('/admin_dashboard')
     @login_required
@@ -60,9 +155,19 @@ def create_app():
         if current_user.role != 'admin':
             flash('У вас нет доступа к этой странице.', 'danger')
             return redirect(url_for('index'))
-        users = User.query.all()
-        products = Product.query.all()
-        return render_template('admin_dashboard.html', users=users, products=products)
+        activity.flush()
+        users = paginate(User.query, (User.id,), prefix='users_')
+        products = paginate(Product.query.options(joinedload(Product.seller)), (Product.id,), prefix='products_')
+        summary = sales.shop_summary(app.config['SALES_DASHBOARD_DAYS'])
+        return render_template('admin_dashboard.html', users=users, products=products, sales=summary)
+
+    @app.route('/admin/fragment_cache')
+    @login_required
+    def fragment_cache_stats():
+        if current_user.role != 'admin':
+            flash('У вас нет доступа к этой странице.', 'danger')
+            return redirect(url_for('index'))
+        return jsonify(fragments.stats())
 
     @app.route('/edit_user/<int:user_id>', methods=['GET', 'POST'])
     @login_required
@@ -76,6 +181,7 @@ def create_app():
             user.email = request.form['email']
             user.role = request.form['role']
             db.session.commit()
+            identity_cache.invalidate(user.id)
             flash('Данные пользователя обновлены', 'success')
             return redirect(url_for('admin_dashboard'))
         return render_template('edit_user.html', user=user)
@@ -89,6 +195,7 @@ def create_app():
         user = User.query.get_or_404(user_id)
         db.session.delete(user)
         db.session.commit()
+        identity_cache.invalidate(user_id)
         flash('Пользователь удален', 'danger')
         return redirect(url_for('admin_dashboard'))
 
@@ -101,23 +208,21 @@ def create_app():
         product = Product.query.get_or_404(product_id)
         db.session.delete(product)
         db.session.commit()
+        catalog.invalidate()
+        fragments.invalidate(product_id)
         flash('Товар удален', 'danger')
         return redirect(url_for('admin_dashboard'))
 
     @app.route('/')
+    @reads_from_replica
+    @conditional_page(catalog_validator)
     def index():
         if current_user.is_authenticated and current_user.role == 'seller':
-            tshirts = Product.query.filter_by(category='Футболки', seller_id=current_user.id).all()
-            belts = Product.query.filter_by(category='Ремни', seller_id=current_user.id).all()
-            watches = Product.query.filter_by(category='Часы', seller_id=current_user.id).all()
-            bags = Product.query.filter_by(category='Сумки', seller_id=current_user.id).all()
-            return render_template('index.html', tshirts=tshirts, belts=belts, watches=watches, bags=bags, is_seller=True)
+            listing = catalog.listing(seller_id=current_user.id)
+            return render_template('index.html', listing=listing, is_seller=True)
         else:
-            tshirts = Product.query.filter_by(category='Футболки').all()
-            belts = Product.query.filter_by(category='Ремни').all()
-            watches = Product.query.filter_by(category='Часы').all()
-            bags = Product.query.filter_by(category='Сумки').all()
-            return render_template('index.html', tshirts=tshirts, belts=belts, watches=watches, bags=bags, is_seller=False)
+            listing = catalog.listing()
+            return render_template('index.html', listing=listing, is_seller=False)
 
     @app.route('/register', methods=['GET', 'POST'])
     def register():
@@ -144,12 +249,29 @@ def create_app():
         if request.method == 'POST':
             email = request.form['email']
             password = request.form['password']
+            wait = passwords.throttle.check(request.remote_addr, email)
+            if wait:
+                flash(f'Слишком много попыток входа. Повторите через {int(wait) + 1} с.', 'danger')
+                response = app.make_response((render_template('login.html'), 429))
+                response.headers['Retry-After'] = str(int(wait) + 1)
+                return response
             user = User.query.filter_by(email=email).first()
-            if user and user.check_password(password):
+            try:
+                with timed('password'):
+                    valid = passwords.authenticate(user, password)
+            except passwords.PasswordPoolBusy:
+                flash('Сервер перегружен, попробуйте войти чуть позже.', 'danger')
+                response = app.make_response((render_template('login.html'), 503))
+                response.headers['Retry-After'] = '1'
+                return response
+            if valid:
+                db.session.commit()  # Сохраняет хэш, пересчитанный с текущими параметрами
+                passwords.throttle.succeeded(email)
                 login_user(user)
                 flash('Вы успешно вошли в систему.', 'success')
                 return redirect(url_for('index'))
             else:
+                passwords.throttle.failed(email)
                 flash('Неверный логин или пароль.', 'danger')
         return render_template('login.html')
 
@@ -164,64 +286,91 @@ def create_app():
     @login_required
     def edit_profile():
         if request.method == 'POST':
-            current_user.username = request.form['username']
-            current_user.email = request.form['email']
+            user = current_user.load()
+            user.username = request.form['username']
+            user.email = request.form['email']
             if request.form['password']:
-                current_user.set_password(request.form['password'])
+                user.set_password(request.form['password'])
             db.session.commit()
+            identity_cache.invalidate(user.id)
             flash('Ваш профиль был обновлен', 'success')
             return redirect(url_for('edit_profile'))
         return render_template('edit_profile.html')
 
     @app.route('/search', methods=['GET'])
+    @reads_from_replica
+    @conditional_page(catalog_validator)
     def search():
-        query = request.args.get('q')
-        products = Product.query.filter(Product.name.contains(query) | Product.short_description.contains(query)).all()
-        return render_template('search_results.html', products=products)
+        query = request.args.get('q', '').strip()
+        products = search_index.search_products(query)
+        return render_template('search_results.html', products=products, query=query)
+
+    @app.route('/search/suggest')
+    def search_suggest():
+        # Подсказки для строки поиска: индекс в памяти процесса, без запросов к БД
+        query = request.args.get('q', '').strip()[:100]
+        limit = min(request.args.get('limit', app.config['SUGGEST_LIMIT'], type=int), 50)
+        results = suggestions.suggest(query, max(limit, 1)) if query else []
+        return jsonify(query=query, suggestions=[{'name': name, 'count': count} for name, count in results])
+
+    @app.route('/category/<name>')
+    @reads_from_replica
+    @conditional_page(lambda name: catalog_validator())
+    def category(name):
+        category_row = find_category(name)
+        if category_row is None:
+            abort(404)
+        products = paginate(Product.query.filter_by(category_id=category_row.id), (Product.id,))
+        return render_template('category.html', category=category_row.name, products=products)
 
     @app.route('/product/<int:product_id>')
+    @reads_from_replica
+    @conditional_page(product_validator)
     def product_detail(product_id):
         product = Product.query.get_or_404(product_id)
         return render_template('product_detail.html', product=product)
 
     @app.route('/uploads/<path:filename>')
     def uploaded_file(filename):
-        return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+        return static_assets.serve(app.config['UPLOAD_FOLDER'], filename)
 
     @app.route('/add_to_cart/<int:product_id>', methods=['POST'])
     @login_required
     def add_to_cart(product_id):
         product = Product.query.get_or_404(product_id)
-        cart = session.get('cart', [])
-        cart.append(product_id)
-        session['cart'] = cart
+        try:
+            stock.reserve(current_user.id, product)
+        except stock.OutOfStock:
+            db.session.rollback()
+            flash('Этот товар закончился.', 'danger')
+            return redirect(url_for('product_detail', product_id=product_id))
+        db.session.commit()
         flash('Товар добавлен в корзину.', 'success')
         return redirect(url_for('cart'))
 
     @app.route('/remove_from_cart/<int:product_id>')
     @login_required
     def remove_from_cart(product_id):
-        cart = session.get('cart', [])
-        if product_id in cart:
-            cart.remove(product_id)
-            session['cart'] = cart
+        stock.release_one(current_user.id, product_id)
+        if cart_store.remove(current_user.id, product_id):
+            db.session.commit()
             flash('Товар удален из корзины.', 'success')
         else:
             flash('Товар не найден в корзине.', 'danger')
         return redirect(url_for('cart'))
 
     @app.route('/cart')
+    @reads_from_replica
     @login_required
     def cart():
-        cart = session.get('cart', [])
-        products = Product.query.filter(Product.id.in_(cart)).all() if cart else []
-        return render_template('cart.html', products=products)
+        lines = cart_store.lines(current_user.id)
+        reservations = stock.reservations(current_user.id)
+        return render_template('cart.html', lines=lines, reservations=reservations)
 
     @app.route('/checkout', methods=['GET', 'POST'])
     @login_required
     def checkout():
-        cart = session.get('cart', [])
-        products = Product.query.filter(Product.id.in_(cart)).all() if cart else []
+        lines = cart_store.lines(current_user.id)
 
         if request.method == 'POST':
             size = request.form['size']
@@ -229,28 +378,28 @@ def create_app():
             phone = request.form['phone']
             email = request.form['email']  # Email покупателя
 
-            for product in products:
-                new_order = Order(
-                    product_id=product.id,
-                    user_id=current_user.id,
-                    address=address,
-                    phone=phone,
-                    size=size,
-                    email=email
-                )
-                db.session.add(new_order)
-                db.session.commit()
-
-            # Отправка подтверждающего письма
-            msg = Message('Подтверждение заказа', sender=app.config['MAIL_USERNAME'], recipients=[email])
-            msg.body = f'Ваш заказ на {len(products)} товаров успешно оформлен.\n\nАдрес доставки: {address}\nНомер телефона: {phone}\nРазмер: {size}\n\nСпасибо за ваш заказ!'
-            mail.send(msg)
+            try:
+                quantities = {product.id: quantity for product, quantity in lines}
+                order = place_order(current_user.id, quantities, address, phone, size, email)
+            except stock.OutOfStock as exc:
+                names = {product.id: product.name for product, quantity in lines}
+                flash(f'Товара «{names.get(exc.product_id, exc.product_id)}» не хватает для заказа. '
+                      'Уменьшите количество в корзине.', 'danger')
+                return redirect(url_for('cart'))
+            except SQLAlchemyError:
+                flash('Не удалось оформить заказ. Попробуйте ещё раз.', 'danger')
+                return redirect(url_for('checkout'))
+            if order is None:
+                flash('В вашей корзине нет товаров для оформления заказа.', 'danger')
+                return redirect(url_for('cart'))
+
+            # Подтверждающее письмо уже в очереди; отправители доставят его в фоне
+            mail_queue.notify()
 
             flash('Ваш заказ успешно оформлен. Подтверждение отправлено на ваш email.', 'success')
-            session.pop('cart', None)
             return redirect(url_for('my_orders'))
 
-        return render_template('checkout.html', products=products)
+        return render_template('checkout.html', lines=lines)
 
     @app.route('/my_orders')
     @login_required
@@ -258,7 +407,11 @@ def create_app():
         if current_user.role != 'buyer':
             flash('У вас нет доступа к этой странице.', 'danger')
             return redirect(url_for('index'))
-        orders = Order.query.filter_by(user_id=current_user.id).all()
+        orders = paginate(
+            Order.query.options(selectinload(Order.items).joinedload(OrderItem.product)).filter_by(user_id=current_user.id),
+            (Order.created_at, Order.id),
+            descending=True,
+        )
         return render_template('my_orders.html', orders=orders)
 
     @app.route('/cancel_order/<int:order_id>', methods=['POST'])
@@ -268,6 +421,8 @@ def create_app():
         if order.user_id != current_user.id:
             flash('У вас нет прав на отмену этого заказа.', 'danger')
             return redirect(url_for('my_orders'))
+        sales.forget_order(order.id)
+        stock.restore(order.id)
         db.session.delete(order)
         db.session.commit()
         flash('Заказ успешно отменён.', 'success')
@@ -279,8 +434,11 @@ def create_app():
         if current_user.role != 'seller':
             flash('У вас нет доступа к этой странице.', 'danger')
             return redirect(url_for('index'))
-        products = Product.query.filter_by(seller_id=current_user.id).all()
-        return render_template('seller_dashboard.html', products=products)
+        products = paginate(
+            Product.query.options(joinedload(Product.category_ref)).filter_by(seller_id=current_user.id), (Product.id,)
+        )
+        summary = sales.seller_summary(current_user.id, app.config['SALES_DASHBOARD_DAYS'])
+        return render_template('seller_dashboard.html', products=products, sales=summary)
 
     @app.route('/my_products')
     @login_required
@@ -288,13 +446,30 @@ def create_app():
         if current_user.role != 'seller':
             flash('У вас нет доступа к этой странице.', 'danger')
             return redirect(url_for('index'))
-        products = Product.query.filter_by(seller_id=current_user.id).all()
+        products = paginate(
+            Product.query.options(joinedload(Product.category_ref)).filter_by(seller_id=current_user.id), (Product.id,)
+        )
         return render_template('my_products.html', products=products)
 
-    def ensure_upload_folder_exists(filepath):
-        directory = os.path.dirname(filepath)
-        if not os.path.exists(directory):
-            os.makedirs(directory)
+    @app.route('/import_products', methods=['GET', 'POST'])
+    @login_required
+    def import_products():
+        if current_user.role != 'seller':
+            flash('У вас нет доступа к этой странице.', 'danger')
+            return redirect(url_for('index'))
+        form = ProductImportForm()
+        report = None
+        if form.validate_on_submit():
+            upload = form.file.data
+            fmt = product_import.detect_format(upload.filename)
+            if fmt is None:
+                flash('Поддерживаются файлы .csv и .jsonl.', 'danger')
+                return render_template('import_products.html', form=form, report=None)
+            report = product_import.import_products(
+                upload.stream, current_user.id, fmt, form.category.data or None,
+                chunk_size=app.config['PRODUCT_IMPORT_CHUNK_SIZE'],
+            )
+        return render_template('import_products.html', form=form, report=report)
 
     @app.route('/add_product/<category>', methods=['GET', 'POST'])
     @login_required
@@ -302,25 +477,32 @@ def create_app():
         if current_user.role != 'seller':
             flash('У вас нет доступа к этой странице.', 'danger')
             return redirect(url_for('index'))
+        category_row = find_category(category)
+        if category_row is None:
+            abort(404)
         form = ProductForm()
         if form.validate_on_submit():
-            filename = secure_filename(form.image.data.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            form.image.data.save(filepath)
+            try:
+                image_path = images.store_upload(form.image.data)
+            except images.InvalidImage as exc:
+                flash(str(exc), 'danger')
+                return render_template('add_product.html', form=form, category=category_row.name)
             product = Product(
                 name=form.name.data,
                 short_description=form.short_description.data,
                 long_description=form.long_description.data,
                 price=form.price.data,
-                category=category,
-                image_url=filename,  # Сохраняем только имя файла
+                stock=form.stock.data,
+                category_id=category_row.id,
+                image_url=image_path,  # Путь от static/, имя файла — хэш содержимого
                 seller_id=current_user.id
             )
             db.session.add(product)
             db.session.commit()
+            catalog.invalidate()
             flash('Товар успешно добавлен.', 'success')
             return redirect(url_for('index'))
-        return render_template('add_product.html', form=form, category=category)
+        return render_template('add_product.html', form=form, category=category_row.name)
 
     @app.route('/edit_product/<int:product_id>', methods=['GET', 'POST'])
     @login_required
@@ -330,15 +512,24 @@ def create_app():
             flash('У вас нет прав на редактирование этого товара.', 'danger')
             return redirect(url_for('my_products'))
 
-        form = ProductForm(obj=product)
+        form = EditProductForm(obj=product, stock_seen=product.stock)
         if form.validate_on_submit():
             form.populate_obj(product)
             if form.image.data:
-                filename = secure_filename(form.image.data.filename)
-                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                form.image.data.save(filepath)
-                product.image_url = filename  # Сохраняем только имя файла
+                try:
+                    product.image_url = images.store_upload(form.image.data)  # Путь от static/, имя файла — хэш содержимого
+                except images.InvalidImage as exc:
+                    db.session.rollback()
+                    flash(str(exc), 'danger')
+                    return render_template('edit_product.html', form=form, product=product)
+            if not stock.adjust(product.id, form.stock_seen.data, form.stock.data):
+                db.session.rollback()
+                form.stock.data = form.stock_seen.data = product.stock
+                flash('Остаток изменился, пока вы редактировали товар. Проверьте новое значение и сохраните ещё раз.', 'danger')
+                return render_template('edit_product.html', form=form, product=product)
             db.session.commit()
+            catalog.invalidate()
+            fragments.invalidate(product.id)
             flash('Товар успешно обновлен.', 'success')
             return redirect(url_for('my_products'))
         return render_template('edit_product.html', form=form, product=product)
@@ -353,6 +544,8 @@ def create_app():
 
         db.session.delete(product)
         db.session.commit()
+        catalog.invalidate()
+        fragments.invalidate(product_id)
         flash('Товар успешно удален.', 'success')
         return redirect(url_for('my_products'))
 
@@ -364,6 +557,8 @@ def create_app():
             return redirect(url_for('index'))
         return render_template('buyer_dashboard.html')
 
+    startup.warmup(app)
+    suggestions.warmup(app)
     return app
 
 if __name__ == '__main__':
@@ -0,0 +1,116 @@
+# JSON API против HTML-страниц на одних и тех же данных: пропускная
+# способность и размер ответа по парам маршрутов (страница категории и
+# /api/v1/products?category=…, товар, поиск, корзина, заказы). Запросы идут
+# через тестовый клиент от вошедшего покупателя, без If-None-Match — каждый
+# ответ строится заново. --encoder json — без orjson (стандартный json).
+#
+#   python benchmarks/api_benchmark.py --products 20000 --requests 300
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SEARCH_TERMS = ['ремень', 'кожан', 'часы', 'сумка', 'футболка', 'рюкзак', 'ёмкий', 'винтажн']
+
+
+def pairs(rng, product_ids, categories):
+    # (название, HTML-адрес, адрес API) — генераторы, каждый вызов даёт новую пару
+    def category():
+        name, slug = rng.choice(categories)
+        return '/category/' + urllib.parse.quote(name), '/api/v1/products?category=' + slug
+
+    def product():
+        product_id = rng.choice(product_ids)
+        return f'/product/{product_id}', f'/api/v1/products/{product_id}'
+
+    def search():
+        query = urllib.parse.urlencode({'q': rng.choice(SEARCH_TERMS)})
+        return '/search?' + query, '/api/v1/search?' + query
+
+    return [
+        ('категория', category),
+        ('товар', product),
+        ('поиск', search),
+        ('корзина', lambda: ('/cart', '/api/v1/cart')),
+        ('заказы', lambda: ('/my_orders', '/api/v1/orders')),
+    ]
+
+
+def measure(client, urls):
+    timings = []
+    size = 0
+    for url in urls:
+        started = time.perf_counter()
+        response = client.get(url)
+        body = response.get_data()
+        timings.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            sys.exit(f'{url}: HTTP {response.status_code}')
+        size += len(body)
+    return len(urls) / sum(timings), statistics.median(timings) * 1000, size / len(urls)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--orders', type=int, default=5000)
+    parser.add_argument('--requests', type=int, default=300, help='запросов на маршрут')
+    parser.add_argument('--encoder', choices=['orjson', 'json'], default='orjson')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='api-benchmark-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ.update(MAIL_QUEUE_WORKERS='0', SUGGEST_WARMUP='0')
+
+    from app import create_app
+    from catalog import CATEGORIES
+    from models import db, User, Product, Order
+    import api
+    import cart_store
+    import synthetic
+
+    if args.encoder == 'json':
+        api.orjson = None
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        synthetic.generate(users=200, sellers=20, products=args.products, orders=args.orders, seed=args.seed)
+        product_ids = [product_id for product_id, in db.session.query(Product.id)]
+        # Покупатель с самым большим числом заказов и корзиной из пяти товаров
+        buyer_id = (
+            db.session.query(Order.user_id).group_by(Order.user_id)
+            .order_by(db.func.count().desc()).limit(1).scalar()
+        )
+        for product_id in product_ids[:5]:
+            cart_store.add(buyer_id, product_id)
+        db.session.commit()
+        buyer = db.session.get(User, buyer_id)
+
+    client = app.test_client()
+    client.post('/login', data={'email': buyer.email, 'password': synthetic.SYNTHETIC_PASSWORD})
+    rng = random.Random(args.seed)
+    categories = [(category.name, category.slug) for category in CATEGORIES]
+
+    print(f'{args.products} товаров, {args.requests} запросов на маршрут, JSON: {args.encoder}')
+    print(f'{"маршрут":10} {"HTML req/s":>11} {"API req/s":>10} {"ускорение":>10} '
+          f'{"HTML p50":>9} {"API p50":>8} {"HTML, Б":>8} {"API, Б":>7}')
+    for label, make in pairs(rng, product_ids, categories):
+        html_urls, api_urls = zip(*(make() for _ in range(args.requests)))
+        measure(client, html_urls[:20] + api_urls[:20])  # Прогрев шаблонов и кэшей
+        html_rps, html_p50, html_size = measure(client, html_urls)
+        api_rps, api_p50, api_size = measure(client, api_urls)
+        print(f'{label:10} {html_rps:>11.0f} {api_rps:>10.0f} {api_rps / html_rps:>9.1f}x '
+              f'{html_p50:>8.2f}ms {api_p50:>6.2f}ms {html_size:>8.0f} {api_size:>7.0f}')
+
+
+if __name__ == '__main__':
+    main()
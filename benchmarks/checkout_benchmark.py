@@ -0,0 +1,83 @@
+# Задержка оформления заказа в зависимости от размера корзины:
+# прежний вариант (commit на каждый товар) против одной транзакции.
+#
+#   python benchmarks/checkout_benchmark.py --sizes 1 5 20 50
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from models import db, User, Product, Order, OrderItem
+from cart_store import cart_quantities
+from orders import place_order
+
+ORDER_FIELDS = dict(address='Москва, ул. Ленина, 1', phone='+79991234567', size='M', email='buyer@example.com')
+
+
+def make_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + path
+    db.init_app(app)
+    return app
+
+
+def per_item_checkout(user_id, quantities):
+    # Так работал checkout() раньше: отдельный заказ и commit на каждую позицию
+    for product_id in quantities:
+        order = Order(user_id=user_id, **ORDER_FIELDS)
+        order.items.append(OrderItem(product_id=product_id, quantity=1))
+        db.session.add(order)
+        db.session.commit()
+
+
+def batched_checkout(user_id, quantities):
+    place_order(user_id, quantities, **ORDER_FIELDS)
+
+
+def measure(fn, user_id, cart, repeat):
+    timings = []
+    for _ in range(repeat):
+        quantities = cart_quantities(cart)
+        started = time.perf_counter()
+        fn(user_id, quantities)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings), max(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 5, 20, 50])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = make_app(os.path.join(tmp, 'bench.db'))
+        with app.app_context():
+            db.create_all()
+            buyer = User(username='buyer', email='buyer@example.com', role='buyer')
+            seller = User(username='seller', email='seller@example.com', role='seller')
+            db.session.add_all([buyer, seller])
+            db.session.flush()
+            db.session.add_all(
+                Product(name=f'Товар {i}', price=100 + i, category_id=1, image_url='x.png', seller_id=seller.id)
+                for i in range(max(args.sizes))
+            )
+            db.session.commit()
+            product_ids = [p.id for p in Product.query.order_by(Product.id)]
+
+            print(f"{'корзина':>8} {'по одному, мс':>15} {'пакетом, мс':>13} {'ускорение':>10}")
+            for size in args.sizes:
+                cart = product_ids[:size]
+                before, _ = measure(per_item_checkout, buyer.id, cart, args.repeat)
+                after, _ = measure(batched_checkout, buyer.id, cart, args.repeat)
+                print(f"{size:>8} {before:>15.2f} {after:>13.2f} {before / after:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
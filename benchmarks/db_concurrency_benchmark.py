@@ -0,0 +1,125 @@
+# N процессов одновременно читают и пишут в одну БД — как воркеры gunicorn.
+# Сравнивает SQLite без настроек (как было) и SQLite в режиме WAL; с --url
+# можно прогнать тот же сценарий против PostgreSQL.
+#
+#   python benchmarks/db_concurrency_benchmark.py --workers 1 4 8 --seconds 5
+#   python benchmarks/db_concurrency_benchmark.py --url postgresql://localhost/bench
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, select, update
+from sqlalchemy.exc import OperationalError
+
+import database
+from models import db, User, Product
+
+WRITE_SHARE = 0.2
+USERS = 200
+PRODUCTS = 2000
+# Справочник category заполняется при create_all: id 1..4
+CATEGORY_IDS = [1, 2, 3, 4]
+
+
+def make_engine(url, mode):
+    if mode == 'legacy':
+        return create_engine(url)
+    engine = create_engine(url, **database.engine_options(url))
+    if engine.dialect.name == 'sqlite':
+        database.install_sqlite_pragmas(engine, database.sqlite_pragmas())
+    return engine
+
+
+def prepare(url, mode):
+    engine = make_engine(url, mode)
+    db.metadata.drop_all(engine)
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            {'username': f'user{i}', 'email': f'user{i}@example.com', 'role': 'buyer'} for i in range(USERS)
+        ])
+        conn.execute(insert(Product.__table__), [
+            {'name': f'Товар {i}', 'price_cents': 10000, 'category_id': CATEGORY_IDS[i % 4], 'image_url': 'x.png'}
+            for i in range(PRODUCTS)
+        ])
+    engine.dispose()
+
+
+def worker(url, mode, seconds, seed, results):
+    engine = make_engine(url, mode)
+    rng = random.Random(seed)
+    users = User.__table__
+    products = Product.__table__
+    ops = errors = 0
+    latencies = []
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            if rng.random() < WRITE_SHARE:
+                with engine.begin() as conn:
+                    conn.execute(
+                        update(users).where(users.c.id == rng.randint(1, USERS))
+                        .values(role='buyer')
+                    )
+            else:
+                with engine.connect() as conn:
+                    conn.execute(
+                        select(products).where(products.c.category_id == rng.choice(CATEGORY_IDS)).limit(20)
+                    ).all()
+            ops += 1
+            latencies.append(time.perf_counter() - started)
+        except OperationalError:
+            errors += 1
+    engine.dispose()
+    results.put((ops, errors, latencies))
+
+
+def run(url, mode, workers, seconds):
+    prepare(url, mode)
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker, args=(url, mode, seconds, i, results))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    ops = sum(c[0] for c in collected)
+    errors = sum(c[1] for c in collected)
+    latencies = sorted(l for c in collected for l in c[2])
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else float('nan')
+    return ops / seconds, errors, p99
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--url', help='Вместо двух режимов SQLite проверить эту БД')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.url:
+            targets = [('url', args.url)]
+        else:
+            path = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+            targets = [('legacy', path), ('wal', path)]
+
+        print(f"{'режим':<8} {'воркеров':>8} {'оп/с':>10} {'ошибок':>8} {'p99, мс':>9}")
+        for mode, url in targets:
+            for workers in args.workers:
+                throughput, errors, p99 = run(url, mode, workers, args.seconds)
+                print(f"{mode:<8} {workers:>8} {throughput:>10.0f} {errors:>8} {p99:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
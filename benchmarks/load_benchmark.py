@@ -0,0 +1,219 @@
+# Нагрузочный прогон сценария «витрина → поиск → корзина → заказ» на
+# синтетических данных: через тестовый клиент Flask и через настоящий
+# WSGI-сервер (werkzeug, threaded). Печатает p50/p95/p99 и пропускную
+# способность по маршрутам и сохраняет результат в JSON для сравнения коммитов.
+#
+#   python benchmarks/load_benchmark.py --products 20000 --sessions 50 --concurrency 8 \
+#       --output benchmarks/results/$(git rev-parse --short HEAD).json
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SEARCH_TERMS = ['ремень', 'кожан', 'часы', 'сумка', 'футболка', 'рюкзак', 'ёмкий', 'винтажн']
+
+
+class TestClientDriver:
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, url, data=None):
+        response = self.client.open(url, method=method, data=data)
+        response.close()
+        return response.status_code
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpDriver:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect,
+        )
+
+    def request(self, method, url, data=None):
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        req = urllib.request.Request(self.base_url + url, data=body, method=method)
+        try:
+            with self.opener.open(req) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as exc:
+            exc.read()
+            return exc.code
+
+
+def scenario(driver, record, rng, buyer_email, product_ids, categories):
+    def step(route, method, url, data=None):
+        started = time.perf_counter()
+        status = driver.request(method, url, data)
+        record(route, time.perf_counter() - started, status)
+
+    step('GET /', 'GET', '/')
+    step('GET /category/<name>', 'GET', '/category/' + urllib.parse.quote(rng.choice(categories)))
+    for product_id in rng.sample(product_ids, 3):
+        step('GET /product/<id>', 'GET', f'/product/{product_id}')
+    step('GET /search', 'GET', '/search?' + urllib.parse.urlencode({'q': rng.choice(SEARCH_TERMS)}))
+    step('POST /login', 'POST', '/login', {'email': buyer_email, 'password': 'password'})
+    for product_id in rng.sample(product_ids, 2):
+        step('POST /add_to_cart/<id>', 'POST', f'/add_to_cart/{product_id}')
+    step('GET /cart', 'GET', '/cart')
+    step('POST /checkout', 'POST', '/checkout', {
+        'size': 'M', 'address': 'Москва, ул. Ленина, 1', 'phone': '+79991234567', 'email': buyer_email,
+    })
+    step('GET /my_orders', 'GET', '/my_orders')
+    step('GET /logout', 'GET', '/logout')
+
+
+def percentile(values, q):
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method='inclusive')[q - 1]
+
+
+def summarize(samples, wall):
+    routes = {}
+    for route, entries in sorted(samples.items()):
+        timings = [duration * 1000 for duration, _ in entries]
+        routes[route] = {
+            'count': len(timings),
+            'errors': sum(1 for _, status in entries if status >= 400),
+            'p50_ms': round(percentile(timings, 50), 2),
+            'p95_ms': round(percentile(timings, 95), 2),
+            'p99_ms': round(percentile(timings, 99), 2),
+            'mean_ms': round(statistics.fmean(timings), 2),
+            'rps': round(len(timings) / wall, 1),
+        }
+    total = sum(route['count'] for route in routes.values())
+    return {'wall_s': round(wall, 3), 'requests': total, 'rps': round(total / wall, 1), 'routes': routes}
+
+
+def run(make_driver, sessions, concurrency, fixtures, seed):
+    samples = defaultdict(list)
+    lock = threading.Lock()
+
+    def record(route, duration, status):
+        with lock:
+            samples[route].append((duration, status))
+
+    def one(index):
+        rng = random.Random(seed + index)
+        buyer_email = fixtures['buyers'][index % len(fixtures['buyers'])]
+        scenario(make_driver(), record, rng, buyer_email, fixtures['product_ids'], fixtures['categories'])
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(sessions)))
+    return summarize(samples, time.perf_counter() - started)
+
+
+def print_report(mode, report):
+    print(f'\n{mode}: {report["requests"]} запросов за {report["wall_s"]} с, {report["rps"]} req/s')
+    print(f'{"маршрут":28} {"n":>6} {"p50":>8} {"p95":>8} {"p99":>8} {"req/s":>8} {"ошибки":>7}')
+    for route, row in report['routes'].items():
+        print(f'{route:28} {row["count"]:>6} {row["p50_ms"]:>8} {row["p95_ms"]:>8} {row["p99_ms"]:>8} '
+              f'{row["rps"]:>8} {row["errors"]:>7}')
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--sellers', type=int, default=20)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--sessions', type=int, default=30, help='сколько раз пройти сценарий')
+    parser.add_argument('--concurrency', type=int, default=4, help='параллельных сессий для WSGI-сервера')
+    parser.add_argument('--mode', choices=['test-client', 'server', 'both'], default='both')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='куда сохранить JSON с результатами')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='load-benchmark-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ.setdefault('MAIL_PORT', '25')
+    os.environ.setdefault('MAIL_USERNAME', 'shop@example.com')
+    os.environ['MAIL_QUEUE_WORKERS'] = '0'  # письма остаются в outbox, SMTP не нужен
+    os.environ.setdefault('LOGIN_RATE_IP', '1000000/60')  # все сессии входят с 127.0.0.1
+
+    from app import create_app
+    from models import db, User, Product
+    from catalog import CATEGORIES
+    import synthetic
+
+    app = create_app()
+    app.config['MAIL_SUPPRESS_SEND'] = True  # Flask-Mail создаётся при первой отправке
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        counts = synthetic.generate(args.users, args.sellers, args.products, args.orders, seed=args.seed)
+        print(f'Данные сгенерированы за {time.perf_counter() - started:.1f} с: {counts}')
+        fixtures = {
+            'buyers': [email for email, in db.session.query(User.email).filter_by(role='buyer').limit(200)],
+            'product_ids': [product_id for product_id, in db.session.query(Product.id).limit(2000)],
+            'categories': [category.name for category in CATEGORIES],
+        }
+
+    results = {}
+    if args.mode in ('test-client', 'both'):
+        # Тестовый клиент — без сети, последовательно: чистое время приложения
+        results['test-client'] = run(lambda: TestClientDriver(app), args.sessions, 1, fixtures, args.seed)
+        print_report('test-client', results['test-client'])
+    if args.mode in ('server', 'both'):
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.WARNING)  # без строки лога на каждый запрос
+        server = make_server('127.0.0.1', 0, app, threaded=True)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+        try:
+            results['server'] = run(lambda: HttpDriver(base_url), args.sessions, args.concurrency, fixtures, args.seed)
+        finally:
+            server.shutdown()
+        print_report(f'server (concurrency={args.concurrency})', results['server'])
+
+    if args.output:
+        payload = {
+            'commit': git_commit(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': sys.version.split()[0],
+            'parameters': vars(args),
+            'data': counts,
+            'results': results,
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w', encoding='utf-8') as out:
+            json.dump(payload, out, ensure_ascii=False, indent=2)
+        print(f'\nРезультаты сохранены в {args.output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# Пропускная способность /login при разных алгоритмах хэширования и размерах
+# пула проверок, плюс доля отказов 429/503 при «наборе паролей» с одного IP.
+# Параллельно с входами идут запросы к витрине: видно, не вытесняет ли их хэширование.
+#
+#   python benchmarks/login_benchmark.py --logins 200 --concurrency 16
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+METHODS = ['pbkdf2:sha256:600000', 'scrypt:32768:8:1', 'scrypt:16384:8:1', 'argon2']
+
+
+def make_app(workdir, method, workers, rate_ip):
+    os.environ.update(
+        DATABASE_URL='sqlite:///' + os.path.join(workdir, f'{method.replace(":", "_")}-{workers}.db'),
+        PASSWORD_HASH_METHOD=method,
+        PASSWORD_WORKERS=str(workers),
+        LOGIN_RATE_IP=rate_ip,
+        LOGIN_RATE_EMAIL='1000000/60',
+        MAIL_QUEUE_WORKERS='0',
+    )
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ.setdefault('MAIL_PORT', '25')
+    from app import create_app
+    from models import db, User
+    import passwords
+
+    app = create_app()
+    passwords.throttle.reset()
+    with app.app_context():
+        db.create_all()
+        user = User(username='buyer', email='buyer@example.com', role='buyer')
+        user.set_password('secret')
+        db.session.add(user)
+        db.session.commit()
+    return app
+
+
+def run(app, logins, concurrency, wrong_share):
+    statuses = []
+    browse = []
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def login(index):
+        password = 'wrong' if index % 100 < wrong_share * 100 else 'secret'
+        client = app.test_client()
+        started = time.perf_counter()
+        response = client.post('/login', data={'email': 'buyer@example.com', 'password': password})
+        with lock:
+            statuses.append((response.status_code, time.perf_counter() - started))
+
+    def browse_loop():
+        client = app.test_client()
+        while not done.is_set():
+            started = time.perf_counter()
+            client.get('/category/' + 'Ремни')
+            browse.append(time.perf_counter() - started)
+
+    browser = threading.Thread(target=browse_loop)
+    browser.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(login, range(logins)))
+    wall = time.perf_counter() - started
+    done.set()
+    browser.join()
+
+    served = [duration for status, duration in statuses if status in (200, 302)]
+    return {
+        'logins_per_s': round(len(served) / wall, 1),
+        'p50_ms': round(statistics.median(served) * 1000, 1) if served else None,
+        'rejected': sum(1 for status, _ in statuses if status in (429, 503)),
+        'browse_p50_ms': round(statistics.median(browse) * 1000, 1) if browse else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--logins', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--wrong-share', type=float, default=0.5, help='доля попыток с неверным паролем')
+    parser.add_argument('--rate-ip', default='1000000/60', help='LOGIN_RATE_IP; например 20/60, чтобы увидеть 429')
+    args = parser.parse_args()
+
+    import passwords
+    methods = [method for method in METHODS if method != 'argon2' or passwords.argon2 is not None]
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f'{"алгоритм":24} {"пул":>4} {"входов/с":>9} {"p50, мс":>8} {"отказов":>8} {"витрина p50":>12}')
+        for method in methods:
+            for workers in args.workers:
+                app = make_app(workdir, method, workers, args.rate_ip)
+                row = run(app, args.logins, args.concurrency, args.wrong_share)
+                passwords.pool.shutdown()
+                print(f'{method:24} {workers:>4} {row["logins_per_s"]:>9} {row["p50_ms"]!s:>8} '
+                      f'{row["rejected"]:>8} {row["browse_p50_ms"]!s:>12}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+# Сравнение задержки поиска: LIKE '%q%' против FTS5.
+#
+#   python benchmarks/search_benchmark.py --sizes 10000 100000 1000000
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, text
+
+from models import db, Product
+from search_index import FTS_TABLE, build_match
+
+WORDS = [
+    'футболка', 'ремень', 'часы', 'сумка', 'кожаный', 'хлопковый', 'черный',
+    'белый', 'синий', 'мужской', 'женский', 'классический', 'спортивный',
+    'наручные', 'дорожная', 'пряжка', 'размер', 'стальной', 'летний', 'зимний',
+]
+QUERIES = ['часы', 'кожаный ремень', 'сум', 'спортивный черный', 'модель7777', 'несуществующий']
+
+# Как и /search: общее число совпадений плюс первая страница
+LIKE_WHERE = "name LIKE '%' || :q || '%' OR short_description LIKE '%' || :q || '%'"
+LIKE_SQL = [
+    text(f"SELECT count(*) FROM product WHERE {LIKE_WHERE}"),
+    text(f"SELECT id, name FROM product WHERE {LIKE_WHERE} ORDER BY id LIMIT 20"),
+]
+FTS_SQL = [
+    text(f"SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :q"),
+    text(f"SELECT p.id, p.name FROM {FTS_TABLE} f JOIN product p ON p.id = f.rowid "
+         f"WHERE {FTS_TABLE} MATCH :q ORDER BY f.rank LIMIT 20"),
+]
+
+
+def phrase(rng, n):
+    return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+
+def fill(engine, count, batch=10000):
+    rng = random.Random(count)
+    with engine.begin() as conn:
+        for start in range(0, count, batch):
+            rows = [{
+                'name': f'{phrase(rng, 2).capitalize()} модель{i}',
+                'short_description': phrase(rng, 5),
+                'long_description': phrase(rng, 20),
+                'price_cents': rng.randint(100, 10000) * 100,
+                'category_id': rng.randint(1, 4),
+                'image_url': 'x.png',
+            } for i in range(start, min(start + batch, count))]
+            conn.execute(insert(Product.__table__), rows)
+        conn.execute(text(
+            f"INSERT INTO {FTS_TABLE} (rowid, name, short_description, long_description) "
+            "SELECT id, name, short_description, long_description FROM product"))
+
+
+def measure(conn, statements, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for sql in statements:
+            conn.execute(sql, params).fetchall()
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'товаров':>10} {'запрос':<20} {'LIKE, мс':>10} {'FTS5, мс':>10}")
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_engine('sqlite:///' + os.path.join(tmp, 'bench.db'))
+            db.metadata.create_all(engine)
+            fill(engine, size)
+            with engine.connect() as conn:
+                for q in QUERIES:
+                    like_ms = measure(conn, LIKE_SQL, {'q': q}, args.repeat)
+                    fts_ms = measure(conn, FTS_SQL, {'q': build_match(q)}, args.repeat)
+                    print(f"{size:>10} {q:<20} {like_ms:>10.2f} {fts_ms:>10.2f}")
+            engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# Время старта воркера: импорт app, create_app() и первые запросы в свежем
+# процессе. Режимы: без кэша байткода и прогрева (как раньше), с байткодом
+# Jinja на диске, с байткодом и прогревом шаблонов в create_app().
+#
+#   python benchmarks/startup_benchmark.py --runs 5
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Первые запросы после старта: витрина, страница товара, категория, вход
+PATHS = ['/', '/product/1', '/category/tshirts', '/login']
+
+MODES = {
+    'без кэша': {'JINJA_CACHE_DIR': '', 'TEMPLATE_WARMUP': '0'},
+    'байткод': {'TEMPLATE_WARMUP': '0'},
+    'байткод + прогрев': {'TEMPLATE_WARMUP': '1'},
+}
+
+
+def child():
+    # Замеры внутри свежего процесса; результат — JSON в stdout
+    started = time.perf_counter()
+    from app import create_app
+    imported = time.perf_counter()
+    app = create_app()
+    created = time.perf_counter()
+    client = app.test_client()
+    requests = []
+    for path in PATHS:
+        request_started = time.perf_counter()
+        response = client.get(path)
+        requests.append(time.perf_counter() - request_started)
+        assert response.status_code == 200, (path, response.status_code)
+    print(json.dumps({
+        'import': imported - started,
+        'create_app': created - imported,
+        'first_request': requests[0],
+        'first_requests': sum(requests),
+        'alembic_loaded': 'alembic' in sys.modules,
+    }))
+
+
+def prepare(workdir):
+    os.environ.update(DATABASE_URL='sqlite:///' + os.path.join(workdir, 'bench.db'), TEMPLATE_WARMUP='0')
+    from app import create_app
+    from models import db
+    import synthetic
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        synthetic.generate(users=50, sellers=5, products=500, orders=100)
+
+
+def run(env, runs):
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child'],
+            env=env, cwd=ROOT, check=True, capture_output=True, text=True,
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    os.environ['MAIL_QUEUE_WORKERS'] = '0'
+    if args.child:
+        child()
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        prepare(workdir)
+        cache_dir = os.path.join(workdir, 'jinja_cache')
+        print(f'{"режим":20} {"импорт, мс":>11} {"create_app, мс":>15} {"1-й запрос, мс":>15} '
+              f'{"4 запроса, мс":>14} {"alembic":>8}')
+        for name, overrides in MODES.items():
+            env = dict(os.environ, JINJA_CACHE_DIR=cache_dir)
+            env.update(overrides)
+            if env['JINJA_CACHE_DIR']:
+                # Байткод уже на диске — как после прогрева при сборке образа
+                subprocess.run([sys.executable, os.path.abspath(__file__), '--child'],
+                               env=env, cwd=ROOT, check=True, capture_output=True)
+            row = run(env, args.runs)
+            print(f'{name:20} {row["import"] * 1000:>11.0f} {row["create_app"] * 1000:>15.0f} '
+                  f'{row["first_request"] * 1000:>15.1f} {row["first_requests"] * 1000:>14.1f} '
+                  f'{"да" if row["alembic_loaded"] else "нет":>8}')
+
+
+if __name__ == '__main__':
+    main()
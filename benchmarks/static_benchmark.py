@@ -0,0 +1,73 @@
+# Запросов в секунду при отдаче картинки товара: send_from_directory
+# (как было) против static_assets.serve, для полного ответа и для 304.
+#
+#   python benchmarks/static_benchmark.py --requests 2000
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, send_from_directory, url_for
+
+import static_assets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_app(static_dir, new):
+    app = Flask(__name__, static_folder=static_dir)
+    if new:
+        static_assets.init_app(app)
+    else:
+        @app.route('/uploads/<path:filename>')
+        def legacy(filename):
+            return send_from_directory(static_dir, filename)
+    return app
+
+
+def rate(client, url, count, headers=None):
+    started = time.perf_counter()
+    for _ in range(count):
+        response = client.get(url, headers=headers or {})
+        response.close()
+    return count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--image', default=os.path.join(ROOT, 'img', 'watches1.png'))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as static_dir:
+        shutil.copy(args.image, os.path.join(static_dir, 'product.png'))
+
+        legacy_client = make_app(static_dir, new=False).test_client()
+        etag = legacy_client.get('/uploads/product.png').headers['ETag']
+        rows = [
+            ('как было', '200', rate(legacy_client, '/uploads/product.png', args.requests)),
+            ('как было', '304', rate(legacy_client, '/uploads/product.png', args.requests, {'If-None-Match': etag})),
+        ]
+
+        current = make_app(static_dir, new=True)
+        with current.test_request_context():
+            url = url_for('static', filename='product.png')
+        client = current.test_client()
+        etag = client.get(url).headers['ETag']
+        rows += [
+            ('отпечаток', '200', rate(client, url, args.requests)),
+            ('отпечаток', '304', rate(client, url, args.requests, {'If-None-Match': etag})),
+        ]
+
+    print(f"{'вариант':<10} {'ответ':>5} {'запр/с':>10}")
+    for name, status, value in rows:
+        print(f"{name:<10} {status:>5} {value:>10.0f}")
+    print('Ответы с отпечатком кэшируются браузером на год (immutable) и не запрашиваются повторно.')
+
+
+if __name__ == '__main__':
+    main()
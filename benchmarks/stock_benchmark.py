@@ -0,0 +1,166 @@
+# Распродажа одного товара: N процессов одновременно кладут его в корзину и
+# оформляют заказ (stock.reserve + place_order, как add_to_cart и checkout).
+# Проверяет, что продано ровно столько, сколько было на складе, и не больше,
+# и показывает пропускную способность. Для сравнения режим naive: остаток
+# читается SELECT'ом и записывается обратно (так делать нельзя — он перепродаёт).
+#
+#   python benchmarks/stock_benchmark.py --workers 1 4 8 --stock 500 --attempts 200
+#   python benchmarks/stock_benchmark.py --url postgresql://localhost/bench
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from sqlalchemy import func, select, update  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+ORDER_FIELDS = dict(address='Москва, ул. Ленина, 1', phone='+79991234567', size='M', email='buyer@example.com')
+
+
+def make_app(url):
+    os.environ.update(DATABASE_URL=url, MAIL_QUEUE_WORKERS='0', TEMPLATE_WARMUP='0', SUGGEST_WARMUP='0')
+    os.environ.setdefault('SECRET_KEY', 'benchmark')
+    from app import create_app
+    return create_app()
+
+
+def prepare(url, workers, initial_stock):
+    from models import db, User, Product
+    app = make_app(url)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        seller = User(username='seller', email='seller@example.com', role='seller')
+        db.session.add(seller)
+        db.session.add_all(
+            User(username=f'buyer{i}', email=f'buyer{i}@example.com', role='buyer') for i in range(workers)
+        )
+        db.session.flush()
+        product = Product(name='Распродажа -50%', price=1000, category_id=1, seller_id=seller.id, stock=initial_stock)
+        db.session.add(product)
+        db.session.commit()
+        buyer_ids = [user.id for user in User.query.filter_by(role='buyer').order_by(User.id)]
+        return product.id, buyer_ids
+
+
+def atomic_checkout(user_id, product_id):
+    import stock
+    from models import db, Product
+    from orders import place_order
+    product = db.session.get(Product, product_id)
+    try:
+        stock.reserve(user_id, product)
+        db.session.commit()
+    except stock.OutOfStock:
+        db.session.rollback()
+        return False
+    try:
+        return place_order(user_id, {product_id: 1}, **ORDER_FIELDS) is not None
+    except stock.OutOfStock:
+        return False
+
+
+def naive_checkout(user_id, product_id):
+    # Только списание остатка: SELECT, проверка в Python, UPDATE прочитанным значением
+    from models import db, Product
+    table = Product.__table__
+    left = db.session.execute(select(table.c.stock).where(table.c.id == product_id)).scalar()
+    if left < 1:
+        db.session.rollback()
+        return False
+    db.session.execute(update(table).where(table.c.id == product_id).values(stock=left - 1))
+    db.session.commit()
+    return True
+
+
+def worker(url, mode, user_id, product_id, attempts, start, results):
+    from models import db
+    app = make_app(url)
+    checkout = atomic_checkout if mode == 'atomic' else naive_checkout
+    sold = sold_out = errors = 0
+    with app.app_context():
+        start.wait()
+        started = time.perf_counter()
+        for _ in range(attempts):
+            try:
+                if checkout(user_id, product_id):
+                    sold += 1
+                else:
+                    sold_out += 1
+            except OperationalError:
+                db.session.rollback()
+                errors += 1
+        elapsed = time.perf_counter() - started
+    results.put((sold, sold_out, errors, elapsed))
+
+
+def run(url, mode, workers, initial_stock, attempts):
+    from models import db, Product, OrderItem
+    product_id, buyer_ids = prepare(url, workers, initial_stock)
+    start = multiprocessing.Event()
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=worker, args=(url, mode, buyer_ids[i], product_id, attempts, start, results))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    time.sleep(1)  # Все процессы подняли приложение и ждут старта
+    start.set()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    app = make_app(url)
+    with app.app_context():
+        left = db.session.get(Product, product_id).stock
+        ordered = db.session.query(func.coalesce(func.sum(OrderItem.quantity), 0)).scalar()
+    sold = sum(c[0] for c in collected)
+    elapsed = max(c[3] for c in collected)
+    return {
+        'sold': sold,
+        'sold_out': sum(c[1] for c in collected),
+        'errors': sum(c[2] for c in collected),
+        'left': left,
+        'ordered': ordered,
+        'throughput': workers * attempts / elapsed,
+        # Продано сверх того, что ушло со склада (потерянные обновления остатка)
+        'oversold': sold - (initial_stock - left),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--stock', type=int, default=500)
+    parser.add_argument('--attempts', type=int, default=200, help='попыток купить на процесс')
+    parser.add_argument('--modes', nargs='+', default=['atomic', 'naive'])
+    parser.add_argument('--url', help='Вместо временной SQLite прогнать на этой БД (она будет очищена)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.url or 'sqlite:///' + os.path.join(tmp, 'bench.db')
+        print(f"{'режим':<7} {'процессов':>9} {'продано':>8} {'заказов':>8} {'осталось':>9} "
+              f"{'нет в нал.':>10} {'ошибок':>7} {'попыток/с':>10} {'перепродано':>12}")
+        failed = False
+        for mode in args.modes:
+            for workers in args.workers:
+                row = run(url, mode, workers, args.stock, args.attempts)
+                print(f"{mode:<7} {workers:>9} {row['sold']:>8} {row['ordered']:>8} {row['left']:>9} "
+                      f"{row['sold_out']:>10} {row['errors']:>7} {row['throughput']:>10.0f} {row['oversold']:>12}")
+                if mode == 'atomic':
+                    # Инварианты: остаток + продано = было, заказано = продано, не больше склада
+                    consistent = (row['left'] + row['sold'] == args.stock and row['ordered'] == row['sold']
+                                  and row['sold'] <= args.stock and row['left'] >= 0)
+                    failed = failed or not consistent
+        if failed:
+            sys.exit('Нарушены инварианты остатков в режиме atomic')
+
+
+if __name__ == '__main__':
+    main()
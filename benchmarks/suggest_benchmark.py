@@ -0,0 +1,91 @@
+# Индекс подсказок поиска без БД: память и время построения на каталоге
+# из N товаров и задержка suggest() на типичных префиксах.
+#   synthetic — названия как у synthetic.generate(): сотни различных названий
+#   unique    — у каждого товара своё название с номером модели (худший случай:
+#               и названий, и слов в словаре столько же, сколько товаров)
+#
+#   python benchmarks/suggest_benchmark.py --products 1000000
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from suggest import NameIndex  # noqa: E402
+from synthetic import ADJECTIVES, DETAILS, NOUNS  # noqa: E402
+
+BRANDS = ['Северный', 'Урал', 'Байкал', 'Волга', 'Алтай', 'Кама', 'Ладога', 'Ока', 'Енисей', 'Амур']
+QUERIES = ['к', 'ко', 'кож', 'кожаный р', 'рюкзак', 'смарт', 'ёмк', 'ЧЁРНЫЙ ремень', 'ока ле', 'модель 12345',
+           'нет такого']
+
+
+def synthetic_names(count, rng):
+    nouns = [noun for group in NOUNS.values() for noun in group]
+    for _ in range(count):
+        yield f'{rng.choice(ADJECTIVES)} {rng.choice(nouns)}'
+
+
+def unique_names(count, rng):
+    nouns = [noun for group in NOUNS.values() for noun in group]
+    for number in range(count):
+        yield (f'{rng.choice(BRANDS)} {rng.choice(ADJECTIVES).lower()} {rng.choice(nouns)} '
+               f'{rng.choice(DETAILS)} модель {number}')
+
+
+def build(names, max_names):
+    index = NameIndex(max_names)
+    index.load(enumerate(names, start=1))
+    return index
+
+
+def measure(make_names, products, max_names, runs, limit, scan):
+    tracemalloc.start()
+    index = build(make_names(products, random.Random(1)), max_names)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del index
+
+    started = time.perf_counter()
+    index = build(make_names(products, random.Random(1)), max_names)
+    built = time.perf_counter() - started
+
+    latencies = {}
+    for query in QUERIES:
+        samples = []
+        for _ in range(runs):
+            query_started = time.perf_counter()
+            index.suggest(query, limit, scan)
+            samples.append(time.perf_counter() - query_started)
+        samples.sort()
+        latencies[query] = (statistics.median(samples), samples[int(len(samples) * 0.99) - 1],
+                            len(index.suggest(query, limit, scan)))
+    return index, memory, built, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--products', type=int, default=1_000_000)
+    parser.add_argument('--max-names', type=int, default=1_000_000)
+    parser.add_argument('--runs', type=int, default=1000)
+    parser.add_argument('--limit', type=int, default=10)
+    parser.add_argument('--scan', type=int, default=300)
+    args = parser.parse_args()
+
+    for label, make_names in (('synthetic', synthetic_names), ('unique', unique_names)):
+        index, memory, built, latencies = measure(make_names, args.products, args.max_names,
+                                                  args.runs, args.limit, args.scan)
+        print(f'{label}: {index.products} товаров, {len(index)} названий, {index.word_count} слов; '
+              f'память {memory / 2 ** 20:.1f} МБ ({memory / args.products:.0f} Б на товар), '
+              f'построение {built:.1f} с')
+        print(f'  {"запрос":16} {"p50, мкс":>9} {"p99, мкс":>9} {"найдено":>8}')
+        for query, (median, p99, found) in latencies.items():
+            print(f'  {query:16} {median * 1e6:>9.0f} {p99 * 1e6:>9.0f} {found:>8}')
+
+
+if __name__ == '__main__':
+    main()
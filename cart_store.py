@@ -0,0 +1,92 @@
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import delete, func, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Product, CartItem
+
+cart_table = CartItem.__table__
+
+_UPSERT_DIALECTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def cart_quantities(cart):
+    # Повторы одного товара в списке превращаются в количество
+    return Counter(int(product_id) for product_id in cart)
+
+
+def add(user_id, product_id, quantity=1, reserved_until=None):
+    # Одна инструкция INSERT ... ON CONFLICT DO UPDATE вместо чтения и записи.
+    # С reserved_until добавленные единицы считаются резервом (см. stock.reserve).
+    reserved = quantity if reserved_until is not None else 0
+    insert = _UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    if insert is not None:
+        stmt = insert(cart_table).values(
+            user_id=user_id, product_id=product_id, quantity=quantity, added_at=datetime.utcnow(),
+            reserved=reserved, reserved_until=reserved_until,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[cart_table.c.user_id, cart_table.c.product_id],
+            set_={
+                'quantity': cart_table.c.quantity + stmt.excluded.quantity,
+                'reserved': cart_table.c.reserved + stmt.excluded.reserved,
+                'reserved_until': func.coalesce(stmt.excluded.reserved_until, cart_table.c.reserved_until),
+            },
+        )
+        db.session.execute(stmt)
+        return
+    result = db.session.execute(
+        update(cart_table)
+        .where(cart_table.c.user_id == user_id, cart_table.c.product_id == product_id)
+        .values(
+            quantity=cart_table.c.quantity + quantity,
+            reserved=cart_table.c.reserved + reserved,
+            reserved_until=func.coalesce(reserved_until, cart_table.c.reserved_until),
+        )
+    )
+    if not result.rowcount:
+        db.session.add(CartItem(user_id=user_id, product_id=product_id, quantity=quantity,
+                                reserved=reserved, reserved_until=reserved_until))
+
+
+def remove(user_id, product_id):
+    # Убирает одну единицу товара; строка удаляется, когда количество доходит до нуля
+    key = (cart_table.c.user_id == user_id, cart_table.c.product_id == product_id)
+    result = db.session.execute(
+        update(cart_table).where(*key, cart_table.c.quantity > 1)
+        .values(quantity=cart_table.c.quantity - 1)
+    )
+    if result.rowcount:
+        return True
+    result = db.session.execute(delete(cart_table).where(*key))
+    return bool(result.rowcount)
+
+
+def clear(user_id):
+    db.session.execute(delete(cart_table).where(cart_table.c.user_id == user_id))
+
+
+def lines(user_id):
+    # Товары и количества одним запросом с JOIN
+    return (
+        db.session.query(Product, CartItem.quantity)
+        .join(CartItem, CartItem.product_id == Product.id)
+        .filter(CartItem.user_id == user_id)
+        .order_by(CartItem.added_at, Product.id)
+        .all()
+    )
+
+
+def merge_session_cart(user_id, session):
+    # Перенос корзины из cookie-сессии (старый формат — список id товаров)
+    legacy = session.pop('cart', None)
+    if not legacy:
+        return False
+    quantities = cart_quantities(legacy)
+    known = {row.id for row in db.session.query(Product.id).filter(Product.id.in_(list(quantities)))}
+    for product_id, quantity in quantities.items():
+        if product_id in known:
+            add(user_id, product_id, quantity)
+    db.session.commit()
+    return True
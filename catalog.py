@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import current_app
+from sqlalchemy import event, func, select, union_all
+
+from models import db, Product, ProductCategory
+
+Category = namedtuple('Category', ['name', 'slug'])
+
+# Начальное содержимое справочника category (и его порядок на витрине)
+CATEGORIES = [
+    Category('Футболки', 'tshirts'),
+    Category('Ремни', 'belts'),
+    Category('Часы', 'watches'),
+    Category('Сумки', 'bags'),
+]
+
+LISTING_COLUMNS = (
+    Product.id,
+    Product.name,
+    Product.short_description,
+    Product.price_cents,
+    Product.category_id,
+    Product.image_url,
+    Product.seller_id,
+    Product.updated_at,
+)
+
+
+# Товары без категории (в кабинете продавца — и с category_id не из справочника)
+OTHER = Category('Другое', 'other')
+
+
+@event.listens_for(ProductCategory.__table__, 'after_create')
+def _seed_categories(target, connection, **kw):
+    connection.execute(target.insert(), [
+        {'name': category.name, 'slug': category.slug, 'position': position}
+        for position, category in enumerate(CATEGORIES)
+    ])
+
+
+def categories():
+    # [(id, Category)] в порядке витрины
+    rows = db.session.query(ProductCategory).order_by(ProductCategory.position, ProductCategory.id)
+    return [(row.id, Category(row.name, row.slug)) for row in rows]
+
+
+def find_category(value):
+    # По названию («Ремни») или slug («belts»)
+    return ProductCategory.query.filter((ProductCategory.name == value) | (ProductCategory.slug == value)).first()
+
+
+def category_ids():
+    # Название (casefold) и slug → id; для импорта и генераторов данных
+    ids = {}
+    for row in db.session.query(ProductCategory.id, ProductCategory.name, ProductCategory.slug):
+        ids[row.name.casefold()] = row.id
+        ids[row.slug] = row.id
+    return ids
+
+
+def load_listing(seller_id=None):
+    # Витрина показывает первые N товаров каждой категории; остальные —
+    # на постраничной странице категории
+    limit = current_app.config.get('CATALOG_CATEGORY_LIMIT', 12)
+    if seller_id is None:
+        rows = _first_in_each_category(limit)
+    else:
+        rows = _first_of_seller_in_each_category(seller_id, limit)
+
+    known = dict(categories())
+    listing = OrderedDict((category, []) for category in known.values())
+    for row in rows:
+        listing.setdefault(known.get(row.category_id, OTHER), []).append(row)
+    return listing
+
+
+def _first_in_each_category(limit):
+    # Для каждой категории справочника — первые limit id по индексу
+    # (category_id, id) и товары без категории: читается не больше
+    # limit строк на категорию, а не вся таблица, как у row_number().
+    # Товар с category_id, которого нет в справочнике, витрина не покажет
+    first_ids = (
+        select(Product.id)
+        .where(Product.category_id == ProductCategory.id)
+        .order_by(Product.id)
+        .limit(limit)
+        .correlate(ProductCategory)
+        .scalar_subquery()
+    )
+    in_categories = select(*LISTING_COLUMNS).join_from(ProductCategory, Product, Product.id.in_(first_ids))
+    uncategorized = (
+        select(*LISTING_COLUMNS).where(Product.category_id.is_(None)).order_by(Product.id).limit(limit).subquery()
+    )
+    rows = union_all(in_categories, select(uncategorized)).subquery()
+    return db.session.execute(select(rows).order_by(rows.c.category_id, rows.c.id)).all()
+
+
+def _first_of_seller_in_each_category(seller_id, limit):
+    # Товары продавца читаются по индексу (seller_id, id); их немного,
+    # поэтому нумерация row_number() внутри категорий дешёвая
+    position = func.row_number().over(partition_by=Product.category_id, order_by=Product.id)
+    ranked = (
+        db.session.query(*LISTING_COLUMNS, position.label('position'))
+        .filter(Product.seller_id == seller_id)
+        .subquery()
+    )
+    return (
+        db.session.query(*[ranked.c[column.key] for column in LISTING_COLUMNS])
+        .filter(ranked.c.position <= limit)
+        .order_by(ranked.c.category_id, ranked.c.id)
+        .all()
+    )
+
+
+class CatalogCache:
+    # Кэш витрины в памяти процесса. Ключ записи — состояние таблицы товаров
+    # в БД (count(*) и max(updated_at)): запись в каталог из любого воркера
+    # меняет его, и следующий запрос перечитывает витрину одним SELECT. Само
+    # состояние держим CATALOG_STATE_TTL секунд; invalidate() в этом процессе
+    # сбрасывает его сразу.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = 0
+        self._state = (None, 0.0, None)  # (версия, срок, состояние)
+        self._entries = {}
+
+    def state(self):
+        # (count, max(updated_at)); от него же ETag страниц каталога (http_cache)
+        now = time.monotonic()
+        version, expires, state = self._state
+        if version == self._version and expires > now:
+            return state
+        version = self._version
+        state = tuple(db.session.query(func.count(Product.id), func.max(Product.updated_at)).one())
+        ttl = current_app.config.get('CATALOG_STATE_TTL', 2)
+        with self._lock:
+            if version == self._version:
+                self._state = (version, now + ttl, state)
+        return state
+
+    def _cached(self, key, load):
+        state = self.state()
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == state:
+            return entry[1]
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == state:
+                return entry[1]
+            value = load()
+            self._entries[key] = (state, value)
+            return value
+
+    def listing(self, seller_id=None):
+        return self._cached(('listing', seller_id), lambda: load_listing(seller_id))
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+
+catalog = CatalogCache()
@@ -0,0 +1,152 @@
+import os
+import sqlite3
+
+import click
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+
+from models import db
+from routing import replicas
+
+# Настройки БД берутся из окружения:
+#   DATABASE_URL          sqlite:///your_database.db (по умолчанию) или postgresql://...
+#   DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING
+#   SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_BUSY_TIMEOUT (мс), SQLITE_MMAP_SIZE (байт)
+#   SQLITE_FOREIGN_KEYS   проверка внешних ключей, по умолчанию выключена, как
+#                         в SQLite: удаление товара из админки не трогает
+#                         ссылающиеся на него строки order_item
+#   DATABASE_REPLICA_URLS реплики для чтения через запятую (см. routing.py)
+#   REPLICA_STICKY_SECONDS сколько секунд после записи пользователь читает из основной БД
+
+DEFAULT_DATABASE_URL = 'sqlite:///your_database.db'
+
+
+def _env_bool(name, default):
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+def database_url():
+    url = os.getenv('DATABASE_URL', DEFAULT_DATABASE_URL)
+    # Heroku и др. отдают устаревшую схему postgres://
+    if url.startswith('postgres://'):
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+
+def sqlite_pragmas():
+    return {
+        'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)),
+        'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'temp_store': 'MEMORY',
+        'foreign_keys': 'ON' if _env_bool('SQLITE_FOREIGN_KEYS', False) else 'OFF',
+    }
+
+
+def engine_options(url):
+    options = {
+        'pool_pre_ping': _env_bool('DB_POOL_PRE_PING', True),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', 1800)),
+    }
+    if make_url(url).get_backend_name() == 'sqlite':
+        # Ожидание блокировки задаётся и драйверу, и через PRAGMA busy_timeout
+        options['connect_args'] = {'timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)) / 1000}
+    else:
+        options['pool_size'] = int(os.getenv('DB_POOL_SIZE', 5))
+        options['max_overflow'] = int(os.getenv('DB_MAX_OVERFLOW', 10))
+        options['pool_timeout'] = int(os.getenv('DB_POOL_TIMEOUT', 30))
+    return options
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+    finally:
+        cursor.close()
+
+
+def install_sqlite_pragmas(engine, pragmas):
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+
+def configure(app):
+    url = database_url()
+    app.config['SQLALCHEMY_DATABASE_URI'] = url
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(url)
+    app.config['SQLITE_PRAGMAS'] = sqlite_pragmas()
+    app.config['DATABASE_REPLICA_URLS'] = [
+        replica.strip() for replica in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if replica.strip()
+    ]
+    app.config['REPLICA_STICKY_SECONDS'] = float(os.getenv('REPLICA_STICKY_SECONDS', 5))
+
+
+def create_replica_engines(app):
+    engines = []
+    for url in app.config.get('DATABASE_REPLICA_URLS') or []:
+        parsed = make_url(url)
+        if parsed.get_backend_name() == 'sqlite' and parsed.database and not os.path.isabs(parsed.database) \
+                and parsed.database != ':memory:':
+            # Как Flask-SQLAlchemy для основной БД: относительный путь — от instance/
+            os.makedirs(app.instance_path, exist_ok=True)
+            parsed = parsed.set(database=os.path.join(app.instance_path, parsed.database))
+        engine = create_engine(parsed, **engine_options(url))
+        if engine.dialect.name == 'sqlite':
+            install_sqlite_pragmas(engine, app.config['SQLITE_PRAGMAS'])
+        engines.append(engine)
+    return engines
+
+
+def all_engines():
+    # Основная БД и реплики: слушатели курсора (метрики, бюджеты запросов)
+    # вешаются на каждый engine, иначе чтения с реплик не видны
+    return [db.engine, *replicas.engines]
+
+
+def sync_sqlite_replicas(primary, engines):
+    # Замена репликации для разработки и тестов: копия основного файла SQLite
+    # в файлы реплик через backup API (консистентный снимок без остановки записи)
+    source = sqlite3.connect(primary.url.database)
+    try:
+        for engine in engines:
+            engine.dispose()
+            target = sqlite3.connect(engine.url.database)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+    finally:
+        source.close()
+
+
+def _dispose_in_child(engines):
+    # gunicorn --preload: соединения пула, открытые в мастере до fork, не должны
+    # достаться дочерним процессам. close=False — не закрываем сокеты родителя.
+    def after_fork():
+        for engine in engines:
+            engine.dispose(close=False)
+    os.register_at_fork(after_in_child=after_fork)
+
+
+def init_app(app):
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            install_sqlite_pragmas(db.engine, app.config['SQLITE_PRAGMAS'])
+        replica_engines = create_replica_engines(app)
+        _dispose_in_child(list(db.engines.values()) + replica_engines)
+    replicas.init_app(app, replica_engines)
+
+    @app.cli.command('db-replica-sync')
+    def replica_sync():
+        sqlite_replicas = [engine for engine in replicas.engines if engine.dialect.name == 'sqlite']
+        if db.engine.dialect.name != 'sqlite' or not sqlite_replicas:
+            raise click.ClickException('Нужны основная БД и реплики (DATABASE_REPLICA_URLS) на SQLite')
+        sync_sqlite_replicas(db.engine, sqlite_replicas)
+        print(f'Скопировано в реплик: {len(sqlite_replicas)}')
@@ -1,11 +1,33 @@
+from decimal import Decimal
+
 from flask_wtf import FlaskForm
-from wtforms import StringField, TextAreaField, DecimalField, FileField, SubmitField
-from wtforms.validators import DataRequired
+from wtforms import StringField, TextAreaField, DecimalField, IntegerField, FileField, SelectField, SubmitField
+from wtforms.widgets import HiddenInput
+from wtforms.validators import DataRequired, NumberRange, Optional
+
+from catalog import CATEGORIES
+from models import MAX_PRICE
 
 class ProductForm(FlaskForm):
     name = StringField('Название', validators=[DataRequired()])
     short_description = StringField('Краткое описание', validators=[DataRequired()])
     long_description = TextAreaField('Длинное описание', validators=[DataRequired()])
-    price = DecimalField('Цена', validators=[DataRequired()])
+    price = DecimalField('Цена', validators=[DataRequired(), NumberRange(min=Decimal('0.01'), max=MAX_PRICE)])
+    stock = IntegerField('Остаток на складе (пусто — без учёта)', validators=[Optional(), NumberRange(min=0)])
     image = FileField('Изображение', validators=[DataRequired()])
     submit = SubmitField('Добавить товар')
+
+class EditProductForm(ProductForm):
+    # Остаток, который продавец видел при открытии формы; stock меняется
+    # через stock.adjust на разницу с ним, а не записью поверх
+    stock_seen = IntegerField(widget=HiddenInput(), validators=[Optional()])
+
+    def populate_obj(self, obj):
+        for name, field in self._fields.items():
+            if name not in ('stock', 'stock_seen'):
+                field.populate_obj(obj, name)
+
+class ProductImportForm(FlaskForm):
+    file = FileField('Файл CSV или JSONL', validators=[DataRequired()])
+    category = SelectField('Категория по умолчанию', choices=[('', 'Из файла')] + [(c.name, c.name) for c in CATEGORIES])
+    submit = SubmitField('Загрузить')
@@ -0,0 +1,127 @@
+import pickle
+import threading
+from collections import OrderedDict
+
+from markupsafe import Markup
+
+try:
+    import redis
+except ImportError:  # Общий бэкенд необязателен
+    redis = None
+
+
+class RedisBackend:
+    # Второй уровень кэша, общий для всех воркеров
+    def __init__(self, url, ttl=3600, prefix='fragment:'):
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, pickle.dumps(value), ex=self.ttl)
+
+    def delete(self, keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+
+class FragmentCache:
+    def __init__(self, maxsize=2048, backend=None):
+        self.maxsize = maxsize
+        self.backend = backend
+        self.enabled = True
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._by_object = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.maxsize = app.config.get('FRAGMENT_CACHE_SIZE', self.maxsize)
+        self.enabled = self.maxsize > 0
+        url = app.config.get('FRAGMENT_CACHE_URL')
+        if url and redis is not None:
+            self.backend = RedisBackend(url)
+        app.extensions['fragments'] = self
+        app.jinja_env.globals['cached_fragment'] = self.render
+
+    @staticmethod
+    def key(name, object_id, version, *extra):
+        return ':'.join(str(part) for part in (name, object_id, version) + extra)
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+        if self.backend is not None:
+            value = self.backend.get(key)
+            if value is not None:
+                self._store(key, value)
+                with self._lock:
+                    self.hits += 1
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, value):
+        self._store(key, value)
+        if self.backend is not None:
+            self.backend.set(key, value)
+
+    def _store(self, key, value):
+        object_key = key.split(':', 2)[1]
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            self._by_object.setdefault(object_key, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                old_key, _ = self._entries.popitem(last=False)
+                keys = self._by_object.get(old_key.split(':', 2)[1])
+                if keys is not None:
+                    keys.discard(old_key)
+
+    def invalidate(self, object_id):
+        with self._lock:
+            keys = self._by_object.pop(str(object_id), set())
+            for key in keys:
+                self._entries.pop(key, None)
+        if self.backend is not None:
+            self.backend.delete(list(keys))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_object.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
+
+    def render(self, name, object_id, version, *extra, caller):
+        # В шаблоне: {% call cached_fragment('card', product.id, product.updated_at) %}…{% endcall %}
+        if not self.enabled:
+            return caller()
+        key = self.key(name, object_id, version, *extra)
+        value = self.get(key)
+        if value is None:
+            value = str(caller())
+            self.set(key, value)
+        return Markup(value)
+
+
+fragments = FragmentCache()
@@ -0,0 +1,91 @@
+import hashlib
+from functools import wraps
+
+from flask import current_app, request, session
+from flask_login import current_user
+
+from catalog import catalog
+from models import db, Product
+
+
+def is_personalized():
+    # Вошедшим пользователям и страницам с flash-сообщениями общий кэш не нужен
+    return current_user.is_authenticated or bool(session.get('_flashes'))
+
+
+def catalog_validator():
+    # count(*) и max(updated_at) по товарам меняются при любой записи в каталог
+    # из любого воркера; по тому же состоянию кэшируется витрина (catalog.state)
+    count, last_modified = catalog.state()
+    return (f'{count}-{last_modified.isoformat() if last_modified else ""}', last_modified)
+
+
+def product_validator(product_id):
+    row = db.session.query(Product.updated_at).filter(Product.id == product_id).first()
+    if row is None:
+        return None
+    return (f'{product_id}-{row.updated_at.isoformat() if row.updated_at else ""}', row.updated_at)
+
+
+def _etag(token):
+    raw = f'{request.endpoint}|{request.full_path}|{token}'
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def _public_headers(response, etag, last_modified):
+    config = current_app.config
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers['Cache-Control'] = (
+        f"public, max-age=0, s-maxage={config.get('HTTP_CACHE_S_MAXAGE', 60)}, "
+        f"stale-while-revalidate={config.get('HTTP_CACHE_SWR', 300)}"
+    )
+    response.vary.add('Cookie')
+    return response
+
+
+def conditional_page(validator, personalized=is_personalized):
+    # Для анонимных страниц каталога: валидаторы считаются до запросов
+    # к БД и рендера; совпадение с If-None-Match / If-Modified-Since — сразу 304.
+    # personalized — зависит ли ответ от пользователя (JSON API каталога — нет).
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD') or personalized():
+                response = current_app.make_response(view(*args, **kwargs))
+                response.headers['Cache-Control'] = 'private, no-cache'
+                response.vary.add('Cookie')
+                return response
+
+            validated = validator(**kwargs)
+            if validated is None:
+                return view(*args, **kwargs)
+            token, last_modified = validated
+            etag = _etag(token)
+
+            not_modified = request.if_none_match.contains_weak(etag)
+            if not request.if_none_match and last_modified is not None and request.if_modified_since:
+                not_modified = last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+            if not_modified:
+                return _public_headers(current_app.response_class(status=304), etag, last_modified)
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200 or personalized():
+                response.headers['Cache-Control'] = 'private, no-cache'
+                response.vary.add('Cookie')
+                return response
+            return _public_headers(response, etag, last_modified)
+        return wrapper
+    return decorator
+
+
+def init_app(app):
+    @app.after_request
+    def private_by_default(response):
+        # Страницы вошедшего пользователя (корзина, заказы, кабинеты) без своей
+        # политики кэширования общий кэш сохранять не должен
+        if 'Cache-Control' not in response.headers and is_personalized():
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+        return response
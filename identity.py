@@ -0,0 +1,93 @@
+import threading
+import time
+
+from flask_login import UserMixin
+
+from models import db, User
+
+# Поля пользователя, которых хватает для проверок доступа и шаблонов
+IDENTITY_COLUMNS = (User.id, User.username, User.email, User.role, User.last_activity)
+
+
+class Identity(UserMixin):
+    # То, что Flask-Login кладёт в current_user: снимок строки user без
+    # ORM-объекта. Маршрутам, которые меняют пользователя, нужен load().
+    __slots__ = ('id', 'username', 'email', 'role', 'last_activity')
+
+    def __init__(self, id, username, email, role, last_activity):
+        self.id = id
+        self.username = username
+        self.email = email
+        self.role = role
+        self.last_activity = last_activity
+
+    def load(self):
+        return db.session.get(User, self.id)
+
+    def __repr__(self):
+        return f'<Identity {self.id} {self.role}>'
+
+
+class IdentityCache:
+    # Кэш user_loader в памяти процесса: авторизованный запрос не ходит в БД
+    # за пользователем. Изменения в этом процессе сбрасывают запись сразу
+    # (invalidate), в остальных воркерах она устаревает за IDENTITY_CACHE_TTL.
+
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._entries = {}
+        self.ttl = 30
+        self.max_entries = 10000
+        self.hits = 0
+        self.misses = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('IDENTITY_CACHE_TTL', 30)
+        app.config.setdefault('IDENTITY_CACHE_SIZE', 10000)
+        self.ttl = float(app.config['IDENTITY_CACHE_TTL'])
+        self.max_entries = int(app.config['IDENTITY_CACHE_SIZE'])
+        app.extensions['identity'] = self
+
+    def get(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        row = db.session.query(*IDENTITY_COLUMNS).filter(User.id == user_id).first()
+        if row is None:
+            self.invalidate(user_id)
+            return None
+        identity = Identity(*row)
+        if self.ttl > 0:
+            with self._lock:
+                if len(self._entries) >= self.max_entries:
+                    self._prune(now)
+                self._entries[user_id] = (now + self.ttl, identity)
+        return identity
+
+    def _prune(self, now):
+        # Сначала истёкшие записи, затем самые старые (dict хранит порядок вставки)
+        for user_id in [user_id for user_id, entry in self._entries.items() if entry[0] <= now]:
+            del self._entries[user_id]
+        while len(self._entries) >= self.max_entries:
+            del self._entries[next(iter(self._entries))]
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+
+identity_cache = IdentityCache()
@@ -0,0 +1,265 @@
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import click
+from flask import current_app, url_for
+
+from models import db, Product
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Без Pillow храним только оригиналы
+    Image = None
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+
+# Ширины вариантов; строятся только те, что меньше оригинала
+WIDTHS = {'card': 320, 'detail': 800, 'banner': 1600}
+FORMATS = (('webp', 'WEBP', {'quality': 80, 'method': 4}), ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}))
+
+# Атрибут sizes для типовых мест вывода
+SIZES = {
+    'card': '(min-width: 768px) 25vw, 100vw',
+    'detail': '(min-width: 768px) 50vw, 100vw',
+    'banner': '100vw',
+}
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_ready = {}  # путь → (ширины вариантов, ширина оригинала, срок или None — бессрочно)
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def upload_root():
+    return current_app.config['UPLOAD_FOLDER']
+
+
+def _static_root():
+    return current_app.static_folder
+
+
+def _executor_for_process():
+    # Пул создаётся лениво и заново после fork, иначе потоки родителя теряются
+    global _executor, _executor_pid
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            workers = current_app.config.get('IMAGE_WORKERS', 2)
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='images')
+            _executor_pid = os.getpid()
+        return _executor
+
+
+def _hash_stream(stream):
+    digest = hashlib.sha256()
+    for chunk in iter(lambda: stream.read(64 * 1024), b''):
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest()[:32]
+
+
+def _relative(digest, ext):
+    # uploads/ab/ab12…ef.png — путь относительно static/
+    return f'uploads/{digest[:2]}/{digest}.{ext}'
+
+
+def _variant_relative(relative, width, ext):
+    base, _ = os.path.splitext(relative)
+    return f'{base}-{width}.{ext}'
+
+
+def store(stream, filename, background=True):
+    ext = os.path.splitext(filename or '')[1].lower().lstrip('.')
+    if ext not in ALLOWED_EXTENSIONS:
+        raise InvalidImage(f'Недопустимый формат изображения: {ext or "нет расширения"}')
+    if Image is not None:
+        try:
+            with Image.open(stream) as probe:
+                probe.verify()
+        except Exception as exc:
+            raise InvalidImage('Файл не является изображением') from exc
+        stream.seek(0)
+
+    digest = _hash_stream(stream)
+    relative = _relative(digest, 'jpg' if ext == 'jpeg' else ext)
+    target = os.path.join(_static_root(), relative)
+    if not os.path.exists(target):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Пишем во временный файл и атомарно переименовываем: параллельная
+        # загрузка того же файла не увидит недописанный оригинал
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+        with os.fdopen(fd, 'wb') as out:
+            shutil.copyfileobj(stream, out)
+        os.replace(tmp_path, target)
+    if background:
+        schedule_variants(relative)
+    return relative
+
+
+def store_upload(file_storage):
+    return store(file_storage.stream, file_storage.filename)
+
+
+def schedule_variants(relative):
+    if Image is None:
+        return None
+    app = current_app._get_current_object()
+    return _executor_for_process().submit(_build_variants_in_app, app, relative)
+
+
+def _build_variants_in_app(app, relative):
+    with app.app_context():
+        try:
+            return build_variants(relative)
+        except Exception:
+            app.logger.exception('Не удалось подготовить варианты изображения %s', relative)
+            return []
+
+
+def build_variants(relative):
+    if Image is None:
+        return []
+    source = os.path.join(_static_root(), relative)
+    built = []
+    with Image.open(source) as original:
+        original = ImageOps.exif_transpose(original)
+        for width in sorted(set(WIDTHS.values())):
+            if width >= original.width:
+                continue
+            height = round(original.height * width / original.width)
+            resized = original.resize((width, height), Image.LANCZOS)
+            for ext, fmt, options in FORMATS:
+                target = os.path.join(_static_root(), _variant_relative(relative, width, ext))
+                if os.path.exists(target):
+                    continue
+                if fmt == 'JPEG':
+                    image = resized.convert('RGB')
+                else:
+                    image = resized if resized.mode in ('RGB', 'RGBA') else resized.convert('RGBA')
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target))
+                with os.fdopen(fd, 'wb') as out:
+                    image.save(out, fmt, **options)
+                os.replace(tmp_path, target)
+            built.append(width)
+    if built:
+        _ready.pop(relative, None)
+    else:
+        # Оригинал не шире самого маленького варианта: вариантов не будет
+        _ready[relative] = ([], None, None)
+    return built
+
+
+def _available_widths(relative):
+    # Возвращает (ширины готовых вариантов, ширина оригинала). Варианты
+    # появляются асинхронно, поэтому их отсутствие помним только
+    # IMAGE_MISSING_TTL секунд: карточки не проверяют файлы на каждом рендере
+    cached = _ready.get(relative)
+    if cached is not None and (cached[2] is None or cached[2] > time.monotonic()):
+        return cached[:2]
+    widths = [
+        width for width in sorted(set(WIDTHS.values()))
+        if os.path.exists(os.path.join(_static_root(), _variant_relative(relative, width, 'jpg')))
+    ]
+    if not widths:
+        _ready[relative] = ([], None, time.monotonic() + current_app.config['IMAGE_MISSING_TTL'])
+        return [], None
+    original_width = None
+    if Image is not None:
+        try:
+            with Image.open(os.path.join(_static_root(), relative)) as original:
+                original_width = original.width
+        except OSError:
+            pass
+    _ready[relative] = (widths, original_width, None)
+    return widths, original_width
+
+
+def clear_cache():
+    _ready.clear()
+
+
+def resolve(image_url):
+    # Старые записи хранят либо имя файла в uploads/, либо путь от static/
+    if not image_url:
+        return None
+    if image_url.startswith('uploads/'):
+        return image_url
+    if os.path.exists(os.path.join(upload_root(), image_url)):
+        return 'uploads/' + image_url
+    return image_url
+
+
+def variants_ready(value):
+    # Входит в ключ кэша фрагментов: разметка меняется, когда готовы варианты
+    relative = resolve(value)
+    return bool(relative and _available_widths(relative)[0])
+
+
+def image_url(value, variant='card', ext='jpg'):
+    relative = resolve(value)
+    if relative is None:
+        return ''
+    widths, _ = _available_widths(relative)
+    fitting = [width for width in widths if width >= WIDTHS[variant]]
+    if fitting:
+        return url_for('static', filename=_variant_relative(relative, fitting[0], ext))
+    return url_for('static', filename=relative)
+
+
+def image_srcset(value, ext='jpg'):
+    relative = resolve(value)
+    if relative is None:
+        return ''
+    widths, original_width = _available_widths(relative)
+    candidates = [
+        f"{url_for('static', filename=_variant_relative(relative, width, ext))} {width}w"
+        for width in widths
+    ]
+    if candidates and original_width:
+        candidates.append(f"{url_for('static', filename=relative)} {original_width}w")
+    return ', '.join(candidates)
+
+
+def init_app(app):
+    app.config.setdefault('IMAGE_WORKERS', 2)
+    app.config.setdefault('IMAGE_MISSING_TTL', 30)
+    app.jinja_env.globals.update(
+        image_url=image_url, image_srcset=image_srcset, image_sizes=SIZES, variants_ready=variants_ready,
+    )
+
+    @app.cli.command('images-backfill')
+    @click.argument('source', default='img')
+    def images_backfill(source):
+        # Переносит исходные картинки (по умолчанию каталог img/) в хранилище
+        # по хэшу, строит варианты и обновляет товары с тем же именем файла
+        by_name = {}
+        for product in Product.query.filter(Product.image_url.isnot(None)):
+            by_name.setdefault(os.path.basename(product.image_url), []).append(product)
+
+        stored = updated = 0
+        for name in sorted(os.listdir(source)):
+            path = os.path.join(source, name)
+            if not os.path.isfile(path):
+                continue
+            try:
+                with open(path, 'rb') as stream:
+                    relative = store(stream, name, background=False)
+            except InvalidImage as exc:
+                print(f'{name}: {exc}')
+                continue
+            if Image is not None:
+                build_variants(relative)
+            stored += 1
+            for product in by_name.get(name, []):
+                product.image_url = relative
+                updated += 1
+        db.session.commit()
+        print(f'Обработано изображений: {stored}, обновлено товаров: {updated}')
@@ -0,0 +1,252 @@
+import cProfile
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import Response, abort, g, has_request_context, request, template_rendered, before_render_template
+from sqlalchemy import event
+
+from database import all_engines
+
+try:
+    import pyinstrument
+except ImportError:  # Без pyinstrument медленные запросы пишем в .prof (cProfile)
+    pyinstrument = None
+
+# Включается переменными окружения:
+#   METRICS_ENABLED=1        гистограммы, /metrics и заголовок Server-Timing
+#   METRICS_TOKEN            если задан, /metrics требует Authorization: Bearer <token>
+#   PROFILE_SAMPLE_RATE      доля запросов под профилировщиком (0 — выключено)
+#   PROFILE_SLOW_MS          профиль сохраняется, только если запрос дольше порога
+#   PROFILE_DIR              куда писать профили (по умолчанию instance/profiles)
+# Метрики считаются в пределах процесса: у каждого воркера свой /metrics.
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def cumulative(self):
+        running = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            running += count
+            yield ('+Inf' if bound == float('inf') else repr(bound)), running
+
+
+class Metrics:
+    def __init__(self):
+        self.enabled = False
+        self.latency = {}
+        self.sql_time = {}
+        self.template_time = {}
+        self.requests = {}
+        self.sql_statements = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('METRICS_ENABLED', False)
+        sample_rate = app.config.get('PROFILE_SAMPLE_RATE', 0.0)
+        if not self.enabled and not sample_rate:
+            return
+        app.extensions['metrics'] = self
+
+        with app.app_context():
+            for engine in all_engines():
+                event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        before_render_template.connect(_before_render, app)
+        template_rendered.connect(_after_render, app)
+
+        @app.before_request
+        def start_timing():
+            g.timings = {'db': 0.0, 'tpl': 0.0}
+            g.sql_count = 0
+            g.request_started = time.perf_counter()
+            if sample_rate and random.random() < sample_rate:
+                g.profiler = _start_profiler()
+
+        @app.after_request
+        def finish_timing(response):
+            started = g.pop('request_started', None)
+            if started is None:
+                return response
+            elapsed = time.perf_counter() - started
+            profiler = g.pop('profiler', None)
+            if profiler is not None:
+                _stop_profiler(app, profiler, elapsed)
+            if self.enabled:
+                self.record(request.endpoint or 'none', response.status_code, elapsed, g.timings, g.sql_count)
+                response.headers['Server-Timing'] = server_timing(elapsed, g.timings, g.sql_count)
+            return response
+
+        if self.enabled:
+            @app.route('/metrics')
+            def metrics():
+                token = app.config.get('METRICS_TOKEN')
+                if token and request.headers.get('Authorization') != f'Bearer {token}':
+                    abort(403)
+                return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+    def record(self, endpoint, status, elapsed, timings, sql_count):
+        with self._lock:
+            self.latency.setdefault(endpoint, Histogram()).observe(elapsed)
+            self.sql_time.setdefault(endpoint, Histogram()).observe(timings['db'])
+            self.template_time.setdefault(endpoint, Histogram()).observe(timings['tpl'])
+            key = (endpoint, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.sql_statements[endpoint] = self.sql_statements.get(endpoint, 0) + sql_count
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, help_text, histograms in (
+                ('http_request_duration_seconds', 'Время обработки запроса', self.latency),
+                ('http_request_sql_seconds', 'Время SQL-запросов в рамках запроса', self.sql_time),
+                ('http_request_template_seconds', 'Время рендера шаблонов в рамках запроса', self.template_time),
+            ):
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for endpoint, histogram in sorted(histograms.items()):
+                    for bound, count in histogram.cumulative():
+                        lines.append(f'{name}_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+                    lines.append(f'{name}_sum{{endpoint="{endpoint}"}} {histogram.total:.6f}')
+                    lines.append(f'{name}_count{{endpoint="{endpoint}"}} {histogram.count}')
+            lines.append('# HELP http_requests_total Количество запросов')
+            lines.append('# TYPE http_requests_total counter')
+            for (endpoint, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}')
+            lines.append('# HELP sql_statements_total Количество SQL-запросов')
+            lines.append('# TYPE sql_statements_total counter')
+            for endpoint, count in sorted(self.sql_statements.items()):
+                lines.append(f'sql_statements_total{{endpoint="{endpoint}"}} {count}')
+        lines.extend(_fragment_cache_lines())
+        lines.extend(_identity_cache_lines())
+        lines.extend(_suggest_lines())
+        return '\n'.join(lines) + '\n'
+
+
+def server_timing(elapsed, timings, sql_count):
+    parts = [f'app;dur={elapsed * 1000:.1f}', f'db;dur={timings["db"] * 1000:.1f};desc="{sql_count} queries"']
+    parts.extend(f'{name};dur={value * 1000:.1f}' for name, value in timings.items() if name != 'db')
+    return ', '.join(parts)
+
+
+@contextmanager
+def timed(name):
+    # Отдельный участок в Server-Timing: with timed('password'): user.check_password(...)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_request_context() and 'timings' in g:
+            g.timings[name] = g.timings.get(name, 0.0) + time.perf_counter() - started
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Отметка живёт в контексте выполнения, а не в conn.info: если запрос
+    # упадёт, after_cursor_execute не вызовется, и она уйдёт вместе с контекстом
+    if context is not None:
+        context.metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, 'metrics_started', None)
+    if started is not None and has_request_context() and 'timings' in g:
+        g.timings['db'] += time.perf_counter() - started
+        g.sql_count += 1
+
+
+def _before_render(sender, template, context, **extra):
+    if 'timings' in g:
+        g.setdefault('template_started', []).append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    stack = g.get('template_started')
+    if stack:
+        g.timings['tpl'] += time.perf_counter() - stack.pop()
+
+
+def _fragment_cache_lines():
+    from fragments import fragments
+    stats = fragments.stats()
+    return [
+        '# TYPE fragment_cache_hits_total counter',
+        f'fragment_cache_hits_total {stats["hits"]}',
+        '# TYPE fragment_cache_misses_total counter',
+        f'fragment_cache_misses_total {stats["misses"]}',
+        '# TYPE fragment_cache_entries gauge',
+        f'fragment_cache_entries {stats["size"]}',
+    ]
+
+
+def _identity_cache_lines():
+    from identity import identity_cache
+    stats = identity_cache.stats()
+    return [
+        '# TYPE identity_cache_hits_total counter',
+        f'identity_cache_hits_total {stats["hits"]}',
+        '# TYPE identity_cache_misses_total counter',
+        f'identity_cache_misses_total {stats["misses"]}',
+        '# TYPE identity_cache_entries gauge',
+        f'identity_cache_entries {stats["size"]}',
+    ]
+
+
+def _suggest_lines():
+    from suggest import suggestions
+    stats = suggestions.stats()
+    return [
+        '# TYPE suggest_index_products gauge',
+        f'suggest_index_products {stats["products"]}',
+        '# TYPE suggest_index_names gauge',
+        f'suggest_index_names {stats["names"]}',
+        '# TYPE suggest_index_words gauge',
+        f'suggest_index_words {stats["words"]}',
+    ]
+
+
+def _start_profiler():
+    if pyinstrument is not None:
+        profiler = pyinstrument.Profiler()
+        profiler.start()
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    return profiler
+
+
+def _stop_profiler(app, profiler, elapsed):
+    if isinstance(profiler, cProfile.Profile):
+        profiler.disable()
+    else:
+        profiler.stop()
+    if elapsed * 1000 < app.config.get('PROFILE_SLOW_MS', 500):
+        return
+    directory = app.config.get('PROFILE_DIR') or os.path.join(app.instance_path, 'profiles')
+    os.makedirs(directory, exist_ok=True)
+    name = f'{request.endpoint or "none"}-{int(time.time() * 1000)}-{elapsed * 1000:.0f}ms'
+    if isinstance(profiler, cProfile.Profile):
+        path = os.path.join(directory, name + '.prof')
+        profiler.dump_stats(path)
+    else:
+        path = os.path.join(directory, name + '.html')
+        with open(path, 'w', encoding='utf-8') as out:
+            out.write(profiler.output_html())
+    app.logger.info('Медленный запрос %s %s: %.0f мс, профиль %s', request.method, request.path, elapsed * 1000, path)
+
+
+metrics = Metrics()
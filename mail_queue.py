@@ -0,0 +1,255 @@
+import atexit
+import os
+import threading
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy import func, select, update
+
+from models import db, OutboxMessage
+
+outbox = OutboxMessage.__table__
+
+
+def enqueue(subject, recipients, body, sender=None):
+    # Письмо кладётся в текущую сессию и коммитится вместе с данными,
+    # ради которых оно отправляется
+    message = OutboxMessage(
+        subject=subject,
+        sender=sender,
+        recipients=','.join(recipients),
+        body=body,
+        status='pending',
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.session.add(message)
+    return message
+
+
+class MailQueue:
+    def __init__(self, app=None):
+        self.app = None
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.config.setdefault('MAIL_QUEUE_WORKERS', 2)
+        app.config.setdefault('MAIL_QUEUE_BATCH_SIZE', 20)
+        app.config.setdefault('MAIL_QUEUE_POLL_INTERVAL', 5)
+        app.config.setdefault('MAIL_QUEUE_MAX_ATTEMPTS', 6)
+        app.config.setdefault('MAIL_QUEUE_BACKOFF', 30)
+        app.config.setdefault('MAIL_QUEUE_LEASE', 300)
+        app.extensions['mail_queue'] = self
+        atexit.register(self.stop)
+        self._register_cli(app)
+
+        @app.before_request
+        def start_mail_queue():
+            # Отправители в каждом процессе (после fork — свои) стартуют с первым
+            # запросом, а не с первым заказом: иначе после перезапуска письма,
+            # ждущие повтора, лежат до следующего оформления заказа
+            if self.config['MAIL_QUEUE_WORKERS'] > 0:
+                self.start()
+
+    @property
+    def config(self):
+        return self.app.config
+
+    def notify(self):
+        # Будит фоновых отправителей сразу после коммита нового письма
+        if self.config['MAIL_QUEUE_WORKERS'] > 0:
+            self.start()
+            self._wakeup.set()
+
+    def start(self):
+        if self._threads and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._threads and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._threads = [
+                threading.Thread(target=self._run, name=f'mail-queue-{i}', daemon=True)
+                for i in range(self.config['MAIL_QUEUE_WORKERS'])
+            ]
+            for thread in self._threads:
+                thread.start()
+
+    def stop(self, timeout=10):
+        self._stop.set()
+        self._wakeup.set()
+        if self._pid == os.getpid():
+            for thread in self._threads:
+                thread.join(timeout=timeout)
+        self._threads = []
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                sent = self.process_batch()
+            except Exception:
+                self.app.logger.exception('Ошибка очереди писем')
+                sent = 0
+            if not sent:
+                self._wakeup.wait(self.config['MAIL_QUEUE_POLL_INTERVAL'])
+                self._wakeup.clear()
+
+    def _claim(self, conn, limit):
+        now = datetime.utcnow()
+        lease_expired = now - timedelta(seconds=self.config['MAIL_QUEUE_LEASE'])
+        # Письма, «зависшие» в sending после падения процесса, возвращаются в очередь
+        conn.execute(
+            update(outbox)
+            .where(outbox.c.status == 'sending', outbox.c.claimed_at < lease_expired)
+            .values(status='pending')
+        )
+        candidates = conn.execute(
+            select(outbox.c.id)
+            .where(outbox.c.status == 'pending', outbox.c.next_attempt_at <= now)
+            .order_by(outbox.c.next_attempt_at, outbox.c.id)
+            .limit(limit)
+        ).scalars().all()
+        claimed = []
+        for message_id in candidates:
+            # Условный UPDATE: письмо достаётся только одному отправителю
+            result = conn.execute(
+                update(outbox)
+                .where(outbox.c.id == message_id, outbox.c.status == 'pending')
+                .values(status='sending', claimed_at=now)
+            )
+            if result.rowcount:
+                claimed.append(message_id)
+        if not claimed:
+            return []
+        return conn.execute(select(outbox).where(outbox.c.id.in_(claimed))).mappings().all()
+
+    def process_batch(self, limit=None):
+        limit = limit or self.config['MAIL_QUEUE_BATCH_SIZE']
+        with self.app.app_context():
+            with db.engine.begin() as conn:
+                rows = self._claim(conn, limit)
+            if not rows:
+                return 0
+
+            mail = self._mail()
+            results = {}
+            try:
+                # Одно SMTP-соединение на всю пачку
+                with mail.connect() as connection:
+                    for row in rows:
+                        try:
+                            connection.send(self._message(row))
+                            results[row['id']] = None
+                        except Exception as exc:
+                            results[row['id']] = exc
+            except Exception as exc:
+                for row in rows:
+                    results.setdefault(row['id'], exc)
+
+            with db.engine.begin() as conn:
+                self._record(conn, rows, results)
+        return sum(1 for error in results.values() if error is None)
+
+    def _mail(self):
+        # Flask-Mail импортируется в первом отправителе, а не при старте воркера
+        mail = self.app.extensions.get('mail')
+        if mail is None:
+            from flask_mail import Mail
+            with self._lock:
+                mail = self.app.extensions.get('mail') or Mail(self.app)
+        return mail
+
+    def _message(self, row):
+        from flask_mail import Message
+        return Message(
+            row['subject'],
+            sender=row['sender'] or self.config.get('MAIL_DEFAULT_SENDER') or self.config.get('MAIL_USERNAME'),
+            recipients=row['recipients'].split(','),
+            body=row['body'],
+        )
+
+    def _record(self, conn, rows, results):
+        now = datetime.utcnow()
+        sent = [row['id'] for row in rows if results[row['id']] is None]
+        if sent:
+            conn.execute(
+                update(outbox).where(outbox.c.id.in_(sent))
+                .values(status='sent', sent_at=now, last_error=None)
+            )
+        for row in rows:
+            error = results[row['id']]
+            if error is None:
+                continue
+            attempts = row['attempts'] + 1
+            if attempts >= self.config['MAIL_QUEUE_MAX_ATTEMPTS']:
+                values = {'status': 'dead'}
+            else:
+                delay = self.config['MAIL_QUEUE_BACKOFF'] * 2 ** (attempts - 1)
+                values = {'status': 'pending', 'next_attempt_at': now + timedelta(seconds=delay)}
+            conn.execute(
+                update(outbox).where(outbox.c.id == row['id'])
+                .values(attempts=attempts, last_error=repr(error)[:1000], **values)
+            )
+
+    def drain(self):
+        total = 0
+        while True:
+            sent = self.process_batch()
+            if not sent:
+                return total
+            total += sent
+
+    def _register_cli(self, app):
+        group = click.Group('mail-queue', help='Очередь исходящих писем.')
+
+        @group.command('status')
+        def status():
+            with db.engine.connect() as conn:
+                counts = conn.execute(
+                    select(outbox.c.status, func.count()).group_by(outbox.c.status)
+                ).all()
+                for name, count in counts:
+                    print(f'{name}: {count}')
+                dead = conn.execute(
+                    select(outbox.c.id, outbox.c.recipients, outbox.c.attempts, outbox.c.last_error)
+                    .where(outbox.c.status == 'dead').order_by(outbox.c.id.desc()).limit(20)
+                ).all()
+                for row in dead:
+                    print(f'  #{row.id} {row.recipients} попыток: {row.attempts} — {row.last_error}')
+
+        @group.command('drain')
+        def drain():
+            print(f'Отправлено писем: {self.drain()}')
+
+        @group.command('retry-dead')
+        def retry_dead():
+            with db.engine.begin() as conn:
+                result = conn.execute(
+                    update(outbox).where(outbox.c.status == 'dead')
+                    .values(status='pending', attempts=0, next_attempt_at=datetime.utcnow())
+                )
+            print(f'Возвращено в очередь: {result.rowcount}')
+
+        @group.command('work')
+        def work():
+            # Отдельный процесс-отправитель (при MAIL_QUEUE_WORKERS=0 в веб-воркерах)
+            self.config['MAIL_QUEUE_WORKERS'] = max(self.config['MAIL_QUEUE_WORKERS'], 1)
+            self.start()
+            try:
+                while not self._stop.wait(1):
+                    pass
+            except KeyboardInterrupt:
+                self.stop()
+
+        app.cli.add_command(group)
+
+
+mail_queue = MailQueue()
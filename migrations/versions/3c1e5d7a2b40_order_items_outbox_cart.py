@@ -0,0 +1,100 @@
+"""order items, outbox, persistent cart, product sku
+
+Revision ID: 3c1e5d7a2b40
+Revises: 9a97f3947e14
+Create Date: 2026-10-18 09:10:00.000000
+
+Заказ из нескольких строк (order_item вместо order.product_id), очередь писем,
+корзина в БД, артикул и время изменения товара, длинные хэши паролей.
+Существующие заказы переносятся строкой с количеством 1 и текущей ценой товара.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1e5d7a2b40'
+down_revision = '9a97f3947e14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password_hash', existing_type=sa.String(length=128), type_=sa.String(length=256))
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('sku', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+        batch_op.create_unique_constraint('uq_product_seller_sku', ['seller_id', 'sku'])
+    op.execute(sa.text('UPDATE product SET updated_at = CURRENT_TIMESTAMP'))
+
+    op.create_table('order_item',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('price', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['order_id'], ['order.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.execute(sa.text(
+        'INSERT INTO order_item (order_id, product_id, quantity, price) '
+        'SELECT o.id, o.product_id, 1, p.price FROM "order" o LEFT JOIN product p ON p.id = o.product_id'
+    ))
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_column('product_id')
+
+    op.create_table('outbox_message',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('subject', sa.String(length=255), nullable=False),
+    sa.Column('sender', sa.String(length=120), nullable=True),
+    sa.Column('recipients', sa.Text(), nullable=False),
+    sa.Column('body', sa.Text(), nullable=False),
+    sa.Column('status', sa.String(length=16), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=True),
+    sa.Column('claimed_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('sent_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('outbox_message', schema=None) as batch_op:
+        batch_op.create_index('ix_outbox_message_status_next_attempt_at', ['status', 'next_attempt_at'], unique=False)
+
+    op.create_table('cart_item',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('added_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['product_id'], ['product.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'product_id')
+    )
+
+
+def downgrade():
+    op.drop_table('cart_item')
+    with op.batch_alter_table('outbox_message', schema=None) as batch_op:
+        batch_op.drop_index('ix_outbox_message_status_next_attempt_at')
+
+    op.drop_table('outbox_message')
+
+    # Из заказа с несколькими строками остаётся первый товар
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('product_id', sa.Integer(), nullable=True))
+    op.execute(sa.text(
+        'UPDATE "order" SET product_id = (SELECT min(i.product_id) FROM order_item i WHERE i.order_id = "order".id)'
+    ))
+    op.drop_table('order_item')
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_product_seller_sku', type_='unique')
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('sku')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.alter_column('password_hash', existing_type=sa.String(length=256), type_=sa.String(length=128))
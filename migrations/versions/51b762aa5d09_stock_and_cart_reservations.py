@@ -0,0 +1,43 @@
+"""product stock, cart reservations
+
+Revision ID: 51b762aa5d09
+Revises: 7f2a9c4e8d15
+Create Date: 2026-10-18 09:16:04.698854
+
+Свободный остаток товара (NULL — без учёта, так остаются существующие
+товары) и резерв единиц в строках корзины со сроком действия (см. stock.py).
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '51b762aa5d09'
+down_revision = '7f2a9c4e8d15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('cart_item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reserved', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('reserved_until', sa.DateTime(), nullable=True))
+        batch_op.create_index('ix_cart_item_product_id_reserved_until', ['product_id', 'reserved_until'], unique=False)
+        batch_op.create_index('ix_cart_item_reserved_until', ['reserved_until'], unique=False)
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('stock', sa.Integer(), nullable=True))
+        batch_op.create_check_constraint('ck_product_stock_nonnegative', 'stock >= 0')
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_constraint('ck_product_stock_nonnegative', type_='check')
+        batch_op.drop_column('stock')
+
+    with op.batch_alter_table('cart_item', schema=None) as batch_op:
+        batch_op.drop_index('ix_cart_item_reserved_until')
+        batch_op.drop_index('ix_cart_item_product_id_reserved_until')
+        batch_op.drop_column('reserved_until')
+        batch_op.drop_column('reserved')
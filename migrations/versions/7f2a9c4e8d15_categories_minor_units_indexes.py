@@ -0,0 +1,167 @@
+"""category table, prices in minor units, composite indexes, sales aggregates
+
+Revision ID: 7f2a9c4e8d15
+Revises: 3c1e5d7a2b40
+Create Date: 2026-10-18 09:20:00.000000
+
+Категория товара — ссылка на справочник category вместо строки; цены товара
+и строк заказа — целые копейки вместо float. Индексы под фильтры витрины,
+кабинета продавца и «Моих заказов». Полнотекстовый индекс product_fts
+(search_index.py) создаётся и заполняется здесь же, иначе обновлённая база
+молча искала бы через LIKE. После обновления выполните flask sales-rebuild.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f2a9c4e8d15'
+down_revision = '3c1e5d7a2b40'
+branch_labels = None
+depends_on = None
+
+# Справочник на момент миграции (catalog.CATEGORIES), не импортируем код приложения
+CATEGORIES = [
+    ('Футболки', 'tshirts'),
+    ('Ремни', 'belts'),
+    ('Часы', 'watches'),
+    ('Сумки', 'bags'),
+]
+
+# Как search_index.CREATE_FTS; «ё» в индексе хранится как «е»
+CREATE_FTS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5("
+    "name, short_description, long_description, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+
+def _fold(column):
+    return f"replace(replace(coalesce({column}, ''), 'ё', 'е'), 'Ё', 'Е')"
+
+
+def _sales_table(name, *columns):
+    return op.create_table(name,
+    *columns,
+    sa.Column('orders', sa.Integer(), nullable=False),
+    sa.Column('units', sa.Integer(), nullable=False),
+    sa.Column('revenue_cents', sa.BigInteger(), nullable=False),
+    )
+
+
+def upgrade():
+    category = op.create_table('category',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('slug', sa.String(length=64), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name'),
+    sa.UniqueConstraint('slug')
+    )
+    op.bulk_insert(category, [
+        {'name': name, 'slug': slug, 'position': position}
+        for position, (name, slug) in enumerate(CATEGORIES)
+    ])
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('category_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('price_cents', sa.Integer(), nullable=True))
+    # Категории, которых нет в справочнике, добавляются в него же
+    op.execute(sa.text(
+        'INSERT INTO category (name, slug, position) '
+        'SELECT DISTINCT p.category, p.category, 100 FROM product p '
+        'WHERE p.category IS NOT NULL AND p.category <> \'\' '
+        'AND NOT EXISTS (SELECT 1 FROM category c WHERE c.name = p.category OR c.slug = p.category)'
+    ))
+    op.execute(sa.text(
+        'UPDATE product SET '
+        'category_id = (SELECT c.id FROM category c WHERE c.name = product.category OR c.slug = product.category), '
+        'price_cents = CAST(round(price * 100) AS INTEGER)'
+    ))
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('category')
+        batch_op.drop_column('price')
+        batch_op.create_foreign_key('fk_product_category_id_category', 'category', ['category_id'], ['id'])
+        batch_op.create_index('ix_product_category_id_id', ['category_id', 'id'], unique=False)
+        batch_op.create_index('ix_product_seller_id_id', ['seller_id', 'id'], unique=False)
+        batch_op.create_index('ix_product_updated_at', ['updated_at'], unique=False)
+
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('price_cents', sa.Integer(), nullable=True))
+    op.execute(sa.text('UPDATE order_item SET price_cents = CAST(round(price * 100) AS INTEGER)'))
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.drop_column('price')
+        batch_op.create_index(batch_op.f('ix_order_item_order_id'), ['order_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_order_item_product_id'), ['product_id'], unique=False)
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.create_index('ix_order_user_id_created_at_id', ['user_id', 'created_at', 'id'], unique=False)
+
+    _sales_table('product_sales',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('seller_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('product_id'),
+    )
+    with op.batch_alter_table('product_sales', schema=None) as batch_op:
+        batch_op.create_index('ix_product_sales_seller_id_revenue_cents', ['seller_id', 'revenue_cents'], unique=False)
+
+    _sales_table('seller_sales',
+    sa.Column('seller_id', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('seller_id'),
+    )
+    with op.batch_alter_table('seller_sales', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_seller_sales_revenue_cents'), ['revenue_cents'], unique=False)
+
+    _sales_table('daily_sales',
+    sa.Column('seller_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.PrimaryKeyConstraint('seller_id', 'day'),
+    )
+    with op.batch_alter_table('daily_sales', schema=None) as batch_op:
+        batch_op.create_index('ix_daily_sales_day', ['day'], unique=False)
+
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute(sa.text(CREATE_FTS))
+        op.execute(sa.text(
+            'INSERT INTO product_fts (rowid, name, short_description, long_description) '
+            f"SELECT id, {_fold('name')}, {_fold('short_description')}, {_fold('long_description')} "
+            'FROM product'
+        ))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute(sa.text('DROP TABLE IF EXISTS product_fts'))
+    op.drop_table('daily_sales')
+    op.drop_table('seller_sales')
+    op.drop_table('product_sales')
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_user_id_created_at_id')
+
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_order_item_product_id'))
+        batch_op.drop_index(batch_op.f('ix_order_item_order_id'))
+        batch_op.add_column(sa.Column('price', sa.Float(), nullable=True))
+    op.execute(sa.text('UPDATE order_item SET price = price_cents / 100.0'))
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.drop_column('price_cents')
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_updated_at')
+        batch_op.drop_index('ix_product_seller_id_id')
+        batch_op.drop_index('ix_product_category_id_id')
+        batch_op.drop_constraint('fk_product_category_id_category', type_='foreignkey')
+        batch_op.add_column(sa.Column('category', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('price', sa.Float(), nullable=True))
+    op.execute(sa.text(
+        'UPDATE product SET price = price_cents / 100.0, '
+        'category = (SELECT c.name FROM category c WHERE c.id = product.category_id)'
+    ))
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('price_cents')
+        batch_op.drop_column('category_id')
+
+    op.drop_table('category')
@@ -1,52 +1,186 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from decimal import Decimal, ROUND_HALF_UP
 from flask_login import UserMixin
 
-db = SQLAlchemy()
+import passwords
+from routing import RoutingSession
+
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+# price_cents — INTEGER: цена в копейках должна поместиться в 32 бита
+MAX_PRICE = Decimal('10000000')
+
+
+def to_minor_units(value):
+    # Цены храним целым числом копеек: 1299.90 → 129990
+    if value is None:
+        return None
+    return int((Decimal(str(value)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def from_minor_units(value):
+    if value is None:
+        return None
+    return Decimal(value).scaleb(-2)
+
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(64), index=True, unique=True)
     email = db.Column(db.String(120), index=True, unique=True)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(256))  # scrypt от werkzeug длиннее 128 символов
     role = db.Column(db.String(64), default='buyer')
     last_activity = db.Column(db.DateTime, default=datetime.utcnow)
 
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = passwords.make_hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return passwords.verify_password(self.password_hash, password)
+
+class ProductCategory(db.Model):
+    __tablename__ = 'category'
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False, unique=True)
+    slug = db.Column(db.String(64), nullable=False, unique=True)
+    position = db.Column(db.Integer, nullable=False, default=0)  # Порядок на витрине
 
 class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(64), index=True)
     short_description = db.Column(db.String(128))
     long_description = db.Column(db.Text)
-    price = db.Column(db.Float)
-    category = db.Column(db.String(64))
+    price_cents = db.Column(db.Integer)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'))
     image_url = db.Column(db.String(128))
     seller_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    sku = db.Column(db.String(64))  # Артикул продавца; по нему обновляет товары импорт
+    stock = db.Column(db.Integer)  # Свободный остаток (без резервов в корзинах); NULL — не отслеживается
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     seller = db.relationship('User', backref='products')
+    category_ref = db.relationship('ProductCategory')
+
+    __table_args__ = (
+        db.UniqueConstraint('seller_id', 'sku', name='uq_product_seller_sku'),
+        # Страховка к условному списанию в stock.py: остаток не уходит в минус
+        db.CheckConstraint('stock >= 0', name='ck_product_stock_nonnegative'),
+        # Страница категории и витрина: фильтр по категории, keyset по id
+        db.Index('ix_product_category_id_id', 'category_id', 'id'),
+        # Товары продавца (кабинет, «Мои товары», витрина продавца)
+        db.Index('ix_product_seller_id_id', 'seller_id', 'id'),
+        # max(updated_at) для валидаторов HTTP-кэша
+        db.Index('ix_product_updated_at', 'updated_at'),
+    )
+
+    @property
+    def price(self):
+        return from_minor_units(self.price_cents)
+
+    @price.setter
+    def price(self, value):
+        self.price_cents = to_minor_units(value)
+
+    @property
+    def category(self):
+        return self.category_ref.name if self.category_ref is not None else None
 
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     address = db.Column(db.String(200), nullable=False)
     phone = db.Column(db.String(20), nullable=False)
     size = db.Column(db.String(20), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    product = db.relationship('Product')
     user = db.relationship('User')
     email = db.Column(db.String(120), nullable=False)  # Добавлено поле email
+    items = db.relationship('OrderItem', backref='order', cascade='all, delete-orphan', order_by='OrderItem.id')
+
+    # «Мои заказы»: заказы пользователя, новые сверху, keyset по (created_at, id)
+    __table_args__ = (db.Index('ix_order_user_id_created_at_id', 'user_id', 'created_at', 'id'),)
 
-    def __init__(self, product_id, user_id, address, phone, size, email):
-        self.product_id = product_id
+    def __init__(self, user_id, address, phone, size, email):
         self.user_id = user_id
         self.address = address
         self.phone = phone
         self.size = size
         self.email = email
         self.created_at = datetime.utcnow()
+
+    @property
+    def total(self):
+        return sum((item.price or 0) * item.quantity for item in self.items)
+
+class OrderItem(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id', ondelete='CASCADE'), nullable=False, index=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    price_cents = db.Column(db.Integer)  # Цена на момент заказа, в копейках
+    product = db.relationship('Product')
+
+    @property
+    def price(self):
+        return from_minor_units(self.price_cents)
+
+    @price.setter
+    def price(self, value):
+        self.price_cents = to_minor_units(value)
+
+class OutboxMessage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    subject = db.Column(db.String(255), nullable=False)
+    sender = db.Column(db.String(120))
+    recipients = db.Column(db.Text, nullable=False)  # Адреса через запятую
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='pending')  # pending / sending / sent / dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow)
+    claimed_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (db.Index('ix_outbox_message_status_next_attempt_at', 'status', 'next_attempt_at'),)
+
+class CartItem(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id'), primary_key=True)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    added_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Сколько единиц из quantity удержано из product.stock и до какого времени
+    reserved = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    reserved_until = db.Column(db.DateTime)
+    product = db.relationship('Product')
+
+    # Истёкшие резервы: все (stock-release) и по товару, когда он закончился
+    __table_args__ = (
+        db.Index('ix_cart_item_reserved_until', 'reserved_until'),
+        db.Index('ix_cart_item_product_id_reserved_until', 'product_id', 'reserved_until'),
+    )
+
+# Агрегаты продаж (см. sales.py): обновляются в транзакциях оформления и
+# отмены заказа, дашборды читают только их
+class ProductSales(db.Model):
+    product_id = db.Column(db.Integer, primary_key=True)
+    seller_id = db.Column(db.Integer, nullable=False)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue_cents = db.Column(db.BigInteger, nullable=False, default=0)
+
+    __table_args__ = (db.Index('ix_product_sales_seller_id_revenue_cents', 'seller_id', 'revenue_cents'),)
+
+class SellerSales(db.Model):
+    seller_id = db.Column(db.Integer, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue_cents = db.Column(db.BigInteger, nullable=False, default=0, index=True)
+
+class DailySales(db.Model):
+    seller_id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue_cents = db.Column(db.BigInteger, nullable=False, default=0)
+
+    __table_args__ = (db.Index('ix_daily_sales_day', 'day'),)
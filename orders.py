@@ -0,0 +1,56 @@
+from flask import current_app
+from sqlalchemy import insert
+
+from models import db, Product, Order, OrderItem
+from mail_queue import enqueue
+import cart_store
+import sales
+import stock
+
+
+def place_order(user_id, quantities, address, phone, size, email):
+    # Весь заказ — одна транзакция: списание остатков, шапка заказа, пакетная
+    # вставка строк, агрегаты продаж, очистка корзины и письмо-подтверждение
+    # в очереди. При любой ошибке (в том числе stock.OutOfStock) в БД не
+    # остаётся частично оформленного заказа.
+    rows = (
+        db.session.query(Product.id, Product.price_cents, Product.stock.isnot(None))
+        .filter(Product.id.in_(list(quantities)))
+        .all()
+    )
+    prices = {product_id: price_cents for product_id, price_cents, _ in rows}
+    if not prices:
+        return None
+    try:
+        stock.take(
+            user_id,
+            {product_id: quantity for product_id, quantity in quantities.items() if product_id in prices},
+            {product_id for product_id, _, tracked in rows if tracked},
+        )
+        order = Order(user_id=user_id, address=address, phone=phone, size=size, email=email)
+        db.session.add(order)
+        db.session.flush()
+        db.session.execute(insert(OrderItem), [
+            {
+                'order_id': order.id,
+                'product_id': product_id,
+                'quantity': quantity,
+                'price_cents': prices[product_id],
+            }
+            for product_id, quantity in quantities.items()
+            if product_id in prices
+        ])
+        sales.record_order(order.id)
+        item_count = sum(q for product_id, q in quantities.items() if product_id in prices)
+        enqueue(
+            'Подтверждение заказа',
+            [email],
+            f'Ваш заказ на {item_count} товаров успешно оформлен.\n\nАдрес доставки: {address}\nНомер телефона: {phone}\nРазмер: {size}\n\nСпасибо за ваш заказ!',
+            sender=current_app.config.get('MAIL_USERNAME'),
+        )
+        cart_store.clear(user_id)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return order
@@ -0,0 +1,159 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from flask import request, url_for
+from sqlalchemy import tuple_
+
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+URL_FOR_RESERVED = ('endpoint', '_anchor', '_method', '_scheme', '_external')
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f'Неподдерживаемый тип в курсоре: {type(value).__name__}')
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), default=_json_default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def _cursor_value(value, python_type):
+    # Значение из курсора — только скаляр типа столбца: курсор приходит от
+    # клиента, а списки и объекты драйвер БД принять не может
+    if value is None:
+        return None
+    if python_type in (datetime, date) and isinstance(value, str):
+        return python_type.fromisoformat(value)
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise ValueError('Курсор: ожидалось число или строка')
+    if python_type is None or isinstance(value, python_type):
+        return value
+    if python_type is float and isinstance(value, int):
+        return float(value)
+    if python_type is Decimal and isinstance(value, (int, float)):
+        return Decimal(str(value))
+    raise ValueError(f'Курсор: ожидался {python_type.__name__}')
+
+
+def decode_cursor(cursor, columns):
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (binascii.Error, ValueError):
+        return None
+    if not isinstance(values, list) or len(values) != len(columns):
+        return None
+    decoded = []
+    for column, value in zip(columns, values):
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            python_type = None
+        try:
+            decoded.append(_cursor_value(value, python_type))
+        except ValueError:
+            return None
+    return decoded
+
+
+def get_per_page(default=DEFAULT_PER_PAGE):
+    per_page = request.args.get('per_page', default, type=int)
+    return max(1, min(per_page, MAX_PER_PAGE))
+
+
+class KeysetPage:
+    def __init__(self, items, prefix, next_cursor, prev_cursor):
+        self.items = items
+        self.prefix = prefix
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def _url(self, **cursor):
+        # Параметры адреса маршрута важнее одноимённых из строки запроса;
+        # имена, которые url_for принимает сам (_external, endpoint, …), не передаём
+        args = request.args.to_dict()
+        args.pop(self.prefix + 'after', None)
+        args.pop(self.prefix + 'before', None)
+        args.update(cursor)
+        args.update(request.view_args or {})
+        for name in URL_FOR_RESERVED:
+            args.pop(name, None)
+        return url_for(request.endpoint, **args)
+
+    @property
+    def next_url(self):
+        if self.next_cursor is None:
+            return None
+        return self._url(**{self.prefix + 'after': self.next_cursor})
+
+    @property
+    def prev_url(self):
+        if self.prev_cursor is None:
+            return None
+        return self._url(**{self.prefix + 'before': self.prev_cursor})
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def paginate(query, columns, prefix='', per_page=None, descending=False, key=None):
+    # Пагинация по ключу (seek): WHERE (col1, col2) > (:v1, :v2) ORDER BY col1, col2.
+    # Последний столбец в columns должен быть уникальным (обычно id).
+    columns = tuple(columns)
+    per_page = per_page or get_per_page()
+    if key is None:
+        def key(item):
+            return tuple(getattr(item, column.key) for column in columns)
+
+    after = decode_cursor(request.args.get(prefix + 'after'), columns)
+    before = None if after is not None else decode_cursor(request.args.get(prefix + 'before'), columns)
+    backwards = before is not None
+
+    row_key = tuple_(*columns)
+    if after is not None:
+        query = query.filter(row_key < tuple_(*after) if descending else row_key > tuple_(*after))
+    elif backwards:
+        query = query.filter(row_key > tuple_(*before) if descending else row_key < tuple_(*before))
+
+    ascending = descending == backwards
+    query = query.order_by(*[c.asc() if ascending else c.desc() for c in columns])
+    rows = query.limit(per_page + 1).all()
+
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    if backwards:
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, after is not None
+
+    next_cursor = prev_cursor = None
+    if rows and has_next:
+        next_cursor = encode_cursor(key(rows[-1]))
+    if rows and has_prev:
+        prev_cursor = encode_cursor(key(rows[0]))
+    return KeysetPage(rows, prefix, next_cursor, prev_cursor)
@@ -0,0 +1,237 @@
+import atexit
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+try:
+    import argon2
+    from argon2.exceptions import InvalidHashError, VerificationError
+except ImportError:  # argon2-cffi необязателен; без него доступны scrypt и pbkdf2
+    argon2 = None
+
+# Настройки (переменные окружения с теми же именами):
+#   PASSWORD_HASH_METHOD   scrypt:32768:8:1 (по умолчанию), pbkdf2:sha256:600000 или argon2
+#   ARGON2_TIME_COST, ARGON2_MEMORY_COST (КиБ), ARGON2_PARALLELISM
+#   PASSWORD_POOL          thread или process — где считать хэши
+#   PASSWORD_WORKERS       размер пула
+#   PASSWORD_MAX_PENDING   сколько проверок может ждать пул; сверх этого — PasswordPoolBusy
+#   LOGIN_RATE_IP          попыток входа с одного IP: «20/60» — 20 за 60 секунд
+#   LOGIN_RATE_EMAIL       неудачных попыток на один email: «5/300»
+# Хэши с другими параметрами продолжают проверяться и заменяются при входе.
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+
+
+class PasswordPoolBusy(RuntimeError):
+    pass
+
+
+def _argon2_hasher(params):
+    return argon2.PasswordHasher(
+        time_cost=params['time_cost'], memory_cost=params['memory_cost'], parallelism=params['parallelism'],
+    )
+
+
+def hash_password(password, method, argon2_params=None):
+    # Модульные функции без обращения к current_app — их можно отправить в ProcessPool
+    if method == 'argon2':
+        if argon2 is None:
+            raise RuntimeError('Для PASSWORD_HASH_METHOD=argon2 установите argon2-cffi')
+        return _argon2_hasher(argon2_params).hash(password)
+    return generate_password_hash(password, method=method)
+
+
+def verify_password(stored, password):
+    if not stored:
+        return False
+    if stored.startswith('$argon2'):
+        if argon2 is None:
+            return False
+        try:
+            return argon2.PasswordHasher().verify(stored, password)
+        except (VerificationError, InvalidHashError):
+            return False
+    return check_password_hash(stored, password)
+
+
+def _argon2_params(config):
+    return {
+        'time_cost': config['ARGON2_TIME_COST'],
+        'memory_cost': config['ARGON2_MEMORY_COST'],
+        'parallelism': config['ARGON2_PARALLELISM'],
+    }
+
+
+_hash_prefixes = {}
+
+
+def _hash_prefix(method):
+    # werkzeug дописывает параметры по умолчанию ('scrypt' → 'scrypt:32768:8:1',
+    # 'pbkdf2' → 'pbkdf2:sha256:1000000'); сравниваем с префиксом настоящего хэша
+    if method not in _hash_prefixes:
+        _hash_prefixes[method] = generate_password_hash('', method=method).split('$', 1)[0]
+    return _hash_prefixes[method]
+
+
+def needs_rehash(stored, config=None):
+    config = config or current_app.config
+    method = config['PASSWORD_HASH_METHOD']
+    if stored.startswith('$argon2'):
+        return method != 'argon2' or argon2 is None or _argon2_hasher(_argon2_params(config)).check_needs_rehash(stored)
+    return method == 'argon2' or stored.split('$', 1)[0] != _hash_prefix(method)
+
+
+def make_hash(password):
+    config = current_app.config
+    return hash_password(password, config['PASSWORD_HASH_METHOD'], _argon2_params(config))
+
+
+class HashingPool:
+    # Ограниченный пул: проверки паролей не занимают все потоки сервера, а
+    # лишние запросы получают отказ сразу, не выстраиваясь в очередь
+    def __init__(self):
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._slots = None
+
+    def _get_executor(self):
+        config = current_app.config
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                workers = config['PASSWORD_WORKERS']
+                if config['PASSWORD_POOL'] == 'process':
+                    self._executor = ProcessPoolExecutor(max_workers=workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='passwords')
+                self._slots = threading.BoundedSemaphore(workers + config['PASSWORD_MAX_PENDING'])
+                self._pid = os.getpid()
+            return self._executor, self._slots
+
+    def run(self, fn, *args):
+        executor, slots = self._get_executor()
+        if not slots.acquire(blocking=False):
+            raise PasswordPoolBusy('Слишком много одновременных проверок пароля')
+        try:
+            future = executor.submit(fn, *args)
+            try:
+                return future.result(timeout=current_app.config['PASSWORD_TIMEOUT'])
+            except FutureTimeout:
+                future.cancel()
+                raise PasswordPoolBusy('Проверка пароля не уложилась в PASSWORD_TIMEOUT')
+        finally:
+            slots.release()
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+pool = HashingPool()
+_dummy_hashes = {}
+
+
+def _dummy_hash(config):
+    # Для несуществующего email тоже считаем хэш: время ответа не выдаёт,
+    # зарегистрирован ли адрес
+    method = config['PASSWORD_HASH_METHOD']
+    if method not in _dummy_hashes:
+        _dummy_hashes[method] = hash_password('dummy-password', method, _argon2_params(config))
+    return _dummy_hashes[method]
+
+
+def authenticate(user, password):
+    # Возвращает True, если пароль верный; при устаревших параметрах хэша
+    # записывает новый (коммит остаётся за вызывающим кодом)
+    config = current_app.config
+    stored = user.password_hash if user is not None and user.password_hash else _dummy_hash(config)
+    valid = pool.run(verify_password, stored, password)
+    if not valid or user is None:
+        return False
+    if needs_rehash(stored, config):
+        user.password_hash = pool.run(hash_password, password, config['PASSWORD_HASH_METHOD'], _argon2_params(config))
+    return True
+
+
+def _parse_rate(value):
+    limit, _, window = str(value).partition('/')
+    return int(limit), float(window or 60)
+
+
+class LoginThrottle:
+    # Скользящее окно в памяти процесса: на IP считаются все попытки, на email —
+    # только неудачные (чтобы нельзя было заблокировать чужой аккаунт удачными входами)
+    def __init__(self):
+        self._attempts = {}
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+    def _hit(self, key, limit, window, now, record):
+        with self._lock:
+            events = self._attempts.setdefault(key, deque())
+            while events and events[0] <= now - window:
+                events.popleft()
+            if len(events) >= limit:
+                return events[0] + window - now
+            if record:
+                events.append(now)
+            return 0
+
+    def _prune(self, now, window):
+        if now - self._last_prune < window:
+            return
+        with self._lock:
+            self._last_prune = now
+            for key in [key for key, events in self._attempts.items() if not events or events[-1] <= now - window]:
+                del self._attempts[key]
+
+    def check(self, ip, email):
+        # Возвращает, сколько секунд подождать (0 — можно пробовать)
+        config = current_app.config
+        now = time.monotonic()
+        ip_limit, ip_window = _parse_rate(config['LOGIN_RATE_IP'])
+        email_limit, email_window = _parse_rate(config['LOGIN_RATE_EMAIL'])
+        self._prune(now, max(ip_window, email_window))
+        wait = self._hit(('email', email.casefold()), email_limit, email_window, now, record=False)
+        if wait:
+            return wait
+        return self._hit(('ip', ip), ip_limit, ip_window, now, record=True)
+
+    def failed(self, email):
+        with self._lock:
+            self._attempts.setdefault(('email', email.casefold()), deque()).append(time.monotonic())
+
+    def succeeded(self, email):
+        with self._lock:
+            self._attempts.pop(('email', email.casefold()), None)
+
+    def reset(self):
+        with self._lock:
+            self._attempts.clear()
+
+
+throttle = LoginThrottle()
+
+
+def init_app(app):
+    app.config.setdefault('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+    app.config.setdefault('ARGON2_TIME_COST', 2)
+    app.config.setdefault('ARGON2_MEMORY_COST', 19456)
+    app.config.setdefault('ARGON2_PARALLELISM', 1)
+    app.config.setdefault('PASSWORD_POOL', 'thread')
+    app.config.setdefault('PASSWORD_WORKERS', 2)
+    app.config.setdefault('PASSWORD_MAX_PENDING', 16)
+    app.config.setdefault('PASSWORD_TIMEOUT', 10)
+    app.config.setdefault('LOGIN_RATE_IP', '20/60')
+    app.config.setdefault('LOGIN_RATE_EMAIL', '5/300')
+    if app.config['PASSWORD_HASH_METHOD'] == 'argon2' and argon2 is None:
+        raise RuntimeError('Для PASSWORD_HASH_METHOD=argon2 установите argon2-cffi')
+    app.extensions['passwords'] = pool
+    atexit.register(pool.shutdown)
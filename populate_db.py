@@ -1,5 +1,8 @@
 from app import create_app, db
 from models import User, Product
+import product_import
+import search_index
+from catalog import catalog, category_ids
 
 def populate():
     app = create_app()
@@ -16,157 +19,159 @@ def populate():
 
         # Проверка существующих товаров
         if Product.query.count() == 0:
+            categories = category_ids()
             products = [
-                Product(
+                dict(
+                    sku='demo-1',
                     name='Футболка 1',
                     short_description='Описание футболки 1',
                     long_description='',
-                    price=1000.0,
-                    category='Футболки',
-                    image_url='tshirts/tshirt1.png',
-                    seller_id=admin.id
+                    price_cents=100000,
+                    category_id=categories['футболки'],
+                    image_url='tshirts/tshirt1.png'
                 ),
-                Product(
+                dict(
+                    sku='demo-2',
                     name='Футболка 2',
                     short_description='Описание футболки 2',
                     long_description='',
-                    price=1200.0,
-                    category='Футболки',
-                    image_url='tshirts/tshirt2.png',
-                    seller_id=admin.id
+                    price_cents=120000,
+                    category_id=categories['футболки'],
+                    image_url='tshirts/tshirt2.png'
                 ),
-                Product(
+                dict(
+                    sku='demo-3',
                     name='Футболка 3',
                     short_description='Описание футболки 3',
                     long_description='',
-                    price=1100.0,
-                    category='Футболки',
-                    image_url='tshirts/tshirt3.png',
-                    seller_id=admin.id
+                    price_cents=110000,
+                    category_id=categories['футболки'],
+                    image_url='tshirts/tshirt3.png'
                 ),
-                Product(
+                dict(
+                    sku='demo-4',
                     name='Футболка 4',
                     short_description='Описание футболки 4',
                     long_description='',
-                    price=1300.0,
-                    category='Футболки',
-                    image_url='tshirts/tshirt4.png',
-                    seller_id=admin.id
+                    price_cents=130000,
+                    category_id=categories['футболки'],
+                    image_url='tshirts/tshirt4.png'
                 ),
-                Product(
+                dict(
+                    sku='demo-5',
                     name='Ремень 1',
                     short_description='Описание ремня 1',
                     long_description='',
-                    price=800.0,
-                    category='Ремни',
-                    image_url='belts/belt1.png',
-                    seller_id=admin.id
+                    price_cents=80000,
+                    category_id=categories['ремни'],
+                    image_url='belts/belt1.png'
                 ),
-                Product(
+                dict(
+                    sku='demo-6',
                     name='Ремень 2',
                     short_description='Описание ремня 2',
                     long_description='',
-                    price=900.0,
-                    category='Ремни',
-                    image_url='belts/belt2.png',
-                    seller_id=admin.id
+                    price_cents=90000,
+                    category_id=categories['ремни'],
+                    image_url='belts/belt2.png'
                 ),
-                Product(
+                dict(
+                    sku='demo-7',
                     name='Ремень 3',
                     short_description='Описание ремня 3',
                     long_description='',
-                    price=850.0,
-                    category='Ремни',
-                    image_url='belts/belt3.png',
-                    seller_id=admin.id
+                    price_cents=85000,
+                    category_id=categories['ремни'],
+                    image_url='belts/belt3.png'
                 ),
-                Product(
+                dict(
+                    sku='demo-8',
                     name='Ремень 4',
                     short_description='Описание ремня 4',
                     long_description='',
-                    price=950.0,
-                    category='Ремни',
-                    image_url='belts/belt4.png',
-                    seller_id=admin.id
+                    price_cents=95000,
+                    category_id=categories['ремни'],
+                    image_url='belts/belt4.png'
                 ),
-                Product(
+                dict(
+                    sku='demo-9',
                     name='Часы 1',
                     short_description='Описание часов 1',
                     long_description='',
-                    price=5000.0,
-                    category='Часы',
-                    image_url='watches/watches1.png',
-                    seller_id=admin.id
+                    price_cents=500000,
+                    category_id=categories['часы'],
+                    image_url='watches/watches1.png'
                 ),
-                Product(
+                dict(
+                    sku='demo-10',
                     name='Часы 2',
                     short_description='Описание часов 2',
                     long_description='',
-                    price=6000.0,
-                    category='Часы',
-                    image_url='watches/watches2.png',
-                    seller_id=admin.id
+                    price_cents=600000,
+                    category_id=categories['часы'],
+                    image_url='watches/watches2.png'
                 ),
-                Product(
+                dict(
+                    sku='demo-11',
                     name='Часы 3',
                     short_description='Описание часов 3',
                     long_description='',
-                    price=7000.0,
-                    category='Часы',
-                    image_url='watches/watches3.png',
-                    seller_id=admin.id
+                    price_cents=700000,
+                    category_id=categories['часы'],
+                    image_url='watches/watches3.png'
                 ),
-                Product(
+                dict(
+                    sku='demo-12',
                     name='Часы 4',
                     short_description='Описание часов 4',
                     long_description='',
-                    price=4000.0,
-                    category='Часы',
-                    image_url='watches/watches4.png',
-                    seller_id=admin.id
+                    price_cents=400000,
+                    category_id=categories['часы'],
+                    image_url='watches/watches4.png'
                 ),
-                Product(
+                dict(
+                    sku='demo-13',
                     name='Сумка 1',
                     short_description='Описание сумки 1',
                     long_description='',
-                    price=1000.0,
-                    category='Сумки',
-                    image_url='bags/bags1.png',
-                    seller_id=admin.id
+                    price_cents=100000,
+                    category_id=categories['сумки'],
+                    image_url='bags/bags1.png'
                 ),
-                Product(
+                dict(
+                    sku='demo-14',
                     name='Сумка 2',
                     short_description='Описание сумки 2',
                     long_description='',
-                    price=1200.0,
-                    category='Сумки',
-                    image_url='bags/bags2.png',
-                    seller_id=admin.id
+                    price_cents=120000,
+                    category_id=categories['сумки'],
+                    image_url='bags/bags2.png'
                 ),
-                Product(
+                dict(
+                    sku='demo-15',
                     name='Сумка 3',
                     short_description='Описание сумки 3',
                     long_description='',
-                    price=1100.0,
-                    category='Сумки',
-                    image_url='bags/bags3.png',
-                    seller_id=admin.id
+                    price_cents=110000,
+                    category_id=categories['сумки'],
+                    image_url='bags/bags3.png'
                 ),
-                Product(
+                dict(
+                    sku='demo-16',
                     name='Сумка 4',
                     short_description='Описание сумки 4',
                     long_description='',
-                    price=1300.0,
-                    category='Сумки',
-                    image_url='bags/bags4.png',
-                    seller_id=admin.id
+                    price_cents=130000,
+                    category_id=categories['сумки'],
+                    image_url='bags/bags4.png'
                 )
             ]
 
-            for product in products:
-                db.session.add(product)
-
+            # Та же пачечная запись, что и у импорта товаров продавцом
+            product_ids = product_import.upsert_products(admin.id, products)
+            search_index.index_products(db.session.connection(), product_ids)
             db.session.commit()
+            catalog.invalidate()
             print("База данных успешно заполнена!")
 
 if __name__ == "__main__":
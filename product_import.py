@@ -0,0 +1,250 @@
+import csv
+import io
+import json
+import os
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+import click
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects import postgresql, sqlite
+
+from catalog import catalog, category_ids
+from models import db, Product, User, MAX_PRICE, to_minor_units
+import search_index
+from suggest import suggestions
+
+# Массовая загрузка товаров продавца из CSV (заголовок в первой строке) или
+# JSONL (объект на строку). Поля: sku, name, short_description,
+# long_description, price, category, image_url. Строки читаются потоком и
+# пишутся пачками INSERT ... ON CONFLICT (seller_id, sku) DO UPDATE, каждая
+# пачка — отдельная транзакция; строки с ошибками пропускаются. Пустой
+# image_url не стирает картинку уже загруженного товара.
+
+product_table = Product.__table__
+
+FIELDS = ('sku', 'name', 'short_description', 'long_description', 'price', 'category', 'image_url')
+REQUIRED = ('sku', 'name', 'short_description', 'long_description', 'price')
+UPDATABLE = ('name', 'short_description', 'long_description', 'price_cents', 'category_id', 'image_url', 'updated_at')
+FIELD_LABELS = {
+    'sku': 'Артикул',
+    'name': 'Название',
+    'short_description': 'Краткое описание',
+    'long_description': 'Длинное описание',
+    'price': 'Цена',
+    'category': 'Категория',
+    'image_url': 'Изображение',
+}
+# Ограничения длины берём из колонок таблицы
+LENGTHS = {
+    field: product_table.c[field].type.length
+    for field in FIELDS
+    if field in product_table.c and getattr(product_table.c[field].type, 'length', None)
+}
+FORMATS = {'.csv': 'csv', '.jsonl': 'jsonl', '.ndjson': 'jsonl'}
+
+_UPSERT_DIALECTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+RowError = namedtuple('RowError', ['line', 'sku', 'message'])
+
+
+class ImportReport:
+    def __init__(self, max_errors=1000):
+        self.max_errors = max_errors
+        self.processed = 0
+        self.imported = 0
+        self.failed = 0
+        self.errors = []
+
+    def add_error(self, line, sku, message):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(RowError(line, sku, message))
+
+    @property
+    def truncated(self):
+        return self.failed > len(self.errors)
+
+
+def detect_format(filename):
+    return FORMATS.get(os.path.splitext(filename or '')[1].lower())
+
+
+def read_rows(stream, fmt):
+    # Отдаёт (номер строки, словарь или None, ошибка разбора); файл не читается целиком
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        if fmt == 'csv':
+            reader = csv.DictReader(text)
+            for row in reader:
+                yield reader.line_num, row, None
+            return
+        for number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as exc:
+                yield number, None, f'Некорректный JSON: {exc}'
+                continue
+            if not isinstance(row, dict):
+                yield number, None, 'Ожидался JSON-объект'
+                continue
+            yield number, row, None
+    finally:
+        # Исходный поток остаётся открытым: им владеет вызывающий код
+        text.detach()
+
+
+def validate_row(row, categories, default_category=None):
+    # Те же правила, что у ProductForm (поля обязательны, цена — число), плюс
+    # длины колонок и известная категория. Возвращает (values, None) или (None, ошибка);
+    # values уже в виде строки таблицы: price_cents и category_id вместо price и category.
+    values = {}
+    for field in FIELDS:
+        value = row.get(field)
+        values[field] = '' if value is None else str(value).strip()
+    for field in REQUIRED:
+        if not values[field]:
+            return None, f'{FIELD_LABELS[field]}: обязательное поле'
+    for field, length in LENGTHS.items():
+        if len(values[field]) > length:
+            return None, f'{FIELD_LABELS[field]}: не длиннее {length} символов'
+
+    try:
+        price = Decimal(values['price'].replace(' ', '').replace(',', '.'))
+    except InvalidOperation:
+        return None, 'Цена: требуется число'
+    if not price.is_finite() or price <= 0:
+        return None, 'Цена: должна быть больше нуля'
+    if price > MAX_PRICE:
+        return None, f'Цена: не больше {MAX_PRICE}'
+    del values['price']
+    values['price_cents'] = to_minor_units(price)
+    if not values['price_cents']:
+        return None, 'Цена: должна быть не меньше 0.01'
+
+    category = values.pop('category') or default_category
+    if not category:
+        return None, 'Категория: обязательное поле'
+    values['category_id'] = categories.get(category.casefold())
+    if values['category_id'] is None:
+        return None, f'Категория: неизвестная категория «{category}»'
+    values['image_url'] = values['image_url'] or None
+    return values, None
+
+
+def upsert_products(seller_id, rows):
+    # rows — проверенные словари с уникальными sku; возвращает id записанных товаров
+    now = datetime.utcnow()
+    for row in rows:
+        row['seller_id'] = seller_id
+        row['updated_at'] = now
+    insert = _UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    if insert is not None:
+        stmt = insert(product_table)
+        set_ = {column: stmt.excluded[column] for column in UPDATABLE}
+        set_['image_url'] = func.coalesce(stmt.excluded.image_url, product_table.c.image_url)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[product_table.c.seller_id, product_table.c.sku],
+            set_=set_,
+        )
+        db.session.execute(stmt, rows)
+    else:
+        for row in rows:
+            result = db.session.execute(
+                update(product_table)
+                .where(product_table.c.seller_id == seller_id, product_table.c.sku == row['sku'])
+                .values({column: row[column] for column in UPDATABLE if column != 'image_url' or row[column]})
+            )
+            if not result.rowcount:
+                db.session.execute(product_table.insert(), row)
+
+    return db.session.execute(
+        select(product_table.c.id)
+        .where(product_table.c.seller_id == seller_id, product_table.c.sku.in_([row['sku'] for row in rows]))
+    ).scalars().all()
+
+
+def _flush_chunk(seller_id, chunk, report):
+    # chunk — {sku: (номер строки, values)}; ошибка БД отменяет только эту пачку
+    rows = [values for _, values in chunk.values()]
+    try:
+        product_ids = upsert_products(seller_id, rows)
+        # Core-вставки обходят события маппера — индекс поиска обновляем здесь же
+        search_index.index_products(db.session.connection(), product_ids)
+        db.session.commit()
+    except SQLAlchemyError as exc:
+        db.session.rollback()
+        message = f'Пачка не записана: {getattr(exc, "orig", exc)}'
+        for sku, (line, _) in chunk.items():
+            report.add_error(line, sku, message)
+        return
+    report.imported += len(rows)
+
+
+def import_products(stream, seller_id, fmt='csv', default_category=None, chunk_size=1000, max_errors=1000):
+    report = ImportReport(max_errors)
+    categories = category_ids()
+    chunk = {}
+    try:
+        for line, row, error in read_rows(stream, fmt):
+            report.processed += 1
+            if error is None:
+                values, error = validate_row(row, categories, default_category)
+            if error is not None:
+                report.add_error(line, (row or {}).get('sku'), error)
+                continue
+            # Повтор артикула внутри пачки: побеждает последняя строка
+            chunk[values['sku']] = (line, values)
+            if len(chunk) >= chunk_size:
+                _flush_chunk(seller_id, chunk, report)
+                chunk = {}
+        if chunk:
+            _flush_chunk(seller_id, chunk, report)
+    except (csv.Error, UnicodeDecodeError) as exc:
+        db.session.rollback()
+        report.add_error(report.processed + 1, None, f'Не удалось прочитать файл: {exc}')
+    finally:
+        if report.imported:
+            catalog.invalidate()
+            # Core-вставки не видны событиям маппера — подсказки догоняем по updated_at
+            if suggestions.ready:
+                suggestions.refresh()
+    return report
+
+
+def _find_seller(value):
+    if value.isdigit():
+        return db.session.get(User, int(value))
+    return User.query.filter_by(email=value).first()
+
+
+def init_app(app):
+    app.config.setdefault('PRODUCT_IMPORT_CHUNK_SIZE', 1000)
+
+    @app.cli.command('products-import')
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--seller', required=True, help='id или email продавца')
+    @click.option('--category', default=None, help='категория для строк без своей')
+    @click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), default=None)
+    @click.option('--chunk-size', default=None, type=int)
+    def products_import(path, seller, category, fmt, chunk_size):
+        user = _find_seller(seller)
+        if user is None:
+            raise click.ClickException(f'Продавец {seller} не найден')
+        fmt = fmt or detect_format(path)
+        if fmt is None:
+            raise click.ClickException('Не удалось определить формат, укажите --format')
+        with open(path, 'rb') as stream:
+            report = import_products(
+                stream, user.id, fmt, category,
+                chunk_size=chunk_size or app.config['PRODUCT_IMPORT_CHUNK_SIZE'],
+            )
+        print(f'Строк: {report.processed}, загружено: {report.imported}, с ошибками: {report.failed}')
+        for error in report.errors[:50]:
+            print(f'  строка {error.line} ({error.sku or "без артикула"}): {error.message}')
+        if report.failed > 50:
+            print(f'  … и ещё {report.failed - 50}')
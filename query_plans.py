@@ -0,0 +1,166 @@
+import re
+from collections import namedtuple
+from urllib.parse import quote
+
+import click
+from sqlalchemy import event
+
+from catalog import catalog, categories
+from database import all_engines
+from models import db, User, Product
+
+# Проверка планов запросов: обходим основные страницы тестовым клиентом,
+# записываем их SELECT'ы с параметрами и прогоняем через EXPLAIN QUERY PLAN.
+# Полный просмотр таблицы (SCAN без покрывающего индекса) считается ошибкой,
+# кроме запросов с LIMIT без WHERE и без сортировки во временном B-дереве —
+# такой просмотр останавливается на первых строках — и случаев из ALLOWED.
+
+# (роль или None для анонимного посетителя, endpoint); адреса строятся в _paths
+ROUTES = [
+    (None, 'index'),
+    (None, 'category'),
+    (None, 'product_detail'),
+    (None, 'search'),
+    ('buyer', 'cart'),
+    ('buyer', 'my_orders'),
+    ('seller', 'seller_dashboard'),
+    ('seller', 'my_products'),
+    ('admin', 'admin_dashboard'),
+    (None, 'api.products'),
+    (None, 'api.product'),
+    (None, 'api.search'),
+    ('buyer', 'api.cart'),
+    ('buyer', 'api.orders'),
+]
+
+# (endpoint, таблица) → почему полный просмотр допустим
+ALLOWED = {
+    ('index', 'category'): 'справочник из нескольких строк',
+    ('admin_dashboard', 'seller_sales'): 'лидеры: обход индекса по выручке до LIMIT, фильтр отсекает лишь строку SHOP_ID',
+}
+
+SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)')
+
+Problem = namedtuple('Problem', ['endpoint', 'table', 'statement', 'plan'])
+
+
+def _paths():
+    product = Product.query.order_by(Product.id).first()
+    first_category = next(iter(categories()), None)
+    paths = {'index': '/', 'cart': '/cart', 'my_orders': '/my_orders', 'seller_dashboard': '/seller_dashboard',
+             'my_products': '/my_products', 'admin_dashboard': '/admin_dashboard',
+             'api.cart': '/api/v1/cart', 'api.orders': '/api/v1/orders'}
+    if first_category is not None:
+        paths['category'] = '/category/' + quote(first_category[1].name)
+        paths['api.products'] = '/api/v1/products?category=' + quote(first_category[1].slug)
+    if product is not None:
+        paths['product_detail'] = f'/product/{product.id}'
+        paths['search'] = '/search?q=' + quote(product.name.split()[0])
+        paths['api.product'] = f'/api/v1/products/{product.id}'
+        paths['api.search'] = '/api/v1/search?q=' + quote(product.name.split()[0])
+    return paths
+
+
+def _table_name(alias, tables):
+    # SQLAlchemy называет псевдонимы product_1, user_2 …
+    if alias in tables:
+        return alias
+    match = re.match(r'^(\w+)_\d+$', alias)
+    return match.group(1) if match and match.group(1) in tables else None
+
+
+def capture(app, role, path):
+    # SELECT'ы, выполненные при обработке одного запроса
+    statements = []
+
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            statements.append((statement, parameters))
+
+    client = app.test_client()
+    if role is not None:
+        user = User.query.filter_by(role=role).order_by(User.id).first()
+        if user is None:
+            return None
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user.id)
+            session['_fresh'] = True
+    catalog.invalidate()
+    engines = all_engines()
+    for engine in engines:
+        event.listen(engine, 'before_cursor_execute', on_execute)
+    try:
+        # Свой контекст приложения: иначе запрос унаследует g (и текущего
+        # пользователя Flask-Login) от предыдущей страницы
+        with app.app_context():
+            client.get(path)
+    finally:
+        for engine in engines:
+            event.remove(engine, 'before_cursor_execute', on_execute)
+    return statements
+
+
+def explain(statement, parameters):
+    with db.engine.connect() as conn:
+        return [row[-1] for row in conn.exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters)]
+
+
+def problems(endpoint, statement, plan):
+    tables = db.metadata.tables
+    # SCAN по индексу сортировки с LIMIT читает только первые строки; с WHERE
+    # же он может пройти почти всю таблицу в поисках подходящих
+    bounded = (
+        re.search(r'\bLIMIT\b', statement, re.IGNORECASE)
+        and not re.search(r'\bWHERE\b', statement, re.IGNORECASE)
+        and not any('TEMP B-TREE FOR ORDER BY' in line for line in plan)
+    )
+    for line in plan:
+        match = SCAN.match(line)
+        if match is None or 'COVERING INDEX' in line:
+            continue
+        table = _table_name(match.group(1), tables)
+        if table is None or bounded or (endpoint, table) in ALLOWED:
+            continue
+        yield Problem(endpoint, table, statement, plan)
+
+
+def check(app):
+    # → (проблемы, {endpoint: число разных запросов или None, если не было данных})
+    found = []
+    checked = {}
+    paths = _paths()
+    for role, endpoint in ROUTES:
+        path = paths.get(endpoint)
+        statements = capture(app, role, path) if path else None
+        if statements is None:
+            checked[endpoint] = None
+            continue
+        seen = set()
+        for statement, parameters in statements:
+            if statement in seen:
+                continue
+            seen.add(statement)
+            found.extend(problems(endpoint, statement, explain(statement, parameters)))
+        checked[endpoint] = len(seen)
+    return found, checked
+
+
+def init_app(app):
+    @app.cli.command('check-query-plans')
+    def check_query_plans():
+        # Только SQLite: разбирается вывод EXPLAIN QUERY PLAN. То же проверяет
+        # tests/test_query_plans.py на тестовых данных
+        if db.engine.dialect.name != 'sqlite':
+            raise click.ClickException('check-query-plans работает только с SQLite')
+        if not app.secret_key:
+            raise click.ClickException('Для страниц со входом задайте SECRET_KEY')
+        found, checked = check(app)
+        for endpoint, count in checked.items():
+            print(f'{endpoint}: пропущено (нет данных)' if count is None else f'{endpoint}: {count} запросов')
+        for problem in found:
+            print(f'\n{problem.endpoint}: полный просмотр {problem.table}\n  {problem.statement}')
+            for line in problem.plan:
+                print(f'    {line}')
+        if found:
+            raise click.ClickException(f'Полных просмотров таблиц: {len(found)}')
+        print('Планы запросов в порядке')
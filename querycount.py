@@ -0,0 +1,90 @@
+from contextlib import contextmanager
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from database import all_engines
+
+
+class QueryCounter:
+    def __init__(self, engine=None):
+        self.engines = [engine] if engine is not None else None
+        self.statements = []
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        if self.engines is None:
+            self.engines = all_engines()
+        for engine in self.engines:
+            event.listen(engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        for engine in self.engines:
+            event.remove(engine, 'before_cursor_execute', self._on_execute)
+        return False
+
+
+@contextmanager
+def assert_max_queries(limit, engine=None):
+    # Для тестов: with assert_max_queries(3): client.get('/my_orders')
+    with QueryCounter(engine) as counter:
+        yield counter
+    if counter.count > limit:
+        listing = '\n'.join(f'  {i + 1}. {s}' for i, s in enumerate(counter.statements))
+        raise AssertionError(f'Ожидалось не более {limit} SQL-запросов, выполнено {counter.count}:\n{listing}')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def parse_budgets(value):
+    # QUERY_BUDGETS=index=4,product_detail=3 → {'index': 4, 'product_detail': 3}
+    budgets = {}
+    for item in value.split(','):
+        endpoint, _, limit = item.partition('=')
+        if endpoint.strip() and limit.strip():
+            budgets[endpoint.strip()] = int(limit)
+    return budgets
+
+
+def _count_request_statement(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'query_count' in g:
+        g.query_count += 1
+
+
+def init_app(app):
+    # QUERY_BUDGET задаёт предел запросов на один HTTP-запрос; QUERY_BUDGETS —
+    # пределы для отдельных endpoint'ов. Пределы читаются из app.config на
+    # каждом запросе. В TESTING превышение — ошибка, иначе предупреждение в лог.
+    app.config.setdefault('QUERY_BUDGET', None)
+    app.config.setdefault('QUERY_BUDGETS', {})
+
+    with app.app_context():
+        for engine in all_engines():
+            event.listen(engine, 'before_cursor_execute', _count_request_statement)
+
+    @app.before_request
+    def start_query_count():
+        if app.config['QUERY_BUDGET'] is not None or app.config['QUERY_BUDGETS']:
+            g.query_count = 0
+
+    @app.after_request
+    def check_query_budget(response):
+        if 'query_count' not in g:
+            return response
+        limit = app.config['QUERY_BUDGETS'].get(request.endpoint, app.config['QUERY_BUDGET'])
+        count = g.query_count
+        if limit is not None and count > limit:
+            message = f'{request.endpoint}: {count} SQL-запросов при лимите {limit}'
+            if app.config.get('TESTING'):
+                raise QueryBudgetExceeded(message)
+            app.logger.warning(message)
+        return response
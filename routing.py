@@ -0,0 +1,84 @@
+import random
+import time
+from functools import wraps
+
+from flask import g, has_request_context, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+# Чтение с реплик. Маршрут, помеченный @reads_from_replica, отправляет свои
+# SELECT'ы на одну из реплик (DATABASE_REPLICA_URLS); всё остальное — запись,
+# flush, SELECT ... FOR UPDATE, маршруты без декоратора — идёт в основную БД.
+# После записи пользователь REPLICA_STICKY_SECONDS читает из основной БД,
+# чтобы видеть свои изменения, пока реплика догоняет.
+
+STICKY_KEY = '_db_primary_until'
+
+
+class ReplicaRouter:
+    def __init__(self):
+        self.engines = []
+        self.sticky_seconds = 5
+
+    def init_app(self, app, engines):
+        app.config.setdefault('REPLICA_STICKY_SECONDS', 5)
+        self.engines = engines
+        self.sticky_seconds = app.config['REPLICA_STICKY_SECONDS']
+        app.extensions['replicas'] = self
+
+        @app.after_request
+        def remember_write(response):
+            if self.engines and g.pop('_db_wrote', False):
+                session[STICKY_KEY] = time.time() + self.sticky_seconds
+            return response
+
+    def engine_for_request(self):
+        # Одна реплика на весь запрос: страница читает согласованный снимок
+        if not self.engines or not has_request_context() or g.get('_db_route') != 'replica':
+            return None
+        if session.get(STICKY_KEY, 0) > time.time():
+            return None
+        if '_db_replica' not in g:
+            g._db_replica = random.choice(self.engines)
+        return g._db_replica
+
+
+replicas = ReplicaRouter()
+
+
+def reads_from_replica(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g._db_route = 'replica'
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _is_read(clause):
+    return (
+        clause is not None
+        and getattr(clause, 'is_select', False)
+        and getattr(clause, '_for_update_arg', None) is None
+    )
+
+
+class RoutingSession(Session):
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and _is_read(clause):
+            engine = replicas.engine_for_request()
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_flush(db_session, flush_context):
+    if has_request_context():
+        g._db_wrote = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _mark_statement(state):
+    # Пакетные INSERT/UPDATE/DELETE через db.session.execute() не проходят через flush
+    if has_request_context() and (state.is_insert or state.is_update or state.is_delete):
+        g._db_wrote = True
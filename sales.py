@@ -0,0 +1,217 @@
+from collections import defaultdict, namedtuple
+from datetime import date, timedelta
+
+from sqlalchemy import cast, delete, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+
+from models import db, Order, OrderItem, Product, User, ProductSales, SellerSales, DailySales, from_minor_units
+
+# Агрегаты продаж по товару, продавцу и дню. Меняются в той же транзакции,
+# что и заказ (record_order / forget_order), поэтому дашборды не сканируют
+# order/order_item. Строки с seller_id = SHOP_ID — итоги по всему магазину
+# (заказ с товарами двух продавцов считается в нём один раз). Выручка
+# хранится в копейках, наружу отдаётся Decimal в рублях.
+SHOP_ID = 0
+COUNTERS = ('orders', 'units', 'revenue_cents')
+
+_UPSERT_DIALECTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+Totals = namedtuple('Totals', ['orders', 'units', 'revenue'])
+DayRow = namedtuple('DayRow', ['day', 'orders', 'units', 'revenue', 'share'])
+Leader = namedtuple('Leader', ['name', 'orders', 'units', 'revenue'])
+SalesSummary = namedtuple('SalesSummary', ['totals', 'top', 'daily'])
+
+
+def _increment(model, key_columns, rows):
+    # INSERT ... ON CONFLICT DO UPDATE SET orders = orders + excluded.orders, …
+    if not rows:
+        return
+    table = model.__table__
+    upsert = _UPSERT_DIALECTS.get(db.session.get_bind().dialect.name)
+    if upsert is not None:
+        stmt = upsert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c[column] for column in key_columns],
+            set_={column: table.c[column] + stmt.excluded[column] for column in COUNTERS},
+        )
+        db.session.execute(stmt, rows)
+        return
+    for row in rows:
+        result = db.session.execute(
+            update(table)
+            .where(*(table.c[column] == row[column] for column in key_columns))
+            .values({column: table.c[column] + row[column] for column in COUNTERS})
+        )
+        if not result.rowcount:
+            db.session.execute(insert(table), row)
+
+
+def _apply(order_id, sign):
+    items = (
+        db.session.query(OrderItem.product_id, OrderItem.quantity, OrderItem.price_cents, Product.seller_id, Order.created_at)
+        .join(Product, Product.id == OrderItem.product_id)
+        .join(Order, Order.id == OrderItem.order_id)
+        .filter(OrderItem.order_id == order_id)
+        .all()
+    )
+    if not items:
+        return
+    day = items[0].created_at.date()
+    products = {}
+    sellers = defaultdict(lambda: [0, 0])
+    for item in items:
+        units = item.quantity * sign
+        revenue = (item.price_cents or 0) * item.quantity * sign
+        sellers[SHOP_ID][0] += units
+        sellers[SHOP_ID][1] += revenue
+        if item.seller_id is None:
+            continue  # Продавец удалён: товар учитывается только в итогах магазина
+        products[item.product_id] = {
+            'product_id': item.product_id, 'seller_id': item.seller_id,
+            'orders': sign, 'units': units, 'revenue_cents': revenue,
+        }
+        sellers[item.seller_id][0] += units
+        sellers[item.seller_id][1] += revenue
+
+    seller_rows = [
+        {'seller_id': seller_id, 'orders': sign, 'units': units, 'revenue_cents': revenue}
+        for seller_id, (units, revenue) in sellers.items()
+    ]
+    _increment(ProductSales, ('product_id',), list(products.values()))
+    _increment(SellerSales, ('seller_id',), seller_rows)
+    _increment(DailySales, ('seller_id', 'day'), [dict(row, day=day) for row in seller_rows])
+
+
+def record_order(order_id):
+    # Вызывается до commit оформления заказа, после вставки строк
+    _apply(order_id, 1)
+
+
+def forget_order(order_id):
+    # Вызывается при отмене, пока строки заказа ещё не удалены
+    _apply(order_id, -1)
+
+
+def _day(column):
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return func.date(column)
+    return cast(column, db.Date)
+
+
+def rebuild():
+    # Полный пересчёт из order/order_item одной транзакцией
+    line_revenue = OrderItem.quantity * func.coalesce(OrderItem.price_cents, 0)
+    joined = (
+        select()
+        .select_from(OrderItem)
+        .join(Product, Product.id == OrderItem.product_id)
+        .join(Order, Order.id == OrderItem.order_id)
+    )
+    owned = joined.where(Product.seller_id.isnot(None))
+    aggregates = (
+        func.count(OrderItem.order_id.distinct()),
+        func.sum(OrderItem.quantity),
+        func.sum(line_revenue),
+    )
+    shop_aggregates = (
+        func.count(OrderItem.order_id.distinct()),
+        func.coalesce(func.sum(OrderItem.quantity), 0),
+        func.coalesce(func.sum(line_revenue), 0),
+    )
+    day = _day(Order.created_at)
+    try:
+        for model in (ProductSales, SellerSales, DailySales):
+            db.session.execute(delete(model))
+        db.session.execute(insert(ProductSales).from_select(
+            ['product_id', 'seller_id', *COUNTERS],
+            owned.add_columns(OrderItem.product_id, Product.seller_id, *aggregates)
+            .group_by(OrderItem.product_id, Product.seller_id),
+        ))
+        db.session.execute(insert(SellerSales).from_select(
+            ['seller_id', *COUNTERS],
+            owned.add_columns(Product.seller_id, *aggregates).group_by(Product.seller_id),
+        ))
+        db.session.execute(insert(SellerSales).from_select(
+            ['seller_id', *COUNTERS],
+            joined.add_columns(db.literal(SHOP_ID), *shop_aggregates),
+        ))
+        db.session.execute(insert(DailySales).from_select(
+            ['seller_id', 'day', *COUNTERS],
+            owned.add_columns(Product.seller_id, day, *aggregates).group_by(Product.seller_id, day),
+        ))
+        db.session.execute(insert(DailySales).from_select(
+            ['seller_id', 'day', *COUNTERS],
+            joined.add_columns(db.literal(SHOP_ID), day, *aggregates).group_by(day),
+        ))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return db.session.query(func.count()).select_from(ProductSales).scalar()
+
+
+def _daily(seller_id, days):
+    since = date.today() - timedelta(days=days - 1)
+    rows = {
+        row.day: row
+        for row in DailySales.query.filter(DailySales.seller_id == seller_id, DailySales.day >= since)
+    }
+    peak = max((row.revenue_cents for row in rows.values()), default=0) or 1
+    result = []
+    for offset in range(days):
+        day = since + timedelta(days=offset)
+        row = rows.get(day)
+        if row is None:
+            result.append(DayRow(day, 0, 0, from_minor_units(0), 0))
+        else:
+            result.append(DayRow(
+                day, row.orders, row.units, from_minor_units(row.revenue_cents),
+                round(100 * max(row.revenue_cents, 0) / peak),
+            ))
+    return result
+
+
+def _totals(seller_id):
+    row = db.session.get(SellerSales, seller_id)
+    if row is None:
+        return Totals(0, 0, from_minor_units(0))
+    return Totals(row.orders, row.units, from_minor_units(row.revenue_cents))
+
+
+def _leaders(rows):
+    return [Leader(row.name, row.orders, row.units, from_minor_units(row.revenue_cents)) for row in rows]
+
+
+def seller_summary(seller_id, days=30, top=5):
+    # Итоги продавца, его лидеры продаж и выручка по дням — только из агрегатов
+    leaders = (
+        db.session.query(Product.name, ProductSales.orders, ProductSales.units, ProductSales.revenue_cents)
+        .join(Product, Product.id == ProductSales.product_id)
+        .filter(ProductSales.seller_id == seller_id, ProductSales.orders > 0)
+        .order_by(ProductSales.revenue_cents.desc())
+        .limit(top)
+        .all()
+    )
+    return SalesSummary(_totals(seller_id), _leaders(leaders), _daily(seller_id, days))
+
+
+def shop_summary(days=30, top=5):
+    leaders = (
+        db.session.query(User.username.label('name'), SellerSales.orders, SellerSales.units, SellerSales.revenue_cents)
+        .join(User, User.id == SellerSales.seller_id)
+        .filter(SellerSales.seller_id != SHOP_ID, SellerSales.orders > 0)
+        .order_by(SellerSales.revenue_cents.desc())
+        .limit(top)
+        .all()
+    )
+    return SalesSummary(_totals(SHOP_ID), _leaders(leaders), _daily(SHOP_ID, days))
+
+
+def init_app(app):
+    app.config.setdefault('SALES_DASHBOARD_DAYS', 30)
+
+    @app.cli.command('sales-rebuild')
+    def sales_rebuild():
+        # Нужен после загрузки заказов в обход place_order и для сверки агрегатов
+        total = rebuild()
+        print(f'Агрегаты продаж пересчитаны: {total} товаров с продажами')
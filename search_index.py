@@ -0,0 +1,175 @@
+import re
+
+import click
+from sqlalchemy import DDL, Float, Integer, event, func, select, text
+from sqlalchemy.exc import OperationalError
+
+from models import db, Product
+from pagination import KeysetPage, paginate
+
+FTS_TABLE = 'product_fts'
+FTS_COLUMNS = ('name', 'short_description', 'long_description')
+
+# unicode61 приводит к нижнему регистру и кириллицу; remove_diacritics 2
+# снимает диакритику латиницы (café → cafe). «ё» он не трогает, поэтому её
+# заменяем на «е» сами — и в индексе, и в запросе. prefix ускоряет «час*».
+CREATE_FTS = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"{', '.join(FTS_COLUMNS)}, "
+    "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+YO = str.maketrans('ёЁ', 'еЕ')
+
+_fts_ready = {}
+
+
+def fts_supported(bind):
+    return bind.dialect.name == 'sqlite'
+
+
+def _is_ready(connection):
+    engine = connection.engine
+    if engine not in _fts_ready:
+        if not fts_supported(connection):
+            _fts_ready[engine] = False
+        else:
+            row = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {'name': FTS_TABLE},
+            ).first()
+            _fts_ready[engine] = row is not None
+    return _fts_ready[engine]
+
+
+def build_match(query):
+    tokens = TOKEN_RE.findall((query or '').translate(YO))
+    # Каждое слово — префиксный терм; слова объединяются через AND
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _index_rows(connection, rows):
+    connection.execute(
+        text(f"INSERT OR REPLACE INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) "
+             f"VALUES (:id, {', '.join(':' + c for c in FTS_COLUMNS)})"),
+        [{key: value.translate(YO) if isinstance(value, str) else value for key, value in row.items()}
+         for row in rows],
+    )
+
+
+def _row(product):
+    return {
+        'id': product.id,
+        'name': product.name or '',
+        'short_description': product.short_description or '',
+        'long_description': product.long_description or '',
+    }
+
+
+@event.listens_for(Product, 'after_insert')
+@event.listens_for(Product, 'after_update')
+def _product_saved(mapper, connection, product):
+    if _is_ready(connection):
+        _index_rows(connection, [_row(product)])
+
+
+@event.listens_for(Product, 'after_delete')
+def _product_deleted(mapper, connection, product):
+    if _is_ready(connection):
+        connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :id"), {'id': product.id})
+
+
+event.listen(Product.__table__, 'after_create', DDL(CREATE_FTS).execute_if(dialect='sqlite'))
+
+
+@event.listens_for(Product.__table__, 'after_create')
+def _product_table_created(target, connection, **kw):
+    _fts_ready.pop(connection.engine, None)
+
+
+def index_products(connection, product_ids):
+    # Для Core-вставок, которые обходят события маппера
+    if not product_ids or not _is_ready(connection):
+        return
+    table = Product.__table__
+    rows = connection.execute(
+        select(table.c.id, *(func.coalesce(table.c[column], '').label(column) for column in FTS_COLUMNS))
+        .where(table.c.id.in_(product_ids))
+    ).mappings().all()
+    _index_rows(connection, [dict(row) for row in rows])
+
+
+def rebuild_index(batch_size=5000):
+    with db.engine.begin() as conn:
+        if not fts_supported(conn):
+            return 0
+        conn.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+        conn.execute(text(CREATE_FTS))
+        _fts_ready[conn.engine] = True
+        total = 0
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                text("SELECT id, coalesce(name, '') AS name, "
+                     "coalesce(short_description, '') AS short_description, "
+                     "coalesce(long_description, '') AS long_description "
+                     "FROM product WHERE id > :last_id ORDER BY id LIMIT :limit"),
+                {'last_id': last_id, 'limit': batch_size},
+            ).mappings().all()
+            if not rows:
+                break
+            _index_rows(conn, [dict(r) for r in rows])
+            total += len(rows)
+            last_id = rows[-1]['id']
+        conn.execute(text(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')"))
+    return total
+
+
+def like_search(query, per_page=None, columns=None):
+    condition = Product.name.contains(query) | Product.short_description.contains(query)
+    base = db.session.query(*columns) if columns else Product.query
+    return paginate(base.filter(condition), (Product.id,), per_page=per_page)
+
+
+def search_products(query, per_page=None, columns=None):
+    # columns — вместо объектов Product строки только с этими столбцами
+    # (среди них должен быть Product.id); так ищет JSON API
+    match = build_match(query)
+    if not match:
+        return KeysetPage([], '', None, None)
+
+    connection = db.session.connection()
+    if not _is_ready(connection):
+        return like_search(query, per_page, columns)
+
+    ranked = (
+        text(f"SELECT rowid AS id, rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match")
+        .bindparams(match=match)
+        .columns(id=Integer, rank=Float)
+        .subquery()
+    )
+    entities = columns or (Product,)
+    ranked_query = db.session.query(*entities, ranked.c.rank).join(ranked, ranked.c.id == Product.id)
+    try:
+        page = paginate(
+            ranked_query,
+            (ranked.c.rank, Product.id),
+            per_page=per_page,
+            key=lambda row: (row.rank, row.id if columns else row.Product.id),
+        )
+    except OperationalError:
+        db.session.rollback()
+        _fts_ready.pop(connection.engine, None)
+        return like_search(query, per_page, columns)
+    if not columns:
+        page.items = [row.Product for row in page.items]
+    return page
+
+
+def init_app(app):
+    @app.cli.command('search-reindex')
+    @click.option('--batch-size', default=5000, show_default=True)
+    def search_reindex(batch_size):
+        total = rebuild_index(batch_size)
+        print(f"Поисковый индекс перестроен: {total} товаров")
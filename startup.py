@@ -0,0 +1,88 @@
+import os
+import time
+
+import click
+from jinja2 import FileSystemBytecodeCache
+
+from models import db
+
+# Быстрый старт воркера:
+#   JINJA_CACHE_DIR    каталог байткода шаблонов (по умолчанию instance/jinja_cache,
+#                      пустая строка — без кэша)
+#   TEMPLATE_WARMUP    1 — компилировать все шаблоны в create_app(); с gunicorn
+#                      --preload это делается один раз в мастере до fork
+# Команды, нужные только из CLI (flask db …), подключаются при первом вызове.
+
+
+class LazyGroup(click.Group):
+    # Группа команд, которая импортирует свой модуль только при обращении к ней
+    def __init__(self, name, load, **kwargs):
+        super().__init__(name, **kwargs)
+        self._load = load
+        self._group = None
+
+    def _real(self):
+        if self._group is None:
+            self._group = self._load()
+        return self._group
+
+    def list_commands(self, ctx):
+        return self._real().list_commands(ctx)
+
+    def get_command(self, ctx, name):
+        return self._real().get_command(ctx, name)
+
+    def make_context(self, info_name, args, parent=None, **extra):
+        # Разбор опций и вызов — у настоящей группы: её колбэк (у flask db —
+        # --directory, -x) должен выполниться перед подкомандой
+        return self._real().make_context(info_name, args, parent=parent, **extra)
+
+
+def _migrate_commands(app):
+    def load():
+        # flask_migrate тянет за собой alembic — веб-воркерам он не нужен
+        from flask_migrate import Migrate
+        from flask_migrate.cli import db as db_group
+        Migrate(app, db)
+        return db_group
+    return LazyGroup('db', load, help='Миграции схемы (Flask-Migrate).')
+
+
+def configure_bytecode_cache(app):
+    directory = app.config['JINJA_CACHE_DIR']
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    cache = FileSystemBytecodeCache(directory)
+    app.jinja_env.bytecode_cache = cache
+    return cache
+
+
+def warm_templates(app):
+    # Компилирует все шаблоны в кэш окружения (и байткод на диск); возвращает
+    # число шаблонов и затраченное время
+    started = time.perf_counter()
+    names = [name for name in app.jinja_env.list_templates() if name.endswith('.html')]
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names), time.perf_counter() - started
+
+
+def init_app(app):
+    app.config.setdefault('JINJA_CACHE_DIR', os.path.join(app.instance_path, 'jinja_cache'))
+    app.config.setdefault('TEMPLATE_WARMUP', True)
+    configure_bytecode_cache(app)
+    app.cli.add_command(_migrate_commands(app))
+
+    @app.cli.command('warm-templates')
+    def warm_templates_command():
+        # Заполняет JINJA_CACHE_DIR заранее, например при сборке образа
+        app.jinja_env.cache.clear()
+        count, elapsed = warm_templates(app)
+        print(f'Скомпилировано шаблонов: {count} за {elapsed * 1000:.0f} мс')
+
+
+def warmup(app):
+    # Вызывается в конце create_app(), когда зарегистрированы все фильтры и глобальные имена
+    if app.config['TEMPLATE_WARMUP']:
+        warm_templates(app)
@@ -0,0 +1,188 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import shutil
+import threading
+
+from flask import abort, current_app, request, send_file
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # Без brotli готовим только .gz
+    brotli = None
+
+# styles.3f2a9c1e07.css — отпечаток содержимого в имени файла
+FINGERPRINT_RE = re.compile(r'^(?P<stem>.+)\.(?P<digest>[0-9a-f]{10})(?P<ext>\.[^./]+)$')
+# Загрузки уже названы хэшем содержимого (см. images.py)
+CONTENT_ADDRESSED_RE = re.compile(r'(^|/)uploads/[0-9a-f]{2}/[0-9a-f]{32}(-\d+)?\.[a-z0-9]+$')
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.html')
+ENCODING_SUFFIXES = (('br', '.br'), ('gzip', '.gz'))
+ENDPOINTS = ('static', 'uploaded_file')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+REVALIDATE = 'public, max-age=0, must-revalidate'
+
+_digests = {}
+_lock = threading.Lock()
+
+
+def file_digest(path):
+    # Хэш пересчитывается только при изменении mtime/размера файла
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _digests.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as stream:
+        for chunk in iter(lambda: stream.read(256 * 1024), b''):
+            digest.update(chunk)
+    value = digest.hexdigest()
+    with _lock:
+        _digests[path] = (key, value)
+    return value
+
+
+def fingerprint(filename, root):
+    if CONTENT_ADDRESSED_RE.search(filename):
+        return filename
+    path = safe_join(root, filename)
+    digest = file_digest(path) if path else None
+    if digest is None:
+        return filename
+    stem, ext = os.path.splitext(filename)
+    return f'{stem}.{digest[:10]}{ext}'
+
+
+def split_fingerprint(filename):
+    match = FINGERPRINT_RE.match(filename)
+    if match is None:
+        return filename, None
+    return match.group('stem') + match.group('ext'), match.group('digest')
+
+
+def is_static_request():
+    # Хукам before_request незачем загружать пользователя ради картинки
+    return request.endpoint in ENDPOINTS
+
+
+def _fresh_sibling(path, suffix):
+    # Сжатая копия годится, только если она не старше исходника: иначе после
+    # правки файла без assets-compress клиенты получили бы старое содержимое
+    try:
+        return os.stat(path + suffix).st_mtime_ns >= os.stat(path).st_mtime_ns
+    except OSError:
+        return False
+
+
+def _accepted_encodings():
+    header = request.headers.get('Accept-Encoding', '')
+    return {part.split(';')[0].strip() for part in header.split(',') if part.strip()}
+
+
+def serve(root, filename):
+    real_name, requested = split_fingerprint(filename)
+    path = safe_join(root, real_name)
+    if path is None or not os.path.isfile(path):
+        # Файл мог сам содержать точку и 10 hex-символов в имени
+        real_name, requested = filename, None
+        path = safe_join(root, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+
+    digest = file_digest(path)
+    immutable = (requested is not None and digest.startswith(requested)) or bool(CONTENT_ADDRESSED_RE.search(real_name))
+
+    encoding = None
+    if real_name.endswith(COMPRESSIBLE):
+        accepted = _accepted_encodings()
+        for name, suffix in ENCODING_SUFFIXES:
+            if name in accepted and _fresh_sibling(path, suffix):
+                encoding = name
+                break
+    served = path + dict(ENCODING_SUFFIXES).get(encoding, '')
+    etag = digest if encoding is None else f'{digest}-{encoding}'
+
+    # 304 отдаём до открытия файла
+    if etag in request.if_none_match:
+        response = current_app.response_class(status=304)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = IMMUTABLE if immutable else REVALIDATE
+        if real_name.endswith(COMPRESSIBLE):
+            response.vary.add('Accept-Encoding')
+        return response
+
+    offload = current_app.config.get('STATIC_OFFLOAD')
+    if offload == 'x-accel':
+        # nginx: location /protected/ { internal; alias /path/to/app/; }
+        prefix = current_app.config.get('STATIC_ACCEL_PREFIX', '/protected/')
+        root_path = current_app.config.get('STATIC_ACCEL_ROOT') or current_app.root_path
+        relative = os.path.relpath(served, root_path)
+        response = current_app.response_class()
+        response.headers['X-Accel-Redirect'] = prefix + relative.replace(os.sep, '/')
+        response.mimetype = _mimetype(real_name)
+    else:
+        response = send_file(
+            served,
+            mimetype=_mimetype(real_name),
+            etag=etag,
+            conditional=True,
+            max_age=None,
+        )
+    if encoding is not None:
+        response.headers['Content-Encoding'] = encoding
+    if real_name.endswith(COMPRESSIBLE):
+        response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = IMMUTABLE if immutable else REVALIDATE
+    return response
+
+
+def _mimetype(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+def precompress(root):
+    written = 0
+    for directory, _, files in os.walk(root):
+        for name in files:
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            path = os.path.join(directory, name)
+            with open(path, 'rb') as stream:
+                data = stream.read()
+            with gzip.open(path + '.gz', 'wb', compresslevel=9) as out:
+                out.write(data)
+            shutil.copystat(path, path + '.gz')
+            written += 1
+            if brotli is not None:
+                with open(path + '.br', 'wb') as out:
+                    out.write(brotli.compress(data, quality=11))
+                written += 1
+    return written
+
+
+def init_app(app):
+    app.config.setdefault('STATIC_OFFLOAD', None)
+    # X-Sendfile (Apache/lighttpd) поддерживается Werkzeug штатно
+    app.config['USE_X_SENDFILE'] = app.config.get('STATIC_OFFLOAD') == 'x-sendfile'
+
+    @app.url_defaults
+    def fingerprint_static(endpoint, values):
+        if endpoint == 'static' and 'filename' in values:
+            values['filename'] = fingerprint(values['filename'], app.static_folder)
+
+    def static(filename):
+        return serve(app.static_folder, filename)
+
+    app.view_functions['static'] = static
+
+    @app.cli.command('assets-compress')
+    def assets_compress():
+        # Готовит .gz (и .br, если установлен brotli) рядом с css/js в static/
+        print(f'Создано сжатых файлов: {precompress(app.static_folder)}')
@@ -0,0 +1,209 @@
+from collections import Counter
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from sqlalchemy import bindparam, select, update
+
+from models import db, Product, CartItem, OrderItem
+import cart_store
+
+# Остатки товаров. product.stock — свободный остаток: единицы, лежащие в
+# корзинах, уже вычтены из него (резерв) и возвращаются, когда резерв
+# истекает (CART_RESERVATION_TTL), товар убирают из корзины или отменяют заказ.
+# Любое списание — один условный UPDATE ... SET stock = stock - n WHERE
+# stock >= n: без SELECT перед записью, поэтому параллельные покупки
+# горячего товара не продают больше, чем есть. stock = NULL — без учёта.
+#
+# Остатки на страницах каталога не показываются, поэтому UPDATE остатков
+# оставляет updated_at как есть (иначе сработал бы onupdate): резервы и
+# покупки не сбрасывают кэш витрины, ETag'и и фрагменты.
+#
+# Порядок блокировок везде один: сначала строки корзины, затем товары по
+# возрастанию id — транзакции PostgreSQL не ждут друг друга по кругу.
+
+product_table = Product.__table__
+cart_table = CartItem.__table__
+KEEP_UPDATED_AT = {'updated_at': product_table.c.updated_at}
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_id, name=None):
+        super().__init__(f'Недостаточно товара: {name or product_id}')
+        self.product_id = product_id
+        self.name = name
+
+
+def _decrement(product_id, quantity):
+    result = db.session.execute(
+        update(product_table)
+        .where(product_table.c.id == product_id, product_table.c.stock >= quantity)
+        .values(stock=product_table.c.stock - quantity, **KEEP_UPDATED_AT)
+    )
+    return bool(result.rowcount)
+
+
+def _take_units(product_id, quantity):
+    # Свободного остатка не хватило — возвращаем истёкшие резервы этого товара и пробуем ещё раз
+    if _decrement(product_id, quantity):
+        return True
+    return bool(release_expired(product_id)) and _decrement(product_id, quantity)
+
+
+def _increment(quantities):
+    rows = [{'pid': product_id, 'units': units} for product_id, units in sorted(quantities.items()) if units]
+    if rows:
+        db.session.execute(
+            update(product_table)
+            .where(product_table.c.id == bindparam('pid'), product_table.c.stock.isnot(None))
+            .values(stock=product_table.c.stock + bindparam('units'), **KEEP_UPDATED_AT),
+            rows,
+        )
+
+
+def adjust(product_id, seen, new):
+    # Правка остатка продавцом: seen — остаток, который он видел в форме.
+    # Меняем на разницу (new - seen), а не записываем new поверх: единицы,
+    # проданные и зарезервированные за это время, не возвращаются в продажу.
+    # False — остаток изменился так, что разница не применима.
+    if new == seen:
+        return True
+    row = product_table.c
+    if new is None:
+        db.session.execute(
+            update(product_table).where(row.id == product_id).values(stock=None, **KEEP_UPDATED_AT)
+        )
+        return True
+    if seen is None:
+        conditions = [row.stock.is_(None)]
+        stock = new
+    else:
+        conditions = [row.stock.isnot(None), row.stock + (new - seen) >= 0]
+        stock = row.stock + (new - seen)
+    result = db.session.execute(
+        update(product_table).where(row.id == product_id, *conditions).values(stock=stock, **KEEP_UPDATED_AT)
+    )
+    return bool(result.rowcount)
+
+
+def reserve(user_id, product, quantity=1):
+    # Добавление в корзину: у товара с учётом остатков единицы сразу
+    # переходят из stock в резерв корзины, срок резерва продлевается
+    if product.stock is None:
+        cart_store.add(user_id, product.id, quantity)
+        return
+    until = datetime.utcnow() + timedelta(seconds=current_app.config['CART_RESERVATION_TTL'])
+    cart_store.add(user_id, product.id, quantity, reserved_until=until)
+    if not _take_units(product.id, quantity):
+        raise OutOfStock(product.id, product.name)
+
+
+def release_one(user_id, product_id):
+    # Перед удалением единицы из корзины: резерв не больше, чем останется в корзине
+    result = db.session.execute(
+        update(cart_table)
+        .where(
+            cart_table.c.user_id == user_id,
+            cart_table.c.product_id == product_id,
+            cart_table.c.reserved > 0,
+            cart_table.c.reserved >= cart_table.c.quantity,
+        )
+        .values(reserved=cart_table.c.reserved - 1)
+    )
+    if result.rowcount:
+        _increment({product_id: 1})
+
+
+def take(user_id, quantities, tracked):
+    # Оформление заказа, внутри его транзакции. Резерв корзины забираем
+    # условным UPDATE (его мог только что вернуть release_expired), остальное
+    # списываем из stock. Не хватило — OutOfStock, вызывающий откатывает всё.
+    held = dict(
+        db.session.query(CartItem.product_id, CartItem.reserved)
+        .filter(CartItem.user_id == user_id, CartItem.reserved > 0)
+        .all()
+    )
+    surplus = Counter()
+    needed = {}
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        reserved = held.get(product_id, 0)
+        if reserved and not _claim(user_id, product_id, reserved):
+            reserved = 0
+        surplus[product_id] = max(reserved - quantity, 0)
+        if product_id in tracked and quantity > reserved:
+            needed[product_id] = quantity - reserved
+    _increment(surplus)
+    for product_id, units in sorted(needed.items()):
+        if not _take_units(product_id, units):
+            raise OutOfStock(product_id)
+
+
+def _claim(user_id, product_id, reserved, expired_before=None):
+    conditions = [
+        cart_table.c.user_id == user_id,
+        cart_table.c.product_id == product_id,
+        cart_table.c.reserved == reserved,
+    ]
+    if expired_before is not None:
+        conditions.append(cart_table.c.reserved_until < expired_before)
+    result = db.session.execute(update(cart_table).where(*conditions).values(reserved=0, reserved_until=None))
+    return bool(result.rowcount)
+
+
+def release_expired(product_id=None, limit=1000):
+    # Возвращает в stock истёкшие резервы (все или одного товара). Строки,
+    # которые прямо сейчас забирает оформление заказа, пропускаются (SKIP LOCKED).
+    now = datetime.utcnow()
+    query = (
+        select(cart_table.c.user_id, cart_table.c.product_id, cart_table.c.reserved)
+        .where(cart_table.c.reserved > 0, cart_table.c.reserved_until < now)
+        .order_by(cart_table.c.user_id, cart_table.c.product_id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    if product_id is not None:
+        query = query.where(cart_table.c.product_id == product_id)
+    released = Counter()
+    for row in db.session.execute(query).all():
+        if _claim(row.user_id, row.product_id, row.reserved, expired_before=now):
+            released[row.product_id] += row.reserved
+    _increment(released)
+    return sum(released.values())
+
+
+def restore(order_id):
+    # Отмена заказа: проданные единицы возвращаются в остаток
+    rows = db.session.query(OrderItem.product_id, OrderItem.quantity).filter(OrderItem.order_id == order_id).all()
+    units = Counter()
+    for product_id, quantity in rows:
+        units[product_id] += quantity
+    _increment(units)
+
+
+def reservations(user_id):
+    # {product_id: минут до конца резерва} для страницы корзины
+    now = datetime.utcnow()
+    rows = (
+        db.session.query(CartItem.product_id, CartItem.reserved_until)
+        .filter(CartItem.user_id == user_id, CartItem.reserved > 0, CartItem.reserved_until > now)
+        .all()
+    )
+    return {row.product_id: max(int((row.reserved_until - now).total_seconds() // 60), 1) for row in rows}
+
+
+def init_app(app):
+    app.config.setdefault('CART_RESERVATION_TTL', 900)
+
+    @app.cli.command('stock-release')
+    @click.option('--batch-size', default=1000, show_default=True)
+    def stock_release(batch_size):
+        # Для cron: возвращает в остатки все истёкшие резервы корзин
+        total = 0
+        while True:
+            released = release_expired(limit=batch_size)
+            db.session.commit()
+            if not released:
+                break
+            total += released
+        print(f'Возвращено из истёкших резервов: {total} шт.')
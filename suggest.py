@@ -0,0 +1,397 @@
+import heapq
+import os
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+
+import click
+from sqlalchemy import event, func, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, object_session
+
+from models import db, Product
+
+# Подсказки поиска (/search/suggest) из индекса в памяти процесса: запрос
+# к подсказкам не ходит в БД. Индекс строится при старте (SUGGEST_WARMUP),
+# изменения товаров в этом процессе применяются после commit, а изменения
+# из других воркеров и CLI фоновый поток подтягивает раз в
+# SUGGEST_REFRESH_SECONDS по updated_at (удаления — полной перестройкой).
+#   SUGGEST_LIMIT        сколько подсказок отдавать
+#   SUGGEST_SCAN         сколько названий-кандидатов просматривать на запрос
+#   SUGGEST_MAX_NAMES    предел различных названий в индексе: до ~550 байт на
+#                        название в худшем случае (все названия разные)
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Товар есть в каталоге, но в индекс не попал (пустое название или индекс заполнен)
+UNINDEXED = 0xFFFFFFFF
+
+
+def normalize(text):
+    # casefold понимает кириллицу; «ё» и «е» не различаем, как и полнотекстовый поиск
+    return (text or '').casefold().replace('ё', 'е')
+
+
+def name_key(name):
+    # Слова названия через пробел и с пробелами по краям: « кожаный ремень ».
+    # Проверка слова запроса — поиск подстроки « слово » без регулярных выражений
+    words = TOKEN_RE.findall(normalize(name))
+    return f" {' '.join(words)} " if words else ''
+
+
+class NameIndex:
+    # Различные названия товаров и словарь их слов. Одинаковые названия
+    # (с точностью до регистра и знаков препинания) хранятся один раз со
+    # счётчиком товаров. Слова лежат в отсортированном списке: префикс ищется
+    # через bisect, у каждого слова — слоты названий, где оно встречается
+    # (int для единственного названия, array('I') для нескольких).
+
+    def __init__(self, max_names=200_000):
+        self.max_names = max_names
+        self.products = 0
+        self._names = []              # слот → название как в каталоге
+        self._keys = []               # слот → ключ названия (см. name_key)
+        self._counts = array('I')     # слот → число товаров с этим названием
+        self._slots = {}              # ключ названия → слот
+        self._free = []
+        self._product_slots = array('I')  # id товара → слот + 1; 0 — товара нет
+        self._words = []
+        self._postings = {}
+        self._loading = False
+
+    def __len__(self):
+        return len(self._slots)
+
+    @property
+    def word_count(self):
+        return len(self._words)
+
+    def _marker(self, product_id):
+        return self._product_slots[product_id] if product_id < len(self._product_slots) else 0
+
+    def _mark(self, product_id, value):
+        size = len(self._product_slots)
+        if product_id >= size:
+            grow = max(product_id + 1, size * 2, 1024) - size
+            self._product_slots.frombytes(bytes(grow * self._product_slots.itemsize))
+        self._product_slots[product_id] = value
+
+    def load(self, rows):
+        # Начальная загрузка (product_id, name): новые слова дописываются
+        # в конец словаря, а сортируется он один раз в конце
+        self._loading = True
+        try:
+            for product_id, name in rows:
+                self.set(product_id, name)
+        finally:
+            self._loading = False
+            self._words.sort()
+
+    def set(self, product_id, name):
+        key = name_key(name)
+        marker = self._marker(product_id)
+        if marker and marker != UNINDEXED and self._keys[marker - 1] == key:
+            return
+        self.remove(product_id)
+        slot = self._slots.get(key)
+        if slot is None:
+            if not key or len(self._slots) >= self.max_names:
+                self._mark(product_id, UNINDEXED)
+                self.products += 1
+                return
+            slot = self._add_name(key, name)
+        self._counts[slot] += 1
+        self._mark(product_id, slot + 1)
+        self.products += 1
+
+    def remove(self, product_id):
+        marker = self._marker(product_id)
+        if not marker:
+            return
+        self._product_slots[product_id] = 0
+        self.products -= 1
+        if marker == UNINDEXED:
+            return
+        slot = marker - 1
+        self._counts[slot] -= 1
+        if not self._counts[slot]:
+            self._drop_name(slot)
+
+    def _add_name(self, key, name):
+        if self._free:
+            slot = self._free.pop()
+            self._names[slot] = name
+            self._keys[slot] = key
+        else:
+            slot = len(self._names)
+            self._names.append(name)
+            self._keys.append(key)
+            self._counts.append(0)
+        self._slots[key] = slot
+        postings = self._postings
+        for word in set(key.split()):
+            slots = postings.get(word)
+            if slots is None:
+                postings[word] = slot
+                if self._loading:
+                    self._words.append(word)
+                else:
+                    insort(self._words, word)
+            elif isinstance(slots, int):
+                postings[word] = array('I', (slots, slot))
+            else:
+                slots.append(slot)
+        return slot
+
+    def _drop_name(self, slot):
+        key = self._keys[slot]
+        del self._slots[key]
+        postings = self._postings
+        for word in set(key.split()):
+            slots = postings[word]
+            if isinstance(slots, int):
+                del postings[word]
+                if self._loading:
+                    self._words.remove(word)
+                else:
+                    del self._words[bisect_left(self._words, word)]
+                continue
+            slots.remove(slot)
+            if len(slots) == 1:
+                postings[word] = slots[0]
+        self._names[slot] = self._keys[slot] = None
+        self._free.append(slot)
+
+    def _candidates(self, prefix, scan):
+        # Не больше scan слотов названий со словом на prefix; слова — по алфавиту
+        seen = set()
+        words = self._words
+        position = bisect_left(words, prefix)
+        while position < len(words) and words[position].startswith(prefix):
+            slots = self._postings[words[position]]
+            if isinstance(slots, int):
+                seen.add(slots)
+            else:
+                seen.update(slots[:scan - len(seen)])
+            if len(seen) >= scan:
+                break
+            position += 1
+        return seen
+
+    def suggest(self, query, limit=10, scan=300):
+        # Названия, где каждое слово запроса — начало какого-то слова названия
+        # («кож рем» → «Ремень кожаный»); после пробела в конце запроса последнее
+        # слово должно совпасть целиком. Выше — названия, начинающиеся с запроса,
+        # затем популярные. Просматривается не больше scan названий: на очень
+        # общих запросах выдача неполная, зато время ответа ограничено.
+        normalized = normalize(query)
+        tokens = TOKEN_RE.findall(normalized)
+        if not tokens:
+            return []
+        needles = [' ' + token for token in tokens]
+        head = ' ' + ' '.join(tokens)
+        if not TOKEN_RE.match(normalized[-1]):
+            needles[-1] += ' '
+            head += ' '
+
+        # Кандидатов берём по самому редкому слову: длинные префиксы обычно
+        # реже, и перебор останавливается на первом полном (меньше scan) наборе
+        candidates = None
+        for token in sorted(set(tokens), key=len, reverse=True):
+            slots = self._candidates(token, scan)
+            if candidates is None or len(slots) < len(candidates):
+                candidates = slots
+            if len(candidates) < scan:
+                break
+
+        keys, counts = self._keys, self._counts
+        if len(needles) > 1 or needles[0].endswith(' '):
+            for needle in needles:
+                candidates = [slot for slot in candidates if needle in keys[slot]]
+        best = heapq.nsmallest(limit, [
+            (not keys[slot].startswith(head), -counts[slot], keys[slot], slot) for slot in candidates
+        ])
+        return [(self._names[slot], counts[slot]) for *_, slot in best]
+
+
+class Suggestions:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.app = None
+        self.index = NameIndex()
+        self.ready = False
+        self.refresh_seconds = 10
+        self._seen = None       # (count, max(updated_at)) при последней сверке с БД
+        self._watermark = None  # max(updated_at) уже применённых изменений
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        app.config.setdefault('SUGGEST_LIMIT', 10)
+        app.config.setdefault('SUGGEST_SCAN', 300)
+        app.config.setdefault('SUGGEST_MAX_NAMES', 200_000)
+        app.config.setdefault('SUGGEST_REFRESH_SECONDS', 10)
+        app.config.setdefault('SUGGEST_WARMUP', True)
+        self.app = app
+        self.refresh_seconds = float(app.config['SUGGEST_REFRESH_SECONDS'])
+        app.extensions['suggest'] = self
+
+        @app.cli.command('suggest')
+        @click.argument('query')
+        def suggest_command(query):
+            # Проверка индекса подсказок: время построения и выдача по запросу
+            if not self.ready:
+                self.rebuild()
+            started = time.perf_counter()
+            results = self.index.suggest(query, app.config['SUGGEST_LIMIT'], app.config['SUGGEST_SCAN'])
+            elapsed = time.perf_counter() - started
+            stats = self.stats()
+            print(f"Индекс: {stats['products']} товаров, {stats['names']} названий, {stats['words']} слов")
+            for name, count in results:
+                print(f'  {name} ({count})')
+            print(f'Подсказки за {elapsed * 1_000_000:.0f} мкс')
+
+    def warmup(self, app):
+        # Вызывается в конце create_app(); без таблицы product (пустая БД,
+        # flask db upgrade) индекс построит фоновое обновление
+        if not app.config['SUGGEST_WARMUP']:
+            return
+        with app.app_context():
+            try:
+                self.rebuild()
+            except SQLAlchemyError as exc:
+                app.logger.warning('Индекс подсказок не построен при старте: %s', getattr(exc, 'orig', exc))
+
+    def suggest(self, query, limit=None):
+        self._ensure_refresher()
+        config = self.app.config
+        # Под блокировкой: фоновое обновление меняет индекс на месте
+        with self._lock:
+            return self.index.suggest(query, limit or config['SUGGEST_LIMIT'], config['SUGGEST_SCAN'])
+
+    def _columns(self):
+        table = Product.__table__
+        return table.c.id, table.c.name, table.c.updated_at
+
+    def rebuild(self):
+        index = NameIndex(int(self.app.config['SUGGEST_MAX_NAMES']))
+        last_modified = None
+
+        def names(rows):
+            nonlocal last_modified
+            for product_id, name, updated_at in rows:
+                if updated_at is not None and (last_modified is None or updated_at > last_modified):
+                    last_modified = updated_at
+                yield product_id, name
+
+        # Основная БД, а не реплика: индекс сверяется с ней же
+        with db.engine.connect() as conn:
+            index.load(names(conn.execution_options(stream_results=True, yield_per=10000)
+                             .execute(select(*self._columns()))))
+        with self._lock:
+            self.index = index
+            self._seen = (index.products, last_modified)
+            self._watermark = last_modified
+            self.ready = True
+        return index.products
+
+    def refresh(self):
+        # Сверка с БД: новые и изменённые товары — по updated_at, удаления
+        # видны по расхождению числа товаров и требуют перестройки
+        with db.engine.connect() as conn:
+            count, last_modified = conn.execute(select(func.count(Product.id), func.max(Product.updated_at))).one()
+            if (count, last_modified) == self._seen:
+                return False
+            rows = None
+            if self.ready and self._watermark is not None:
+                id_column, name_column, updated_column = self._columns()
+                rows = conn.execute(
+                    select(id_column, name_column, updated_column).where(updated_column >= self._watermark)
+                ).all()
+        if rows is None:
+            self.rebuild()
+            return True
+        with self._lock:
+            for product_id, name, updated_at in rows:
+                self.index.set(product_id, name)
+                if updated_at is not None and updated_at > self._watermark:
+                    self._watermark = updated_at
+            consistent = self.index.products == count
+            if consistent:
+                self._seen = (count, last_modified)
+        if not consistent:
+            self.rebuild()
+        return True
+
+    def apply(self, changes):
+        with self._lock:
+            for product_id, name in changes:
+                if name is None:
+                    self.index.remove(product_id)
+                else:
+                    self.index.set(product_id, name)
+
+    def _ensure_refresher(self):
+        # После fork (gunicorn --preload) поток родителя не наследуется
+        if not self.refresh_seconds or (self._thread is not None and self._pid == os.getpid()):
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='suggest-refresh', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            if self.ready:
+                time.sleep(self.refresh_seconds)
+            try:
+                with self.app.app_context():
+                    self.refresh()
+            except Exception:
+                self.app.logger.exception('Не удалось обновить индекс подсказок')
+                time.sleep(self.refresh_seconds)
+
+    def stats(self):
+        index = self.index
+        return {'products': index.products, 'names': len(index), 'words': index.word_count}
+
+
+suggestions = Suggestions()
+
+
+# Изменения товаров через ORM копятся в сессии и попадают в индекс после
+# commit: откаченная транзакция индекс не трогает
+def _pending(product):
+    session = object_session(product)
+    return session.info.setdefault('suggest_pending', []) if session is not None else None
+
+
+@event.listens_for(Product, 'after_insert')
+@event.listens_for(Product, 'after_update')
+def _product_saved(mapper, connection, product):
+    pending = _pending(product)
+    if pending is not None:
+        pending.append((product.id, product.name or ''))
+
+
+@event.listens_for(Product, 'after_delete')
+def _product_deleted(mapper, connection, product):
+    pending = _pending(product)
+    if pending is not None:
+        pending.append((product.id, None))
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_pending(session):
+    pending = session.info.pop('suggest_pending', None)
+    if pending and suggestions.ready:
+        suggestions.apply(pending)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_pending(session, previous_transaction):
+    session.info.pop('suggest_pending', None)
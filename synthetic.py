@@ -0,0 +1,140 @@
+import random
+from datetime import datetime, timedelta
+
+import click
+
+from catalog import CATEGORIES, catalog, category_ids
+from models import db, User, Product, Order, OrderItem
+import passwords
+import sales
+import search_index
+
+# Синтетические данные для нагрузочных прогонов. Все пользователи получают
+# один пароль (хэш считается один раз), email вида buyer17@synthetic.test.
+SYNTHETIC_DOMAIN = 'synthetic.test'
+SYNTHETIC_PASSWORD = 'password'
+
+ADJECTIVES = ['Классический', 'Кожаный', 'Летний', 'Зимний', 'Спортивный', 'Винтажный', 'Хлопковый',
+              'Лёгкий', 'Строгий', 'Яркий', 'Чёрный', 'Белый', 'Синий', 'Зелёный', 'Ёмкий', 'Мужской', 'Женский']
+NOUNS = {
+    'Футболки': ['футболка', 'поло', 'лонгслив', 'майка'],
+    'Ремни': ['ремень', 'пояс', 'ремешок'],
+    'Часы': ['часы', 'хронограф', 'смарт-часы'],
+    'Сумки': ['сумка', 'рюкзак', 'портфель', 'клатч', 'шоппер'],
+}
+DETAILS = ['из натуральной кожи', 'с принтом', 'на каждый день', 'для офиса', 'для путешествий',
+           'ручной работы', 'с гравировкой', 'оверсайз', 'с металлической пряжкой', 'водонепроницаемые']
+CITIES = ['Москва', 'Санкт-Петербург', 'Казань', 'Новосибирск', 'Екатеринбург', 'Нижний Новгород']
+STREETS = ['Ленина', 'Пушкина', 'Гагарина', 'Мира', 'Советская', 'Садовая']
+SIZES = ['XS', 'S', 'M', 'L', 'XL']
+
+
+def _chunks(rows, size):
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _insert(table, rows, batch_size):
+    # Core executemany: без ORM-объектов и событий маппера
+    for chunk in _chunks(rows, batch_size):
+        db.session.execute(table.insert(), chunk)
+
+
+def _product_name(rng, category):
+    return f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS[category])}'
+
+
+def generate(users=1000, sellers=50, products=10000, orders=5000, items_per_order=3, seed=42, batch_size=1000):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    password_hash = passwords.make_hash(SYNTHETIC_PASSWORD)
+    start = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+
+    user_rows = []
+    for offset in range(sellers + users):
+        number = start + offset
+        role = 'seller' if offset < sellers else 'buyer'
+        user_rows.append({
+            'id': number,
+            'username': f'{role}{number}',
+            'email': f'{role}{number}@{SYNTHETIC_DOMAIN}',
+            'password_hash': password_hash,
+            'role': role,
+            'last_activity': now - timedelta(minutes=rng.randrange(60 * 24 * 30)),
+        })
+    _insert(User.__table__, user_rows, batch_size)
+    seller_ids = [row['id'] for row in user_rows[:sellers]]
+    buyer_ids = [row['id'] for row in user_rows[sellers:]]
+
+    categories = category_ids()
+    product_start = (db.session.query(db.func.max(Product.id)).scalar() or 0) + 1
+    product_rows = []
+    for offset in range(products if seller_ids else 0):
+        category = rng.choice(CATEGORIES).name
+        name = _product_name(rng, category)
+        detail = rng.choice(DETAILS)
+        product_rows.append({
+            'id': product_start + offset,
+            'name': name,
+            'short_description': f'{name} {detail}',
+            'long_description': f'{name} {detail}. Артикул {product_start + offset}.',
+            'price_cents': rng.randrange(300, 30000, 10) * 100,
+            'category_id': categories[category.casefold()],
+            'image_url': None,
+            'seller_id': rng.choice(seller_ids),
+            'updated_at': now - timedelta(minutes=rng.randrange(60 * 24 * 90)),
+        })
+    _insert(Product.__table__, product_rows, batch_size)
+
+    order_start = (db.session.query(db.func.max(Order.id)).scalar() or 0) + 1
+    order_rows, item_rows = [], []
+    for offset in range(orders if buyer_ids and product_rows else 0):
+        order_id = order_start + offset
+        user_id = rng.choice(buyer_ids)
+        order_rows.append({
+            'id': order_id,
+            'user_id': user_id,
+            'address': f'{rng.choice(CITIES)}, ул. {rng.choice(STREETS)}, {rng.randrange(1, 200)}',
+            'phone': f'+79{rng.randrange(10 ** 9):09d}',
+            'size': rng.choice(SIZES),
+            'email': f'buyer{user_id}@{SYNTHETIC_DOMAIN}',
+            'created_at': now - timedelta(minutes=rng.randrange(60 * 24 * 90)),
+        })
+        for product in rng.sample(product_rows, min(len(product_rows), rng.randint(1, items_per_order))):
+            item_rows.append({
+                'order_id': order_id,
+                'product_id': product['id'],
+                'quantity': rng.randint(1, 3),
+                'price_cents': product['price_cents'],
+            })
+    _insert(Order.__table__, order_rows, batch_size)
+    _insert(OrderItem.__table__, item_rows, batch_size)
+    db.session.commit()
+
+    # Core-вставки обходят события маппера и place_order — индекс поиска,
+    # агрегаты продаж и витрину обновляем явно
+    search_index.rebuild_index()
+    sales.rebuild()
+    catalog.invalidate()
+    return {
+        'users': len(buyer_ids),
+        'sellers': len(seller_ids),
+        'products': len(product_rows),
+        'orders': len(order_rows),
+        'order_items': len(item_rows),
+    }
+
+
+def init_app(app):
+    @app.cli.command('seed-synthetic')
+    @click.option('--users', default=1000, show_default=True)
+    @click.option('--sellers', default=50, show_default=True)
+    @click.option('--products', default=10000, show_default=True)
+    @click.option('--orders', default=5000, show_default=True)
+    @click.option('--seed', default=42, show_default=True)
+    @click.option('--batch-size', default=1000, show_default=True)
+    def seed_synthetic(users, sellers, products, orders, seed, batch_size):
+        # Добавляет данные к существующим; пароль всех пользователей — 'password'
+        db.create_all()
+        counts = generate(users, sellers, products, orders, seed=seed, batch_size=batch_size)
+        print(', '.join(f'{name}: {count}' for name, count in counts.items()))
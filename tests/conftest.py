@@ -0,0 +1,132 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+os.environ.setdefault('SECRET_KEY', 'test')
+os.environ['MAIL_QUEUE_WORKERS'] = '0'  # Письма остаются в outbox, фоновых отправителей нет
+os.environ['TEMPLATE_WARMUP'] = '0'
+os.environ['SUGGEST_WARMUP'] = '0'
+
+from activity import activity  # noqa: E402
+from app import create_app  # noqa: E402
+from catalog import catalog  # noqa: E402
+from fragments import fragments  # noqa: E402
+from identity import identity_cache  # noqa: E402
+import images  # noqa: E402
+from models import db, User, Product  # noqa: E402
+from orders import place_order  # noqa: E402
+import cart_store  # noqa: E402
+
+
+class Factory:
+    # Тестовые данные: пользователи, товары, вход в тестовом клиенте
+    def __init__(self, app):
+        self.app = app
+        self._users = 0
+
+    def user(self, role='buyer', password='password'):
+        self._users += 1
+        with self.app.app_context():
+            user = User(username=f'{role}{self._users}', email=f'{role}{self._users}@example.com', role=role)
+            user.set_password(password)
+            db.session.add(user)
+            db.session.commit()
+            return user.id
+
+    def product(self, seller_id, name='Кожаный ремень', price=1000, category_id=2, **fields):
+        with self.app.app_context():
+            product = Product(name=name, short_description=f'{name}, описание', long_description='Подробнее',
+                              price=price, category_id=category_id, seller_id=seller_id, **fields)
+            db.session.add(product)
+            db.session.commit()
+            catalog.invalidate()
+            return product.id
+
+    @staticmethod
+    def login(client, user_id):
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        return client
+
+
+def _reset_process_caches():
+    # Кэши в памяти процесса переживают приложение; id в новой базе повторяются
+    catalog.invalidate()
+    activity.clear()
+    identity_cache.clear()
+    fragments.clear()
+    images.clear_cache()
+
+
+@pytest.fixture
+def make_app(tmp_path, monkeypatch):
+    # Приложение на своей SQLite-базе во временном каталоге; config — поверх окружения
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///' + str(tmp_path / 'test.db'))
+    created = []
+
+    def make(config=None):
+        app = create_app({
+            'TESTING': True,
+            'WTF_CSRF_ENABLED': False,
+            'MAIL_SUPPRESS_SEND': True,
+            'JINJA_CACHE_DIR': str(tmp_path / 'jinja_cache'),
+            **(config or {}),
+        })
+        with app.app_context():
+            db.create_all()
+        created.append(app)
+        return app
+
+    _reset_process_caches()
+    yield make
+    for app in created:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+    _reset_process_caches()
+
+
+@pytest.fixture
+def app_config():
+    # Переопределяется в модуле или через @pytest.mark.parametrize('app_config', […])
+    return {}
+
+
+@pytest.fixture
+def app(make_app, app_config):
+    return make_app(app_config)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def factory(app):
+    return Factory(app)
+
+
+@pytest.fixture
+def seeded(factory):
+    # Покупатель, продавец и админ; по десять товаров в каждой из четырёх
+    # категорий, пять заказов по три товара, корзина из трёх товаров
+    users = {role: factory.user(role) for role in ('buyer', 'seller', 'admin')}
+    products = [
+        factory.product(users['seller'], name=f'Ремень {number}', category_id=category_id)
+        for category_id in (1, 2, 3, 4)
+        for number in range(10)
+    ]
+    with factory.app.app_context():
+        for number in range(5):
+            place_order(users['buyer'], {product_id: 1 for product_id in products[number * 3:number * 3 + 3]},
+                        'Москва, ул. Ленина, 1', '+79991234567', 'M', 'buyer@example.com')
+        for product_id in products[20:23]:
+            cart_store.add(users['buyer'], product_id)
+        db.session.commit()
+    return users, products
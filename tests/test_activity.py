@@ -0,0 +1,90 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from activity import ActivityTracker, activity
+from models import db, User
+from querycount import QueryCounter
+
+HOUR_AGO = datetime.utcnow() - timedelta(hours=1)
+
+
+@pytest.fixture
+def user(app, factory):
+    # Пользователь, который последний раз заходил час назад
+    def make(role='buyer'):
+        user_id = factory.user(role)
+        with app.app_context():
+            db.session.get(User, user_id).last_activity = HOUR_AGO
+            db.session.commit()
+        return user_id
+    return make
+
+
+def last_activity(app, user_id):
+    with app.app_context():
+        return db.session.get(User, user_id).last_activity
+
+
+def updates(counter):
+    return [statement for statement in counter.statements if statement.lstrip().upper().startswith('UPDATE')]
+
+
+def test_requests_buffer_activity_without_updates(app, factory, user):
+    user_id = user()
+    client = factory.login(app.test_client(), user_id)
+    with app.app_context(), QueryCounter() as counter:
+        for path in ('/', '/cart', '/my_orders'):
+            assert client.get(path).status_code == 200
+    assert updates(counter) == []
+    assert activity.pending(user_id) > HOUR_AGO
+    assert last_activity(app, user_id) == HOUR_AGO
+
+
+def test_granularity_gate(app):
+    activity.touch(1, last_known=HOUR_AGO)
+    first = activity.pending(1)
+    assert first is not None
+    activity.touch(1, last_known=HOUR_AGO)
+    assert activity.pending(1) == first
+
+    activity.touch(2, last_known=datetime.utcnow() - timedelta(seconds=5))
+    assert activity.pending(2) is None
+
+
+def test_flush_writes_all_users_in_one_statement(app, user):
+    user_ids = [user() for _ in range(3)]
+    for user_id in user_ids:
+        activity.touch(user_id, HOUR_AGO)
+    with app.app_context(), QueryCounter() as counter:
+        assert activity.flush() == 3
+    assert len(updates(counter)) == 1
+    assert all(last_activity(app, user_id) > HOUR_AGO for user_id in user_ids)
+    assert activity.flush() == 0
+
+
+@pytest.mark.parametrize('app_config', [{'ACTIVITY_FLUSH_THRESHOLD': 2}])
+def test_threshold_triggers_flush(app, user):
+    first, second = user(), user()
+    activity.touch(first, HOUR_AGO)
+    assert last_activity(app, first) == HOUR_AGO
+    activity.touch(second, HOUR_AGO)
+    assert last_activity(app, first) > HOUR_AGO and last_activity(app, second) > HOUR_AGO
+
+
+def test_admin_dashboard_flushes_pending_activity(app, factory, user):
+    buyer_id = user()
+    factory.login(app.test_client(), buyer_id).get('/')
+    assert last_activity(app, buyer_id) == HOUR_AGO
+    assert factory.login(app.test_client(), factory.user('admin')).get('/admin_dashboard').status_code == 200
+    assert last_activity(app, buyer_id) > HOUR_AGO
+
+
+def test_shutdown_is_registered_once(make_app, monkeypatch):
+    registered = []
+    monkeypatch.setattr('activity.atexit.register', registered.append)
+    tracker = ActivityTracker()
+    first, second = make_app(), make_app()
+    tracker.init_app(first)
+    tracker.init_app(second)
+    assert registered.count(tracker.shutdown) == 1
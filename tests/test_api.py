@@ -0,0 +1,132 @@
+from decimal import Decimal
+
+import pytest
+
+from models import db, Product
+from orders import place_order
+
+
+def stock_of(app, product_id):
+    with app.app_context():
+        return db.session.get(Product, product_id).stock
+
+
+@pytest.fixture
+def catalog_ids(factory):
+    seller_id = factory.user('seller')
+    other_id = factory.user('seller')
+    belts = [factory.product(seller_id, name=f'Ремень {number}', price=1000 + number) for number in range(5)]
+    bag = factory.product(other_id, name='Сумка', price=2500, category_id=1, stock=3)
+    return {'seller': seller_id, 'other': other_id, 'belts': belts, 'bag': bag}
+
+
+@pytest.fixture
+def buyer(app, factory):
+    user_id = factory.user('buyer')
+    return user_id, factory.login(app.test_client(), user_id)
+
+
+def test_fields_selection(client, catalog_ids):
+    product_id = catalog_ids['belts'][0]
+    assert client.get(f'/api/v1/products/{product_id}?fields=name,price').get_json() == \
+        {'name': 'Ремень 0', 'price': '1000.00'}
+    page = client.get('/api/v1/products?fields=name&per_page=1').get_json()
+    assert page['items'] == [{'name': 'Ремень 0'}] and page['next_cursor']
+
+    response = client.get('/api/v1/products?fields=name,password_hash')
+    assert response.status_code == 400
+    assert 'password_hash' in response.get_json()['error']['message']
+
+
+def test_filters(client, catalog_ids):
+    ids = [item['id'] for item in client.get('/api/v1/products?category=belts').get_json()['items']]
+    assert ids == catalog_ids['belts']
+    ids = [item['id'] for item in client.get(f"/api/v1/products?seller_id={catalog_ids['other']}").get_json()['items']]
+    assert ids == [catalog_ids['bag']]
+    assert client.get('/api/v1/products?category=hats').status_code == 404
+    response = client.get('/api/v1/products?seller_id=abc')
+    assert response.status_code == 400
+    assert response.get_json()['error']['status'] == 400
+
+
+def test_cursor_paging(client, catalog_ids):
+    seen = []
+    url = '/api/v1/products?per_page=2'
+    while url:
+        page = client.get(url).get_json()
+        seen += [item['id'] for item in page['items']]
+        url = page['next_cursor'] and f"/api/v1/products?per_page=2&after={page['next_cursor']}"
+    assert seen == sorted(catalog_ids['belts'] + [catalog_ids['bag']])
+
+    back = client.get(f"/api/v1/products?per_page=2&before={page['prev_cursor']}").get_json()
+    assert [item['id'] for item in back['items']] == seen[2:4]
+
+
+def test_products_etag(client, catalog_ids):
+    response = client.get('/api/v1/products')
+    assert 's-maxage=' in response.headers['Cache-Control']
+    assert client.get('/api/v1/products', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+def test_cart_requires_login(client):
+    response = client.get('/api/v1/cart')
+    assert response.status_code == 401
+    assert response.get_json()['error']['status'] == 401
+
+
+def test_add_to_cart(app, catalog_ids, buyer):
+    _, client = buyer
+    bag = catalog_ids['bag']
+    assert client.post('/api/v1/cart/items', data='product_id=1').status_code == 400
+    assert client.post('/api/v1/cart/items', json={'product_id': bag, 'quantity': 0}).status_code == 400
+    assert client.post('/api/v1/cart/items', json={'product_id': 'x'}).status_code == 400
+    assert client.post('/api/v1/cart/items', json={'product_id': 9999}).status_code == 404
+
+    response = client.post('/api/v1/cart/items', json={'product_id': bag, 'quantity': 2})
+    assert response.status_code == 200
+    cart = response.get_json()
+    assert [(item['product_id'], item['quantity']) for item in cart['items']] == [(bag, 2)]
+    assert cart['items'][0]['reserved_until'] is not None
+    assert cart['total'] == '5000.00'
+    assert stock_of(app, bag) == 1
+
+    response = client.post('/api/v1/cart/items', json={'product_id': bag, 'quantity': 2})
+    assert response.status_code == 409
+    assert stock_of(app, bag) == 1
+    assert client.get('/api/v1/cart').get_json()['items'][0]['quantity'] == 2
+
+
+def test_remove_from_cart(app, catalog_ids, buyer):
+    _, client = buyer
+    bag = catalog_ids['bag']
+    assert client.delete(f'/api/v1/cart/items/{bag}').status_code == 404
+    client.post('/api/v1/cart/items', json={'product_id': bag, 'quantity': 2})
+
+    assert client.delete(f'/api/v1/cart/items/{bag}').get_json()['items'][0]['quantity'] == 1
+    assert stock_of(app, bag) == 2
+    assert client.delete(f'/api/v1/cart/items/{bag}').get_json()['items'] == []
+    assert stock_of(app, bag) == 3
+
+
+def test_cart_etag(catalog_ids, buyer):
+    _, client = buyer
+    client.post('/api/v1/cart/items', json={'product_id': catalog_ids['bag']})
+    response = client.get('/api/v1/cart')
+    assert response.headers['Cache-Control'] == 'private, no-cache'
+    assert client.get('/api/v1/cart', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+    client.post('/api/v1/cart/items', json={'product_id': catalog_ids['belts'][0]})
+    assert client.get('/api/v1/cart', headers={'If-None-Match': response.headers['ETag']}).status_code == 200
+
+
+def test_orders_totals(app, catalog_ids, buyer):
+    user_id, client = buyer
+    belt, bag = catalog_ids['belts'][1], catalog_ids['bag']
+    with app.app_context():
+        place_order(user_id, {belt: 2, bag: 1}, 'Москва', '+79991234567', 'M', 'buyer@example.com')
+        place_order(user_id, {belt: 1}, 'Москва', '+79991234567', 'M', 'buyer@example.com')
+    orders = client.get('/api/v1/orders').get_json()['items']
+    assert [order['total'] for order in orders] == ['1001.00', '4502.00']
+    assert [(line['product_id'], line['quantity'], line['price']) for line in orders[1]['items']] == \
+        [(belt, 2, '1001.00'), (bag, 1, '2500.00')]
+    assert sum(Decimal(order['total']) for order in orders) == Decimal('5503.00')
@@ -0,0 +1,68 @@
+from models import db, CartItem
+from querycount import QueryCounter
+import cart_store
+
+
+def cart_rows(app, user_id):
+    with app.app_context():
+        return sorted((row.product_id, row.quantity) for row in CartItem.query.filter_by(user_id=user_id))
+
+
+def test_add_increments_existing_row_with_one_statement(app, factory):
+    product_id = factory.product(factory.user('seller'))
+    buyer_id = factory.user('buyer')
+    with app.app_context():
+        for quantity in (1, 2):
+            with QueryCounter() as counter:
+                cart_store.add(buyer_id, product_id, quantity)
+            assert counter.count == 1
+        db.session.commit()
+    assert cart_rows(app, buyer_id) == [(product_id, 3)]
+
+
+def test_remove_decrements_then_deletes(app, factory):
+    product_id = factory.product(factory.user('seller'))
+    buyer_id = factory.user('buyer')
+    with app.app_context():
+        cart_store.add(buyer_id, product_id, 2)
+        assert cart_store.remove(buyer_id, product_id)
+        db.session.commit()
+        assert cart_rows(app, buyer_id) == [(product_id, 1)]
+        assert cart_store.remove(buyer_id, product_id)
+        db.session.commit()
+        assert cart_rows(app, buyer_id) == []
+        assert not cart_store.remove(buyer_id, product_id)
+
+
+def test_lines_load_products_with_one_query(app, factory):
+    seller_id = factory.user('seller')
+    product_ids = [factory.product(seller_id, name=f'Ремень {number}') for number in range(3)]
+    buyer_id = factory.user('buyer')
+    with app.app_context():
+        for quantity, product_id in enumerate(product_ids, start=1):
+            cart_store.add(buyer_id, product_id, quantity)
+        db.session.commit()
+        db.session.expire_all()
+        with QueryCounter() as counter:
+            lines = cart_store.lines(buyer_id)
+            names = [(product.name, quantity) for product, quantity in lines]
+        assert counter.count == 1
+    assert names == [('Ремень 0', 1), ('Ремень 1', 2), ('Ремень 2', 3)]
+
+
+def test_session_cart_is_merged_on_login(app, client, factory):
+    seller_id = factory.user('seller')
+    belt, bag = factory.product(seller_id), factory.product(seller_id)
+    buyer_id = factory.user('buyer')
+    with app.app_context():
+        cart_store.add(buyer_id, belt)
+        db.session.commit()
+    with client.session_transaction() as session:
+        session['cart'] = [str(belt), str(belt), str(bag), '9999']
+
+    response = client.post('/login', data={'email': 'buyer2@example.com', 'password': 'password'})
+    assert response.status_code == 302
+    client.get('/cart')
+    assert cart_rows(app, buyer_id) == [(belt, 3), (bag, 1)]
+    with client.session_transaction() as session:
+        assert 'cart' not in session
@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from catalog import OTHER, catalog, load_listing
+
+
+def rename_elsewhere(app, product_id, name):
+    # Запись из другого воркера: своё соединение, без catalog.invalidate()
+    engine = create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
+    with engine.begin() as conn:
+        conn.execute(text('UPDATE product SET name = :name, updated_at = :now WHERE id = :id'),
+                     {'name': name, 'now': datetime.utcnow(), 'id': product_id})
+    engine.dispose()
+
+
+@pytest.mark.parametrize('app_config', [{'CATALOG_STATE_TTL': 0}])
+def test_storefront_follows_writes_from_other_workers(app, client, factory):
+    product_id = factory.product(factory.user('seller'), name='Старое имя')
+
+    first = client.get('/')
+    assert 'Старое имя' in first.get_data(as_text=True)
+
+    rename_elsewhere(app, product_id, 'Новое имя')
+    second = client.get('/')
+    assert 'Новое имя' in second.get_data(as_text=True)
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert 'Новое имя' in client.get(f'/product/{product_id}').get_data(as_text=True)
+
+
+@pytest.mark.parametrize('app_config', [{'CATALOG_STATE_TTL': 60}])
+def test_state_is_reused_within_ttl_and_reset_by_local_invalidate(app, client, factory):
+    product_id = factory.product(factory.user('seller'), name='Старое имя')
+    etag = client.get('/').headers['ETag']
+
+    rename_elsewhere(app, product_id, 'Новое имя')
+    # В пределах TTL тело и ETag согласованы: оба по старому состоянию
+    cached = client.get('/')
+    assert 'Старое имя' in cached.get_data(as_text=True)
+    assert cached.headers['ETag'] == etag
+
+    catalog.invalidate()
+    fresh = client.get('/')
+    assert 'Новое имя' in fresh.get_data(as_text=True)
+    assert fresh.headers['ETag'] != etag
+
+
+@pytest.mark.parametrize('app_config', [{'CATALOG_CATEGORY_LIMIT': 2}])
+def test_listing_takes_first_products_of_each_category(app, factory):
+    seller, other_seller = factory.user('seller'), factory.user('seller')
+    belts = [factory.product(seller, name=f'Ремень {n}', category_id=2) for n in range(3)]
+    watches = [factory.product(other_seller, name=f'Часы {n}', category_id=3) for n in range(3)]
+    loose = [factory.product(seller, name=f'Без категории {n}', category_id=None) for n in range(3)]
+
+    with app.app_context():
+        listing = {category.slug: [row.id for row in rows] for category, rows in load_listing().items()}
+        assert listing == {'tshirts': [], 'belts': belts[:2], 'watches': watches[:2], 'bags': [],
+                           OTHER.slug: loose[:2]}
+
+        listing = {category.slug: [row.id for row in rows] for category, rows in load_listing(seller).items()}
+        assert listing == {'tshirts': [], 'belts': belts[:2], 'watches': [], 'bags': [], OTHER.slug: loose[:2]}
@@ -0,0 +1,97 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+import database
+from models import db, Product
+from routing import replicas
+
+
+def pragma(name):
+    return db.session.execute(text(f'PRAGMA {name}')).scalar()
+
+
+def test_sqlite_pragmas_are_applied_on_connect(app):
+    with app.app_context():
+        assert pragma('journal_mode') == 'wal'
+        assert pragma('synchronous') == 1  # NORMAL
+        assert pragma('busy_timeout') == 5000
+        assert pragma('temp_store') == 2  # MEMORY
+        assert pragma('foreign_keys') == 0
+
+
+def test_sqlite_pragmas_come_from_environment(make_app, monkeypatch):
+    monkeypatch.setenv('SQLITE_JOURNAL_MODE', 'DELETE')
+    monkeypatch.setenv('SQLITE_SYNCHRONOUS', 'FULL')
+    monkeypatch.setenv('SQLITE_BUSY_TIMEOUT', '1500')
+    monkeypatch.setenv('SQLITE_FOREIGN_KEYS', 'on')
+    app = make_app()
+    with app.app_context():
+        assert pragma('journal_mode') == 'delete'
+        assert pragma('synchronous') == 2  # FULL
+        assert pragma('busy_timeout') == 1500
+        assert pragma('foreign_keys') == 1
+        assert app.config['SQLALCHEMY_ENGINE_OPTIONS']['connect_args'] == {'timeout': 1.5}
+
+        db.session.add(Product(name='Ремень', price_cents=1000, category_id=2, seller_id=999))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+
+
+def test_engine_options_from_environment(monkeypatch):
+    monkeypatch.setenv('DB_POOL_SIZE', '20')
+    monkeypatch.setenv('DB_MAX_OVERFLOW', '0')
+    monkeypatch.setenv('DB_POOL_TIMEOUT', '3')
+    monkeypatch.setenv('DB_POOL_RECYCLE', '600')
+    monkeypatch.setenv('DB_POOL_PRE_PING', 'false')
+    assert database.engine_options('postgresql://shop@db/shop') == {
+        'pool_pre_ping': False, 'pool_recycle': 600, 'pool_size': 20, 'max_overflow': 0, 'pool_timeout': 3,
+    }
+    # У SQLite пула фиксированного размера нет: только таймаут драйвера
+    assert database.engine_options('sqlite:///shop.db') == {
+        'pool_pre_ping': False, 'pool_recycle': 600, 'connect_args': {'timeout': 5.0},
+    }
+
+
+def test_engine_options_defaults(monkeypatch):
+    for name in ('DB_POOL_SIZE', 'DB_MAX_OVERFLOW', 'DB_POOL_TIMEOUT', 'DB_POOL_RECYCLE', 'DB_POOL_PRE_PING'):
+        monkeypatch.delenv(name, raising=False)
+    assert database.engine_options('postgresql://shop@db/shop') == {
+        'pool_pre_ping': True, 'pool_recycle': 1800, 'pool_size': 5, 'max_overflow': 10, 'pool_timeout': 30,
+    }
+
+
+def test_database_url_from_environment(monkeypatch):
+    monkeypatch.delenv('DATABASE_URL', raising=False)
+    assert database.database_url() == database.DEFAULT_DATABASE_URL
+    monkeypatch.setenv('DATABASE_URL', 'postgres://shop@db/shop')
+    assert database.database_url() == 'postgresql://shop@db/shop'
+
+
+def test_app_engine_uses_configured_options(make_app, monkeypatch):
+    monkeypatch.setenv('DB_POOL_RECYCLE', '42')
+    app = make_app()
+    with app.app_context():
+        assert db.engine.url.render_as_string() == app.config['SQLALCHEMY_DATABASE_URI']
+        assert db.engine.pool._recycle == 42
+
+
+def test_db_replica_sync_copies_primary(make_app, tmp_path):
+    app = make_app({'DATABASE_REPLICA_URLS': ['sqlite:///' + str(tmp_path / 'replica.db')]})
+    with app.app_context():
+        product = Product(name='Ремень', price_cents=1000, category_id=2)
+        db.session.add(product)
+        db.session.commit()
+        product_id = product.id
+
+    result = app.test_cli_runner().invoke(args=['db-replica-sync'])
+    assert result.exit_code == 0, result.output
+    assert 'Скопировано в реплик: 1' in result.output
+    with app.app_context(), replicas.engines[0].connect() as conn:
+        assert conn.execute(text('SELECT id FROM product')).scalars().all() == [product_id]
+
+
+def test_db_replica_sync_needs_replicas(app):
+    result = app.test_cli_runner().invoke(args=['db-replica-sync'])
+    assert result.exit_code != 0
+    assert 'DATABASE_REPLICA_URLS' in result.output
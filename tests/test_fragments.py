@@ -0,0 +1,123 @@
+import io
+import os
+from datetime import timedelta
+
+import pytest
+from PIL import Image
+
+from models import db, Product
+from fragments import FragmentCache, fragments
+import images
+
+
+def render(cache, name, object_id, version, html):
+    return cache.render(name, object_id, version, caller=lambda: html)
+
+
+def test_lru_evicts_least_recently_used():
+    cache = FragmentCache(maxsize=2)
+    render(cache, 'card', 1, 'v1', 'first')
+    render(cache, 'card', 2, 'v1', 'second')
+    assert cache.get(cache.key('card', 1, 'v1')) == 'first'  # 1 теперь свежее 2
+
+    render(cache, 'card', 3, 'v1', 'third')
+    assert cache.get(cache.key('card', 2, 'v1')) is None
+    assert cache.get(cache.key('card', 1, 'v1')) == 'first'
+    assert cache.stats()['size'] == 2
+
+    # Вытесненный ключ не остаётся в индексе по объекту
+    assert cache._by_object['2'] == set()
+    cache.invalidate(1)
+    assert cache.get(cache.key('card', 1, 'v1')) is None
+    assert cache.get(cache.key('card', 3, 'v1')) == 'third'
+
+
+def test_render_caches_until_version_changes():
+    cache = FragmentCache()
+    assert render(cache, 'card', 1, 'v1', 'old') == 'old'
+    assert render(cache, 'card', 1, 'v1', 'new') == 'old'
+    assert render(cache, 'card', 1, 'v2', 'new') == 'new'
+    assert cache.stats() == {'hits': 1, 'misses': 2, 'hit_ratio': 0.3333, 'size': 2, 'maxsize': 2048}
+
+
+def test_disabled_cache_always_renders():
+    cache = FragmentCache(maxsize=0)
+    cache.enabled = False
+    assert render(cache, 'card', 1, 'v1', 'old') == 'old'
+    assert render(cache, 'card', 1, 'v1', 'new') == 'new'
+    assert cache.stats()['size'] == 0
+
+
+@pytest.fixture
+def product_id(factory):
+    return factory.product(factory.user('seller'), name='Кожаный ремень')
+
+
+def detail(client, product_id):
+    response = client.get(f'/product/{product_id}')
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+def test_detail_fragment_key_follows_updated_at(app, client, product_id):
+    before = fragments.stats()
+    detail(client, product_id)
+    detail(client, product_id)
+    after = fragments.stats()
+    assert after['hits'] - before['hits'] >= 1
+    assert after['size'] > before['size']
+
+    with app.app_context():
+        product = db.session.get(Product, product_id)
+        product.name = 'Плетёный ремень'
+        product.updated_at = product.updated_at + timedelta(seconds=1)
+        db.session.commit()
+    assert 'Плетёный ремень' in detail(client, product_id)
+
+
+def test_stale_version_is_served_when_updated_at_is_kept(app, client, product_id):
+    # Ключ строится по updated_at: без его смены фрагмент считается свежим
+    detail(client, product_id)
+    with app.app_context():
+        product = db.session.get(Product, product_id)
+        db.session.execute(
+            db.update(Product).where(Product.id == product_id)
+            .values(name='Плетёный ремень', updated_at=product.updated_at)
+        )
+        db.session.commit()
+    assert 'Кожаный ремень' in detail(client, product_id)
+
+
+def test_detail_fragment_key_follows_variants_ready(app, client, product_id, tmp_path):
+    app.static_folder = str(tmp_path / 'static')
+    app.config['UPLOAD_FOLDER'] = os.path.join(app.static_folder, 'uploads')
+    buffer = io.BytesIO()
+    Image.new('RGB', (1000, 500), 'brown').save(buffer, 'PNG')
+    buffer.seek(0)
+    with app.test_request_context():
+        relative = images.store(buffer, 'belt.png', background=False)
+    with app.app_context():
+        db.session.get(Product, product_id).image_url = relative
+        db.session.commit()
+
+    assert 'srcset' not in detail(client, product_id)
+    with app.test_request_context():
+        images.build_variants(relative)
+    assert '-320.' in detail(client, product_id)
+
+
+def test_admin_fragment_cache_stats(app, client, factory, product_id):
+    detail(client, product_id)
+    detail(client, product_id)
+
+    buyer = factory.login(app.test_client(), factory.user('buyer'))
+    assert buyer.get('/admin/fragment_cache').status_code == 302
+
+    admin = factory.login(app.test_client(), factory.user('admin'))
+    response = admin.get('/admin/fragment_cache')
+    assert response.status_code == 200
+    stats = response.get_json()
+    assert stats == fragments.stats()
+    assert stats['size'] >= 1 and stats['hits'] >= 1
+    assert stats['maxsize'] == app.config.get('FRAGMENT_CACHE_SIZE', 2048)
+    assert 0 < stats['hit_ratio'] <= 1
@@ -0,0 +1,66 @@
+import pytest
+
+from models import db
+import cart_store
+
+PERSONAL_PAGES = [
+    '/',
+    '/category/belts',
+    '/product/{product_id}',
+    '/search?q=ремень',
+    '/cart',
+    '/checkout',
+    '/my_orders',
+    '/buyer_dashboard',
+]
+
+
+@pytest.fixture
+def product_id(factory):
+    return factory.product(factory.user('seller'), name='Кожаный ремень')
+
+
+@pytest.fixture
+def buyer(app, factory, product_id):
+    # Вошедший покупатель с товаром в корзине
+    user_id = factory.user('buyer')
+    with app.app_context():
+        cart_store.add(user_id, product_id)
+        db.session.commit()
+    return factory.login(app.test_client(), user_id)
+
+
+def assert_private(response):
+    cache_control = response.headers.get('Cache-Control', '')
+    assert 'private' in cache_control and 'no-cache' in cache_control
+    assert 'public' not in cache_control and 's-maxage' not in cache_control
+    assert 'Cookie' in response.headers.get('Vary', '')
+
+
+def test_anonymous_catalog_page_is_public_and_revalidated(client, product_id):
+    response = client.get('/')
+    assert 's-maxage=' in response.headers['Cache-Control']
+    assert response.headers['ETag']
+    assert client.get('/', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+
+@pytest.mark.parametrize('path', PERSONAL_PAGES)
+def test_logged_in_pages_are_private(buyer, product_id, path):
+    response = buyer.get(path.format(product_id=product_id))
+    assert response.status_code == 200
+    assert_private(response)
+
+
+@pytest.mark.parametrize('path', ['/', '/product/{product_id}'])
+def test_anonymous_etag_is_not_reused_when_logged_in(client, buyer, product_id, path):
+    path = path.format(product_id=product_id)
+    etag = client.get(path).headers['ETag']
+    response = buyer.get(path, headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert_private(response)
+
+
+def test_page_with_flash_message_is_private(client, product_id):
+    with client.session_transaction() as session:
+        session['_flashes'] = [('success', 'Товар добавлен в корзину')]
+    assert_private(client.get('/'))
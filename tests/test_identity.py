@@ -0,0 +1,97 @@
+import pytest
+from sqlalchemy import update
+
+from models import db, User
+import identity
+from identity import IdentityCache, identity_cache
+
+
+def rename_behind_cache(app, user_id, username):
+    # Изменение мимо маршрутов приложения — как из другого воркера
+    with app.app_context():
+        db.session.execute(update(User).where(User.id == user_id).values(username=username))
+        db.session.commit()
+
+
+def cached_username(app, user_id):
+    with app.app_context():
+        return identity_cache.get(user_id).username
+
+
+def test_identity_is_cached_for_ttl(app, factory, monkeypatch):
+    user_id = factory.user('buyer')
+    assert cached_username(app, user_id) == 'buyer1'
+    before = identity_cache.stats()
+
+    rename_behind_cache(app, user_id, 'renamed')
+    assert cached_username(app, user_id) == 'buyer1'
+    assert identity_cache.stats()['hits'] == before['hits'] + 1
+
+    later = identity.time.monotonic() + app.config['IDENTITY_CACHE_TTL'] + 1
+    monkeypatch.setattr(identity.time, 'monotonic', lambda: later)
+    assert cached_username(app, user_id) == 'renamed'
+
+
+@pytest.mark.parametrize('app_config', [{'IDENTITY_CACHE_TTL': 0}])
+def test_zero_ttl_disables_the_cache(app, factory):
+    user_id = factory.user('buyer')
+    assert cached_username(app, user_id) == 'buyer1'
+    rename_behind_cache(app, user_id, 'renamed')
+    assert cached_username(app, user_id) == 'renamed'
+    assert identity_cache.stats()['size'] == 0
+
+
+def test_size_limit_prunes_oldest_entries(app, factory):
+    cache = IdentityCache()
+    cache.max_entries = 2
+    ids = [factory.user('buyer') for _ in range(3)]
+    with app.app_context():
+        for user_id in ids:
+            cache.get(user_id)
+        assert list(cache._entries) == ids[1:]
+        assert cache.get(12345) is None
+        assert cache.stats()['size'] == 2
+
+
+@pytest.fixture
+def admin(app, factory):
+    return factory.login(app.test_client(), factory.user('admin'))
+
+
+def test_edit_user_invalidates_identity(app, factory, admin):
+    user_id = factory.user('buyer')
+    buyer = factory.login(app.test_client(), user_id)
+    assert buyer.get('/seller_dashboard').status_code == 302
+
+    response = admin.post(f'/edit_user/{user_id}', data={
+        'username': 'promoted', 'email': 'promoted@example.com', 'role': 'seller',
+    })
+    assert response.status_code == 302
+    assert buyer.get('/seller_dashboard').status_code == 200
+    assert cached_username(app, user_id) == 'promoted'
+
+
+def test_edit_profile_invalidates_identity(app, factory):
+    user_id = factory.user('buyer')
+    buyer = factory.login(app.test_client(), user_id)
+    assert 'buyer1@example.com' in buyer.get('/edit_profile').get_data(as_text=True)
+
+    response = buyer.post('/edit_profile', data={
+        'username': 'renamed', 'email': 'renamed@example.com', 'password': '',
+    })
+    assert response.status_code == 302
+    page = buyer.get('/edit_profile').get_data(as_text=True)
+    assert 'renamed@example.com' in page and 'buyer1@example.com' not in page
+
+
+def test_deleted_user_is_logged_out(app, factory, admin):
+    user_id = factory.user('buyer')
+    buyer = factory.login(app.test_client(), user_id)
+    assert buyer.get('/my_orders').status_code == 200
+
+    assert admin.get(f'/delete_user/{user_id}').status_code == 302
+    response = buyer.get('/my_orders')
+    assert response.status_code == 302
+    assert '/login' in response.headers['Location']
+    with app.app_context():
+        assert identity_cache.get(user_id) is None
@@ -0,0 +1,140 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from models import db, Product
+import images
+
+
+def png(width, height=None, color='brown'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height or width // 2), color).save(buffer, 'PNG')
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.fixture
+def static(app, tmp_path):
+    app.static_folder = str(tmp_path / 'static')
+    app.config['UPLOAD_FOLDER'] = os.path.join(app.static_folder, 'uploads')
+    return tmp_path / 'static'
+
+
+@pytest.fixture
+def ctx(app, static):
+    with app.test_request_context():
+        yield
+
+
+def test_store_names_files_by_content_hash(ctx, static):
+    first = images.store(png(40), 'belt.PNG', background=False)
+    assert first.startswith('uploads/') and first.endswith('.png')
+    assert first.split('/')[1] == os.path.basename(first)[:2]
+    assert images.store(png(40), 'copy.png', background=False) == first
+    assert images.store(png(40, color='black'), 'other.png', background=False) != first
+    assert (static / first).read_bytes() == png(40).getvalue()
+
+    buffer = io.BytesIO()
+    Image.new('RGB', (8, 8)).save(buffer, 'JPEG')
+    buffer.seek(0)
+    assert images.store(buffer, 'photo.jpeg', background=False).endswith('.jpg')
+
+
+@pytest.mark.parametrize('stream, filename', [(png(40), 'belt.exe'), (png(40), 'belt'), (io.BytesIO(b'not an image'), 'belt.png')])
+def test_store_rejects_bad_files(ctx, stream, filename):
+    with pytest.raises(images.InvalidImage):
+        images.store(stream, filename, background=False)
+
+
+def test_variants_url_and_srcset(ctx, static):
+    relative = images.store(png(1000), 'belt.png', background=False)
+    assert images.image_url(relative) == f'/static/{relative}'
+    assert images.image_srcset(relative) == ''
+
+    assert images.build_variants(relative) == [320, 800]
+    base = relative[:-len('.png')]
+    for width in (320, 800):
+        for ext in ('jpg', 'webp'):
+            assert (static / f'{base}-{width}.{ext}').exists()
+    assert images.image_url(relative, 'card') == f'/static/{base}-320.jpg'
+    assert images.image_url(relative, 'detail', 'webp') == f'/static/{base}-800.webp'
+    assert images.image_url(relative, 'banner') == f'/static/{relative}'
+    assert images.image_srcset(relative, 'webp') == \
+        f'/static/{base}-320.webp 320w, /static/{base}-800.webp 800w, /static/{relative} 1000w'
+    assert images.variants_ready(relative)
+
+
+def count_exists(monkeypatch):
+    calls = []
+    exists = os.path.exists
+
+    def counting(path):
+        calls.append(path)
+        return exists(path)
+    monkeypatch.setattr(images.os.path, 'exists', counting)
+    return calls
+
+
+def test_small_image_is_remembered_without_variants(ctx, static, monkeypatch):
+    relative = images.store(png(100), 'small.png', background=False)
+    assert images.build_variants(relative) == []
+    calls = count_exists(monkeypatch)
+    for _ in range(3):
+        assert images.image_url(relative) == f'/static/{relative}'
+        assert images.image_srcset(relative) == ''
+    assert calls == []
+
+
+@pytest.mark.parametrize('app_config', [{'IMAGE_MISSING_TTL': 60}])
+def test_missing_variants_are_rechecked_after_ttl(app, ctx, static, monkeypatch):
+    relative = images.store(png(1000), 'belt.png', background=False)
+    calls = count_exists(monkeypatch)
+    images.image_url(relative)
+    checked = len(calls)
+    for _ in range(5):
+        images.image_url(relative)
+    assert len(calls) == checked  # Отсутствие вариантов закэшировано
+
+    monkeypatch.undo()
+    images.build_variants(relative)  # Построение в этом процессе сбрасывает запись
+    assert images.image_url(relative).endswith('-320.jpg')
+
+    # Варианты построил другой воркер: этот процесс увидит их после TTL
+    other = images.store(png(1200), 'other.png', background=False)
+    assert images.image_url(other) == f'/static/{other}'
+    remembered = dict(images._ready)
+    images.build_variants(other)
+    images._ready.update(remembered)
+    assert images.image_url(other) == f'/static/{other}'
+    now = images.time.monotonic()
+    monkeypatch.setattr(images.time, 'monotonic', lambda: now + 61)
+    assert images.image_url(other).endswith('-320.jpg')
+
+
+def test_without_pillow_originals_are_served(ctx, static, monkeypatch):
+    relative = images.store(png(1000), 'belt.png', background=False)
+    images.build_variants(relative)
+    images.clear_cache()
+    monkeypatch.setattr(images, 'Image', None)
+    assert images.build_variants(relative) == []
+    assert images.schedule_variants(relative) is None
+    assert images.image_url(relative).endswith('-320.jpg')
+    assert images.image_srcset(relative).endswith('800.jpg 800w')
+
+
+def test_images_backfill(app, factory, static, tmp_path):
+    source = tmp_path / 'img'
+    source.mkdir()
+    (source / 'belt.png').write_bytes(png(1000).getvalue())
+    (source / 'notes.txt').write_text('не картинка')
+    product_id = factory.product(factory.user('seller'), image_url='belt.png')
+
+    result = app.test_cli_runner().invoke(args=['images-backfill', str(source)])
+    assert result.exit_code == 0, result.output
+    assert 'Обработано изображений: 1, обновлено товаров: 1' in result.output
+    with app.app_context():
+        relative = db.session.get(Product, product_id).image_url
+    assert relative.startswith('uploads/')
+    assert (static / relative.replace('.png', '-320.webp')).exists()
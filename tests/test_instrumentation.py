@@ -0,0 +1,101 @@
+import re
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from models import db
+from instrumentation import Histogram
+
+SERVER_TIMING = re.compile(
+    r'^app;dur=[\d.]+, db;dur=([\d.]+);desc="(\d+) queries", tpl;dur=([\d.]+)(?:, (\w+);dur=[\d.]+)*$'
+)
+
+
+@pytest.fixture
+def app_config():
+    return {'METRICS_ENABLED': True}
+
+
+@pytest.fixture
+def product_id(factory):
+    return factory.product(factory.user('seller'))
+
+
+def metric(client, line):
+    # Значение счётчика в /metrics; 0, если строки ещё нет
+    body = client.get('/metrics').get_data(as_text=True)
+    match = re.search(r'^' + re.escape(line) + r' (\S+)$', body, re.MULTILINE)
+    return float(match.group(1)) if match else 0
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram(buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value)
+    assert list(histogram.cumulative()) == [('0.1', 2), ('1.0', 3), ('+Inf', 4)]
+    assert histogram.count == 4 and histogram.total == pytest.approx(3.65)
+
+
+def test_server_timing_header(client, product_id):
+    response = client.get(f'/product/{product_id}')
+    match = SERVER_TIMING.match(response.headers['Server-Timing'])
+    assert match, response.headers['Server-Timing']
+    assert int(match.group(2)) > 0
+    assert float(match.group(3)) > 0  # страница рендерит шаблон
+
+
+def test_timed_sections_appear_in_server_timing(client, factory):
+    factory.user('buyer')
+    response = client.post('/login', data={'email': 'buyer1@example.com', 'password': 'password'})
+    assert response.status_code == 302
+    assert 'password;dur=' in response.headers['Server-Timing']
+
+
+def test_metrics_count_requests_and_statements(client, product_id):
+    requests = 'http_requests_total{endpoint="product_detail",status="200"}'
+    missing = 'http_requests_total{endpoint="product_detail",status="404"}'
+    latency = 'http_request_duration_seconds_count{endpoint="product_detail"}'
+    statements = 'sql_statements_total{endpoint="product_detail"}'
+    before = {line: metric(client, line) for line in (requests, missing, latency, statements)}
+
+    response = client.get(f'/product/{product_id}')
+    queries = int(SERVER_TIMING.match(response.headers['Server-Timing']).group(2))
+    assert client.get('/product/999999').status_code == 404
+
+    assert metric(client, requests) == before[requests] + 1
+    assert metric(client, missing) == before[missing] + 1
+    assert metric(client, latency) == before[latency] + 2
+    assert metric(client, statements) >= before[statements] + queries
+
+    response = client.get('/metrics')
+    assert response.mimetype == 'text/plain'
+    body = response.get_data(as_text=True)
+    assert 'http_request_duration_seconds_bucket{endpoint="product_detail",le="+Inf"}' in body
+    assert '# TYPE fragment_cache_hits_total counter' in body
+    assert '# TYPE identity_cache_entries gauge' in body
+
+
+@pytest.mark.parametrize('app_config', [{'METRICS_ENABLED': True, 'METRICS_TOKEN': 'secret'}])
+def test_metrics_token(client):
+    assert client.get('/metrics').status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 403
+    assert client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code == 200
+
+
+@pytest.mark.parametrize('app_config', [{'METRICS_ENABLED': False}])
+def test_metrics_disabled(client, product_id):
+    assert client.get('/metrics').status_code == 404
+    assert 'Server-Timing' not in client.get(f'/product/{product_id}').headers
+
+
+def test_failed_statement_leaves_no_timing_state(app, client, product_id):
+    with app.app_context(), db.engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.exec_driver_sql('SELECT * FROM no_such_table')
+            conn.rollback()
+        assert not conn.info.get('query_started')
+        assert conn.exec_driver_sql('SELECT 1').scalar() == 1
+
+    response = client.get(f'/product/{product_id}')
+    assert int(SERVER_TIMING.match(response.headers['Server-Timing']).group(2)) > 0
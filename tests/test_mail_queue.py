@@ -0,0 +1,123 @@
+import socket
+import time
+
+import pytest
+
+from mail_queue import enqueue, mail_queue
+from models import db, OutboxMessage
+
+aiosmtpd = pytest.importorskip('aiosmtpd.controller')
+
+
+class Inbox:
+    # SMTP-сервер для тестов: первые failures писем отклоняет временной ошибкой
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.messages = []
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.failures:
+            self.failures -= 1
+            return '451 Try again later'
+        self.messages.append(envelope)
+        return '250 OK'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp():
+    inbox = Inbox()
+    controller = aiosmtpd.Controller(inbox, hostname='127.0.0.1', port=free_port())
+    controller.start()
+    yield inbox, controller.port
+    controller.stop()
+
+
+@pytest.fixture
+def mail_app(make_app, smtp):
+    def make(**config):
+        return make_app({
+            'MAIL_SERVER': '127.0.0.1',
+            'MAIL_PORT': smtp[1],
+            'MAIL_USE_TLS': False,
+            'MAIL_USERNAME': None,
+            'MAIL_DEFAULT_SENDER': 'shop@example.com',
+            'MAIL_SUPPRESS_SEND': False,
+            'MAIL_QUEUE_BACKOFF': 0,
+            'MAIL_QUEUE_WORKERS': 0,
+            **config,
+        })
+    yield make
+    mail_queue.stop()
+
+
+def queue_message(app, recipient='buyer@example.com'):
+    with app.app_context():
+        message = enqueue('Подтверждение заказа', [recipient], 'Ваш заказ оформлен.')
+        db.session.commit()
+        return message.id
+
+
+def outbox_row(app, message_id):
+    with app.app_context():
+        return db.session.get(OutboxMessage, message_id)
+
+
+def test_delivers_pending_message(mail_app, smtp):
+    app = mail_app()
+    inbox, _ = smtp
+    message_id = queue_message(app)
+
+    assert mail_queue.drain() == 1
+    assert [envelope.rcpt_tos for envelope in inbox.messages] == [['buyer@example.com']]
+    row = outbox_row(app, message_id)
+    assert row.status == 'sent' and row.sent_at is not None
+
+
+def test_temporary_failure_is_retried(mail_app, smtp):
+    app = mail_app()
+    inbox, _ = smtp
+    inbox.failures = 1
+    message_id = queue_message(app)
+
+    assert mail_queue.process_batch() == 0
+    row = outbox_row(app, message_id)
+    assert (row.status, row.attempts) == ('pending', 1)
+    assert '451' in row.last_error
+
+    assert mail_queue.process_batch() == 1
+    assert outbox_row(app, message_id).status == 'sent'
+    assert len(inbox.messages) == 1
+
+
+def test_message_is_dead_after_max_attempts(mail_app, smtp):
+    app = mail_app(MAIL_QUEUE_MAX_ATTEMPTS=2)
+    inbox, _ = smtp
+    inbox.failures = 10
+    message_id = queue_message(app)
+
+    mail_queue.process_batch()
+    mail_queue.process_batch()
+    row = outbox_row(app, message_id)
+    assert (row.status, row.attempts) == ('dead', 2)
+    assert inbox.messages == []
+
+
+def test_workers_start_without_checkout(mail_app, smtp):
+    # Письмо осталось в outbox с прошлого запуска; после рестарта его
+    # отправляют фоновые отправители, запущенные первым же запросом
+    app = mail_app(MAIL_QUEUE_WORKERS=1, MAIL_QUEUE_POLL_INTERVAL=0.05)
+    inbox, _ = smtp
+    message_id = queue_message(app)
+
+    assert app.test_client().get('/').status_code == 200
+    deadline = time.monotonic() + 5
+    while outbox_row(app, message_id).status != 'sent' and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert outbox_row(app, message_id).status == 'sent'
+    assert len(inbox.messages) == 1
@@ -0,0 +1,64 @@
+import os
+
+import pytest
+from sqlalchemy import create_engine, inspect, text
+
+from app import create_app
+from models import db
+import search_index
+from search_index import search_products
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def migrated(tmp_path, monkeypatch):
+    # Приложение на пустой базе: схему строят только миграции
+    monkeypatch.chdir(ROOT)
+    url = 'sqlite:///' + str(tmp_path / 'migrated.db')
+    monkeypatch.setenv('DATABASE_URL', url)
+    app = create_app({'TESTING': True, 'JINJA_CACHE_DIR': str(tmp_path / 'jinja_cache')})
+    runner = app.test_cli_runner()
+
+    def upgrade(revision='head'):
+        result = runner.invoke(args=['db', 'upgrade', revision])
+        assert result.exit_code == 0, result.output
+        return create_engine(url)
+
+    yield app, upgrade
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+def test_upgrade_creates_and_fills_the_fts_table(migrated):
+    app, upgrade = migrated
+    engine = upgrade('3c1e5d7a2b40')
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO user (id, username, email, role) VALUES (1, 's', 's@example.com', 'seller')"))
+        conn.execute(text(
+            "INSERT INTO product (id, name, short_description, price, category, seller_id) "
+            "VALUES (7, 'Ёлочная игрушка', 'Стекло', 9.9, 'Часы', 1)"
+        ))
+    engine.dispose()
+
+    engine = upgrade()
+    assert 'product_fts' in inspect(engine).get_table_names()
+    with engine.connect() as conn:
+        assert conn.execute(text('SELECT rowid, name FROM product_fts')).all() == [(7, 'Елочная игрушка')]
+    engine.dispose()
+
+    with app.test_request_context():
+        assert [product.id for product in search_products('елоч').items] == [7]
+        assert search_index._fts_ready[db.engine] is True
+
+
+def test_downgrade_drops_the_fts_table(migrated):
+    app, upgrade = migrated
+    upgrade().dispose()
+    result = app.test_cli_runner().invoke(args=['db', 'downgrade', '3c1e5d7a2b40'])
+    assert result.exit_code == 0, result.output
+    engine = create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
+    tables = inspect(engine).get_table_names()
+    engine.dispose()
+    assert 'product_fts' not in tables and 'category' not in tables
@@ -0,0 +1,67 @@
+import pytest
+
+from models import db, CartItem, Order, OrderItem, OutboxMessage, Product, ProductSales, SellerSales, DailySales
+import cart_store
+import orders
+import stock
+
+
+def place(user_id, quantities):
+    return orders.place_order(user_id, quantities, 'Москва, ул. Ленина, 1', '+79991234567', 'M', 'buyer@example.com')
+
+
+@pytest.fixture
+def cart(app, factory):
+    seller_id = factory.user('seller')
+    belt = factory.product(seller_id, name='Ремень', stock=5)
+    bag = factory.product(seller_id, name='Сумка', stock=1)
+    buyer_id = factory.user('buyer')
+    with app.app_context():
+        cart_store.add(buyer_id, belt)
+        cart_store.add(buyer_id, bag, 2)
+        db.session.commit()
+    return buyer_id, belt, bag
+
+
+def snapshot(app):
+    with app.app_context():
+        return {
+            'orders': Order.query.count(),
+            'items': OrderItem.query.count(),
+            'outbox': OutboxMessage.query.count(),
+            'sales': ProductSales.query.count() + SellerSales.query.count() + DailySales.query.count(),
+            'cart': sorted((row.product_id, row.quantity) for row in CartItem.query),
+            'stock': sorted((row.id, row.stock) for row in Product.query),
+        }
+
+
+def test_order_is_written_in_one_transaction(app, cart):
+    buyer_id, belt, bag = cart
+    with app.app_context():
+        order = place(buyer_id, {belt: 2, bag: 1})
+        assert [(item.product_id, item.quantity) for item in order.items] == [(belt, 2), (bag, 1)]
+    after = snapshot(app)
+    assert (after['orders'], after['items'], after['outbox'], after['cart']) == (1, 2, 1, [])
+    assert after['sales'] > 0
+    assert after['stock'] == [(belt, 3), (bag, 0)]
+
+
+def test_out_of_stock_on_second_item_rolls_everything_back(app, cart):
+    buyer_id, belt, bag = cart
+    before = snapshot(app)
+    with app.app_context(), pytest.raises(stock.OutOfStock):
+        place(buyer_id, {belt: 1, bag: 2})
+    assert snapshot(app) == before
+
+
+def test_outbox_failure_rolls_everything_back(app, cart, monkeypatch):
+    buyer_id, belt, bag = cart
+    before = snapshot(app)
+
+    def broken_enqueue(*args, **kwargs):
+        raise RuntimeError('outbox недоступен')
+
+    monkeypatch.setattr(orders, 'enqueue', broken_enqueue)
+    with app.app_context(), pytest.raises(RuntimeError):
+        place(buyer_id, {belt: 1, bag: 1})
+    assert snapshot(app) == before
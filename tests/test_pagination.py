@@ -0,0 +1,57 @@
+import html
+import re
+from datetime import datetime
+
+import pytest
+
+from models import Order
+from pagination import decode_cursor, encode_cursor
+
+NEXT_LINK = re.compile(r'href="([^"]*)">Вперёд<')
+
+
+def next_url(response):
+    match = NEXT_LINK.search(response.get_data(as_text=True))
+    return html.unescape(match.group(1)) if match else None
+
+
+@pytest.fixture
+def belts(factory):
+    seller_id = factory.user('seller')
+    return [factory.product(seller_id, name=f'Ремень {number}') for number in range(5)]
+
+
+def test_category_pages_walk_all_products(client, belts):
+    seen = []
+    url = '/category/belts?per_page=2'
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        seen += [int(product_id) for product_id in re.findall(r'/product/(\d+)"', response.get_data(as_text=True))]
+        url = next_url(response)
+    assert sorted(set(seen)) == belts
+
+
+@pytest.mark.parametrize('query', ['name=x', '_external=1', 'endpoint=index', '_anchor=top&_scheme=ftp'])
+def test_query_args_colliding_with_url_for_arguments(client, belts, query):
+    response = client.get(f'/category/belts?per_page=1&{query}')
+    assert response.status_code == 200
+    url = next_url(response)
+    assert url.startswith('/category/belts?')
+    assert client.get(url).status_code == 200
+
+
+@pytest.mark.parametrize('values', [[[1]], [{'a': 1}], ['1'], [True], [1.5], [1, 2], 'x'])
+@pytest.mark.parametrize('path', ['/category/belts?per_page=2&after=', '/api/v1/products?per_page=2&after='])
+def test_cursor_with_wrong_value_types_is_ignored(client, belts, path, values):
+    cursor = encode_cursor(values)
+    first_page = client.get(path.split('&after=')[0])
+    response = client.get(path + cursor)
+    assert response.status_code == 200
+    assert response.get_data() == first_page.get_data()
+
+
+def test_decode_cursor_converts_column_types():
+    assert decode_cursor(encode_cursor([datetime(2024, 5, 1, 12, 30), 7]), (Order.created_at, Order.id)) == \
+        [datetime(2024, 5, 1, 12, 30), 7]
+    assert decode_cursor(encode_cursor([7, 3]), (Order.created_at, Order.id)) is None
@@ -0,0 +1,31 @@
+import pytest
+
+from models import db, User
+from passwords import hash_password, needs_rehash
+
+
+@pytest.mark.parametrize('method', ['scrypt', 'scrypt:32768:8:1', 'pbkdf2', 'pbkdf2:sha256', 'pbkdf2:sha256:1000'])
+def test_hash_with_configured_method_is_kept(method):
+    stored = hash_password('password', method)
+    assert not needs_rehash(stored, {'PASSWORD_HASH_METHOD': method})
+
+
+@pytest.mark.parametrize('stored_method, method', [
+    ('pbkdf2:sha256:1000', 'scrypt'),
+    ('scrypt:16384:8:1', 'scrypt'),
+    ('pbkdf2:sha256:1000', 'pbkdf2:sha256:2000'),
+])
+def test_hash_with_other_parameters_is_replaced(stored_method, method):
+    assert needs_rehash(hash_password('password', stored_method), {'PASSWORD_HASH_METHOD': method})
+
+
+@pytest.mark.parametrize('app_config', [{'PASSWORD_HASH_METHOD': 'scrypt'}])
+def test_login_does_not_rewrite_current_hash(app, client, factory):
+    user_id = factory.user('buyer')
+    with app.app_context():
+        stored = db.session.get(User, user_id).password_hash
+
+    response = client.post('/login', data={'email': 'buyer1@example.com', 'password': 'password'})
+    assert response.status_code == 302
+    with app.app_context():
+        assert db.session.get(User, user_id).password_hash == stored
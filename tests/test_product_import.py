@@ -0,0 +1,143 @@
+import io
+import json
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from models import db, Product
+import product_import
+import search_index
+
+HEADER = 'sku,name,short_description,long_description,price,category,image_url\n'
+
+
+def csv_file(*lines, header=HEADER):
+    return io.BytesIO((header + ''.join(line + '\n' for line in lines)).encode())
+
+
+def jsonl_file(*rows):
+    return io.BytesIO(''.join((row if isinstance(row, str) else json.dumps(row, ensure_ascii=False)) + '\n'
+                              for row in rows).encode())
+
+
+def run_import(app, seller_id, stream, fmt='csv', **kwargs):
+    with app.app_context():
+        return product_import.import_products(stream, seller_id, fmt, **kwargs)
+
+
+def products(app, seller_id):
+    with app.app_context():
+        rows = Product.query.filter_by(seller_id=seller_id).order_by(Product.sku)
+        return {row.sku: (row.name, row.price_cents, row.category_id, row.image_url) for row in rows}
+
+
+@pytest.fixture
+def seller_id(factory):
+    return factory.user('seller')
+
+
+def test_csv_rows_are_inserted(app, seller_id):
+    report = run_import(app, seller_id, csv_file(
+        'B-1,Кожаный ремень,Ремень,Подробнее,"1 299,90",Ремни,uploads/a.png',
+        'B-2,Замшевый ремень,Ремень,Подробнее,500,belts,',
+    ))
+    assert (report.processed, report.imported, report.failed) == (2, 2, 0)
+    assert products(app, seller_id) == {
+        'B-1': ('Кожаный ремень', 129990, 2, 'uploads/a.png'),
+        'B-2': ('Замшевый ремень', 50000, 2, None),
+    }
+    with app.test_request_context():
+        assert [product.sku for product in search_index.search_products('замшевый').items] == ['B-2']
+
+
+def test_reimport_updates_by_sku_without_duplicates(app, seller_id):
+    run_import(app, seller_id, csv_file('B-1,Кожаный ремень,Ремень,Подробнее,1000,Ремни,uploads/a.png'))
+    report = run_import(app, seller_id, jsonl_file(
+        {'sku': 'B-1', 'name': 'Ремень из кожи', 'short_description': 'Ремень', 'long_description': 'Подробнее',
+         'price': 1200, 'category': 'Ремни', 'image_url': 'uploads/b.png'},
+        {'sku': 'B-3', 'name': 'Сумка', 'short_description': 'Сумка', 'long_description': 'Подробнее',
+         'price': '3000', 'category': 'Сумки'},
+    ), fmt='jsonl')
+    assert report.imported == 2
+    assert products(app, seller_id)['B-1'] == ('Ремень из кожи', 120000, 2, 'uploads/b.png')
+    assert len(products(app, seller_id)) == 2
+
+
+@pytest.mark.parametrize('reimport', [
+    csv_file('B-1,Ремень из кожи,Ремень,Подробнее,1000,Ремни', header=HEADER.replace(',image_url', '')),
+    csv_file('B-1,Ремень из кожи,Ремень,Подробнее,1000,Ремни,'),
+], ids=['no column', 'empty cell'])
+def test_reimport_without_image_keeps_existing_image(app, seller_id, reimport):
+    run_import(app, seller_id, csv_file('B-1,Кожаный ремень,Ремень,Подробнее,1000,Ремни,uploads/a.png'))
+    assert run_import(app, seller_id, reimport).imported == 1
+    assert products(app, seller_id)['B-1'] == ('Ремень из кожи', 100000, 2, 'uploads/a.png')
+
+
+def test_bad_rows_are_reported_and_skipped(app, seller_id):
+    report = run_import(app, seller_id, jsonl_file(
+        {'sku': 'OK', 'name': 'Ремень', 'short_description': 'Ремень', 'long_description': 'Подробнее',
+         'price': 1000, 'category': 'Ремни'},
+        {'sku': 'NO-NAME', 'short_description': 'Ремень', 'long_description': 'Подробнее', 'price': 1000},
+        {'sku': 'TEXT', 'name': 'Ремень', 'short_description': 'Ремень', 'long_description': 'Подробнее',
+         'price': 'дорого'},
+        {'sku': 'HUGE', 'name': 'Ремень', 'short_description': 'Ремень', 'long_description': 'Подробнее',
+         'price': '1e40'},
+        {'sku': 'BIG', 'name': 'Ремень', 'short_description': 'Ремень', 'long_description': 'Подробнее',
+         'price': '1e20'},
+        {'sku': 'ZERO', 'name': 'Ремень', 'short_description': 'Ремень', 'long_description': 'Подробнее',
+         'price': '0.001'},
+        {'sku': 'CAT', 'name': 'Ремень', 'short_description': 'Ремень', 'long_description': 'Подробнее',
+         'price': 1000, 'category': 'Шляпы'},
+        '{"sku": ',
+        '[1, 2]',
+    ), fmt='jsonl', default_category='Ремни')
+    assert (report.processed, report.imported, report.failed) == (9, 1, 8)
+    assert [error.sku for error in report.errors] == ['NO-NAME', 'TEXT', 'HUGE', 'BIG', 'ZERO', 'CAT', None, None]
+    assert list(products(app, seller_id)) == ['OK']
+
+
+def test_failed_chunk_is_rolled_back_and_reported(app, seller_id, monkeypatch):
+    index_products = search_index.index_products
+    calls = []
+
+    def fail_second_chunk(connection, product_ids):
+        calls.append(product_ids)
+        if len(calls) == 2:
+            raise OperationalError('INSERT', {}, Exception('disk I/O error'))
+        return index_products(connection, product_ids)
+
+    monkeypatch.setattr(search_index, 'index_products', fail_second_chunk)
+    report = run_import(app, seller_id, csv_file(
+        *(f'B-{number},Ремень {number},Ремень,Подробнее,1000,Ремни,' for number in range(5))
+    ), chunk_size=2)
+    assert (report.imported, report.failed) == (3, 2)
+    assert [(error.line, error.sku) for error in report.errors] == [(4, 'B-2'), (5, 'B-3')]
+    assert list(products(app, seller_id)) == ['B-0', 'B-1', 'B-4']
+
+
+def test_cli_import(app, seller_id, tmp_path):
+    path = tmp_path / 'products.jsonl'
+    path.write_bytes(jsonl_file(
+        {'sku': 'B-1', 'name': 'Ремень', 'short_description': 'Ремень', 'long_description': 'Подробнее', 'price': 1000},
+        {'sku': 'B-2', 'name': 'Ремень', 'price': 'дорого'},
+    ).getvalue())
+    result = app.test_cli_runner().invoke(args=['products-import', str(path), '--seller', str(seller_id),
+                                                '--category', 'Ремни'])
+    assert result.exit_code == 0, result.output
+    assert 'загружено: 1, с ошибками: 1' in result.output
+    assert list(products(app, seller_id)) == ['B-1']
+
+
+def test_import_route(app, factory, seller_id):
+    client = factory.login(app.test_client(), seller_id)
+    response = client.post('/import_products', data={
+        'file': (csv_file('B-1,Ремень,Ремень,Подробнее,1000,Ремни,', 'B-2,Ремень,Ремень,Подробнее,1e40,Ремни,'),
+                 'products.csv'),
+        'category': '',
+    }, content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert 'загружено: 1, с ошибками: 1' in response.get_data(as_text=True)
+    assert list(products(app, seller_id)) == ['B-1']
+
+    buyer = factory.login(app.test_client(), factory.user('buyer'))
+    assert buyer.get('/import_products').status_code == 302
@@ -0,0 +1,56 @@
+import pytest
+
+from querycount import QueryBudgetExceeded, QueryCounter, parse_budgets
+
+# Сколько SQL-запросов может выполнить маршрут на данных фикстуры seeded.
+# Рост числа — обычно N+1 (ленивая загрузка в цикле шаблона).
+ROUTES = [
+    (None, '/', 3),
+    (None, '/category/belts', 3),
+    (None, '/product/{product_id}', 2),
+    (None, '/search?q=ремень', 2),
+    ('buyer', '/cart', 3),
+    ('buyer', '/checkout', 2),
+    ('buyer', '/my_orders', 3),
+    ('buyer', '/buyer_dashboard', 1),
+    ('seller', '/seller_dashboard', 5),
+    ('seller', '/my_products', 2),
+    ('admin', '/admin_dashboard', 6),
+    (None, '/api/v1/products?category=belts', 3),
+    (None, '/api/v1/products/{product_id}', 2),
+    (None, '/api/v1/search?q=ремень', 2),
+    ('buyer', '/api/v1/cart', 2),
+    ('buyer', '/api/v1/orders', 3),
+]
+
+
+@pytest.mark.parametrize('role, path, budget', ROUTES, ids=[path for _, path, _ in ROUTES])
+def test_route_query_budget(app, factory, seeded, role, path, budget):
+    users, products = seeded
+    client = app.test_client()
+    if role is not None:
+        factory.login(client, users[role])
+    with app.app_context(), QueryCounter() as counter:
+        response = client.get(path.format(product_id=products[11]))
+    assert response.status_code == 200
+    statements = '\n'.join(counter.statements)
+    assert counter.count <= budget, f'{path}: {counter.count} запросов при бюджете {budget}\n{statements}'
+
+
+def test_budgets_from_create_app_config_are_enforced(make_app):
+    app = make_app({'QUERY_BUDGETS': {'index': 0}})
+    with pytest.raises(QueryBudgetExceeded):
+        app.test_client().get('/')
+
+
+def test_budget_can_be_changed_after_startup(app):
+    client = app.test_client()
+    assert client.get('/').status_code == 200
+    app.config['QUERY_BUDGET'] = 0
+    with pytest.raises(QueryBudgetExceeded):
+        client.get('/search?q=ремень')
+
+
+def test_parse_budgets():
+    assert parse_budgets('index=4, product_detail = 3,,') == {'index': 4, 'product_detail': 3}
+    assert parse_budgets('') == {}
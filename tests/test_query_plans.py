@@ -0,0 +1,19 @@
+import query_plans
+
+
+def test_pages_do_not_scan_whole_tables(app, seeded):
+    with app.app_context():
+        found, checked = query_plans.check(app)
+    assert [endpoint for endpoint, count in checked.items() if count is None] == []
+    report = '\n'.join(f'{problem.endpoint}: полный просмотр {problem.table}\n  {problem.statement}\n  {problem.plan}'
+                       for problem in found)
+    assert found == [], report
+
+
+def test_scan_without_index_is_reported(app, monkeypatch):
+    with app.app_context():
+        statement = 'SELECT product.id FROM product WHERE product.long_description = ?'
+        plan = query_plans.explain(statement, ('x',))
+        assert [problem.table for problem in query_plans.problems('search', statement, plan)] == ['product']
+        monkeypatch.setitem(query_plans.ALLOWED, ('search', 'product'), 'тест')
+        assert [problem.table for problem in query_plans.problems('search', statement, plan)] == []
@@ -0,0 +1,37 @@
+import re
+
+import pytest
+
+from database import sync_sqlite_replicas
+from models import db
+from querycount import QueryBudgetExceeded, QueryCounter
+from routing import replicas
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    return {'DATABASE_REPLICA_URLS': ['sqlite:///' + str(tmp_path / 'replica.db')], 'METRICS_ENABLED': True}
+
+
+@pytest.fixture
+def product_id(app, factory):
+    product_id = factory.product(factory.user('seller'))
+    with app.app_context():
+        sync_sqlite_replicas(db.engine, replicas.engines)
+    return product_id
+
+
+def test_replica_reads_are_counted(app, client, product_id):
+    with app.app_context(), QueryCounter(replicas.engines[0]) as on_replica:
+        response = client.get(f'/api/v1/products/{product_id}')
+    assert response.status_code == 200
+    assert on_replica.count > 0
+    timing = re.search(r'"(\d+) queries"', response.headers['Server-Timing'])
+    assert int(timing.group(1)) >= on_replica.count
+    assert f'sql_statements_total{{endpoint="api.product"}} {timing.group(1)}' in client.get('/metrics').get_data(as_text=True)
+
+
+def test_replica_reads_count_toward_query_budget(app, client, product_id):
+    app.config['QUERY_BUDGETS'] = {'api.product': 0}
+    with pytest.raises(QueryBudgetExceeded):
+        client.get(f'/api/v1/products/{product_id}')
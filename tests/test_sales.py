@@ -0,0 +1,30 @@
+from models import db, User, ProductSales, SellerSales, DailySales
+from orders import place_order
+import sales
+
+
+def counters(model):
+    return sorted((row.seller_id, row.orders, row.units, row.revenue_cents) for row in model.query)
+
+
+def test_checkout_with_product_of_deleted_seller(app, factory):
+    buyer_id = factory.user('buyer')
+    gone_id = factory.user('seller')
+    seller_id = factory.user('seller')
+    orphan_id = factory.product(gone_id, name='Ремень без продавца', price=500)
+    product_id = factory.product(seller_id, name='Кожаный ремень', price=1000)
+    with app.app_context():
+        db.session.delete(db.session.get(User, gone_id))
+        db.session.commit()
+
+        order_id = place_order(buyer_id, {orphan_id: 2, product_id: 1},
+                               'Москва, ул. Ленина, 1', '+79991234567', 'M', 'buyer@example.com')
+        assert order_id is not None
+
+        assert counters(SellerSales) == [(sales.SHOP_ID, 1, 3, 200000), (seller_id, 1, 1, 100000)]
+        assert [row.product_id for row in ProductSales.query] == [product_id]
+        recorded = (counters(SellerSales), counters(DailySales), counters(ProductSales))
+
+        # Полный пересчёт даёт те же агрегаты
+        sales.rebuild()
+        assert (counters(SellerSales), counters(DailySales), counters(ProductSales)) == recorded
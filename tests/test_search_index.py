@@ -0,0 +1,126 @@
+import pytest
+from sqlalchemy import insert, text
+
+from models import db, Product
+import search_index
+from search_index import FTS_TABLE, search_products
+
+
+@pytest.fixture
+def seller(factory):
+    return factory.user('seller')
+
+
+def search(app, query):
+    with app.test_request_context():
+        return sorted(product.name for product in search_products(query).items)
+
+
+def indexed_ids(app):
+    with app.app_context():
+        return {row[0] for row in db.session.execute(text(f'SELECT rowid FROM {FTS_TABLE}'))}
+
+
+def drop_fts(app):
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text(f'DROP TABLE {FTS_TABLE}'))
+        search_index._fts_ready.pop(db.engine, None)
+
+
+def test_build_match_quotes_prefix_terms():
+    assert search_index.build_match('наручные  ЧАСЫ!') == '"наручные"* "ЧАСЫ"*'
+    assert search_index.build_match('"*) OR (') == '"OR"*'
+    assert search_index.build_match(' !? ') == ''
+
+
+def test_prefix_terms_are_combined_with_and(app, factory, seller):
+    factory.product(seller, name='Наручные часы', category_id=3)
+    factory.product(seller, name='Карманные часы', category_id=3)
+    factory.product(seller, name='Кожаный ремень')
+
+    assert search(app, 'час') == ['Карманные часы', 'Наручные часы']
+    assert search(app, 'нар час') == ['Наручные часы']
+    assert search(app, 'ЧАСЫ') == ['Карманные часы', 'Наручные часы']
+    assert search(app, 'учные') == []  # FTS ищет по началу слова
+    assert search(app, '!!!') == []
+
+
+def test_diacritics_are_folded(app, factory, seller):
+    factory.product(seller, name='Ёлочная игрушка')
+    factory.product(seller, name='Café racer', category_id=1)
+
+    assert search(app, 'елоч') == ['Ёлочная игрушка']
+    assert search(app, 'ЁЛОЧ') == ['Ёлочная игрушка']
+    assert search(app, 'cafe') == ['Café racer']
+
+
+def test_descriptions_are_searched(app, factory, seller):
+    product_id = factory.product(seller, name='Ремень')
+    with app.app_context():
+        db.session.get(Product, product_id).long_description = 'Натуральная кожа буйвола'
+        db.session.commit()
+    assert search(app, 'буйвол') == ['Ремень']
+
+
+def test_mapper_events_keep_index_in_sync(app, factory, seller):
+    product_id = factory.product(seller, name='Кожаный ремень')
+    assert product_id in indexed_ids(app)
+    assert search(app, 'кожаный') == ['Кожаный ремень']
+
+    with app.app_context():
+        product = db.session.get(Product, product_id)
+        product.name = product.short_description = 'Плетёный ремень'
+        db.session.commit()
+    assert search(app, 'кожаный') == []
+    assert search(app, 'плетеный') == ['Плетёный ремень']
+
+    with app.app_context():
+        db.session.delete(db.session.get(Product, product_id))
+        db.session.commit()
+    assert product_id not in indexed_ids(app)
+    assert search(app, 'плетеный') == []
+
+
+def test_like_fallback_without_fts_table(app, factory, seller):
+    factory.product(seller, name='Наручные часы', category_id=3)
+    drop_fts(app)
+
+    assert search(app, 'учные') == ['Наручные часы']
+    # Без таблицы события маппера не падают
+    product_id = factory.product(seller, name='Карманные часы', category_id=3)
+    assert search(app, 'часы') == ['Карманные часы', 'Наручные часы']
+    with app.app_context():
+        db.session.delete(db.session.get(Product, product_id))
+        db.session.commit()
+    assert search(app, 'часы') == ['Наручные часы']
+
+
+def test_like_fallback_when_fts_query_fails(app, factory, seller):
+    factory.product(seller, name='Наручные часы', category_id=3)
+    assert search(app, 'час') == ['Наручные часы']  # таблица найдена и запомнена
+    with app.app_context():
+        with db.engine.begin() as conn:
+            conn.execute(text(f'DROP TABLE {FTS_TABLE}'))
+        assert search_index._fts_ready[db.engine] is True
+    assert search(app, 'учные') == ['Наручные часы']
+    assert search(app, 'учные') == ['Наручные часы']
+    with app.app_context():
+        assert search_index._fts_ready[db.engine] is False
+
+
+def test_search_reindex_rebuilds_the_table(app, factory, seller):
+    factory.product(seller, name='Наручные часы', category_id=3)
+    drop_fts(app)
+    with app.app_context():
+        # Core-вставка обходит события маппера
+        db.session.execute(insert(Product).values(
+            name='Карманные часы', price_cents=1000, category_id=3, seller_id=seller,
+        ))
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=['search-reindex', '--batch-size', '1'])
+    assert result.exit_code == 0, result.output
+    assert 'Поисковый индекс перестроен: 2 товаров' in result.output
+    assert search(app, 'час') == ['Карманные часы', 'Наручные часы']
+    assert search(app, 'учные') == []
@@ -0,0 +1,48 @@
+import os
+
+from sqlalchemy import text
+
+from models import db
+from startup import LazyGroup
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def db_group(app):
+    return app.cli.get_command(None, 'db')
+
+
+def test_db_group_loads_on_first_use(app):
+    group = db_group(app)
+    assert isinstance(group, LazyGroup)
+    assert group._group is None  # create_app() не импортирует flask_migrate
+
+    result = app.test_cli_runner().invoke(args=['db', '--help'])
+    assert result.exit_code == 0, result.output
+    assert 'upgrade' in result.output and 'downgrade' in result.output
+    assert group._group is not None
+
+
+def test_db_group_runs_its_own_options(app, monkeypatch, tmp_path):
+    # --directory разбирает колбэк настоящей группы: первый же вызов идёт
+    # через LazyGroup (потом Migrate() заменяет её в app.cli настоящей)
+    monkeypatch.chdir(tmp_path)
+    assert isinstance(db_group(app), LazyGroup)
+    result = app.test_cli_runner().invoke(args=['db', '--directory', os.path.join(ROOT, 'migrations'), 'stamp', 'head'])
+    assert result.exit_code == 0, result.output
+    with app.app_context():
+        assert db.session.execute(text('SELECT version_num FROM alembic_version')).scalar()
+
+
+def test_warm_templates_fills_bytecode_cache(app):
+    cache_dir = app.config['JINJA_CACHE_DIR']
+    for name in os.listdir(cache_dir):
+        os.remove(os.path.join(cache_dir, name))
+
+    result = app.test_cli_runner().invoke(args=['warm-templates'])
+    assert result.exit_code == 0, result.output
+    assert 'Скомпилировано шаблонов:' in result.output
+    count = int(result.output.split(':')[1].split()[0])
+    templates = [name for name in app.jinja_env.list_templates() if name.endswith('.html')]
+    assert count == len(templates) > 0
+    assert len(os.listdir(cache_dir)) == count
@@ -0,0 +1,41 @@
+import gzip
+import os
+
+import pytest
+
+from static_assets import serve
+
+
+@pytest.fixture
+def assets(tmp_path):
+    source = tmp_path / 'app.css'
+    source.write_text('body { color: red; }')
+    with gzip.open(str(source) + '.gz', 'wb') as out:
+        out.write(source.read_bytes())
+    return tmp_path
+
+
+def get(app, root, filename):
+    with app.test_request_context(headers={'Accept-Encoding': 'gzip, br'}):
+        response = serve(str(root), filename)
+        response.direct_passthrough = False
+        return response
+
+
+def test_precompressed_sibling_is_served(app, assets):
+    response = get(app, assets, 'app.css')
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.get_data()) == b'body { color: red; }'
+    assert 'Accept-Encoding' in response.vary
+
+
+def test_stale_sibling_falls_back_to_source(app, assets):
+    # Исходник поправили после assets-compress: .gz старше него
+    source = assets / 'app.css'
+    source.write_text('body { color: blue; }')
+    stale = os.stat(str(source) + '.gz').st_mtime_ns
+    os.utime(source, ns=(stale + 10 ** 9, stale + 10 ** 9))
+
+    response = get(app, assets, 'app.css')
+    assert 'Content-Encoding' not in response.headers
+    assert response.get_data() == b'body { color: blue; }'
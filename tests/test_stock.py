@@ -0,0 +1,162 @@
+import io
+import threading
+
+import pytest
+from PIL import Image
+from sqlalchemy.exc import OperationalError
+
+from models import db, CartItem, OrderItem, Product
+from orders import place_order
+import stock
+
+INITIAL = 20
+
+
+def png():
+    buffer = io.BytesIO()
+    Image.new('RGB', (4, 4), 'brown').save(buffer, 'PNG')
+    buffer.seek(0)
+    return buffer
+
+
+def stock_of(app, product_id):
+    with app.app_context():
+        return db.session.get(Product, product_id).stock
+
+
+def sell(app, user_id, product_id, quantity):
+    # Покупатель кладёт товар в корзину: резерв списывается из stock
+    with app.app_context():
+        stock.reserve(user_id, db.session.get(Product, product_id), quantity)
+        db.session.commit()
+
+
+@pytest.fixture
+def seller(app, factory, tmp_path):
+    app.static_folder = str(tmp_path / 'static')  # Загруженные картинки — во временный каталог
+    seller_id = factory.user('seller')
+    return seller_id, factory.login(app.test_client(), seller_id)
+
+
+def submit_edit(client, product_id, stock_seen, new_stock):
+    return client.post(f'/edit_product/{product_id}', data={
+        'name': 'Кожаный ремень', 'short_description': 'Ремень', 'long_description': 'Подробнее',
+        'price': '1000', 'stock': '' if new_stock is None else str(new_stock),
+        'stock_seen': '' if stock_seen is None else str(stock_seen),
+        'image': (png(), 'belt.png'),
+    }, content_type='multipart/form-data')
+
+
+def test_edit_form_remembers_shown_stock(app, factory, seller):
+    seller_id, client = seller
+    product_id = factory.product(seller_id, stock=7)
+    assert 'name="stock_seen" type="hidden" value="7"' in client.get(f'/edit_product/{product_id}').get_data(as_text=True)
+
+
+def test_edit_applies_difference_to_current_stock(app, factory, seller):
+    seller_id, client = seller
+    product_id = factory.product(seller_id, stock=10)
+    sell(app, factory.user('buyer'), product_id, 3)  # Пока форма открыта, купили 3 шт.
+
+    assert submit_edit(client, product_id, 10, 15).status_code == 302
+    assert stock_of(app, product_id) == 12
+
+
+def test_edit_that_would_oversell_is_rejected(app, factory, seller):
+    seller_id, client = seller
+    product_id = factory.product(seller_id, stock=10)
+    sell(app, factory.user('buyer'), product_id, 8)
+
+    response = submit_edit(client, product_id, 10, 5)
+    assert response.status_code == 200
+    assert 'Остаток изменился' in response.get_data(as_text=True)
+    assert stock_of(app, product_id) == 2
+
+
+@pytest.mark.parametrize('seen, current, new, expected, applied', [
+    (None, None, 5, 5, True),      # Начали учёт
+    (None, 3, 5, 3, False),        # Учёт начали в другом окне
+    (4, 4, None, None, True),      # Учёт выключили
+    (4, None, 6, None, False),     # Учёт выключили в другом окне
+    (4, 1, 4, 1, True),            # Ничего не меняли — остаток не трогаем
+])
+def test_adjust_untracked_stock(app, factory, seen, current, new, expected, applied):
+    product_id = factory.product(factory.user('seller'), stock=current)
+    with app.app_context():
+        assert stock.adjust(product_id, seen, new) is applied
+        db.session.commit()
+    assert stock_of(app, product_id) == expected
+
+
+def test_concurrent_buyers_and_seller_never_oversell(app, factory):
+    # Покупатели резервируют и оформляют заказы, продавец параллельно
+    # добавляет поставку. Ни одна единица не продана дважды и не потеряна.
+    product_id = factory.product(factory.user('seller'), stock=INITIAL)
+    buyers = [factory.user('buyer') for _ in range(12)]
+    restocked = []
+    start = threading.Barrier(len(buyers) + 1)
+
+    def buyer(user_id):
+        start.wait()
+        with app.app_context():
+            for _ in range(3):
+                try:
+                    stock.reserve(user_id, db.session.get(Product, product_id), 1)
+                    db.session.commit()
+                    place_order(user_id, {product_id: 1}, 'Москва', '+79991234567', 'M', 'buyer@example.com')
+                except (stock.OutOfStock, OperationalError):
+                    db.session.rollback()
+            db.session.remove()
+
+    def restock():
+        start.wait()
+        with app.app_context():
+            for _ in range(5):
+                seen = db.session.get(Product, product_id).stock
+                try:
+                    if stock.adjust(product_id, seen, seen + 2):
+                        db.session.commit()
+                        restocked.append(2)
+                    else:
+                        db.session.rollback()
+                except OperationalError:
+                    db.session.rollback()
+                db.session.expire_all()
+            db.session.remove()
+
+    threads = [threading.Thread(target=buyer, args=(user_id,)) for user_id in buyers]
+    threads.append(threading.Thread(target=restock))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    with app.app_context():
+        left = db.session.get(Product, product_id).stock
+        sold = db.session.query(db.func.coalesce(db.func.sum(OrderItem.quantity), 0)).scalar()
+        reserved = db.session.query(db.func.coalesce(db.func.sum(CartItem.reserved), 0)).scalar()
+    assert left >= 0
+    assert sold > 0
+    assert left + sold + reserved == INITIAL + sum(restocked)
+
+
+@pytest.mark.parametrize('app_config', [{'CATALOG_STATE_TTL': 0, 'CART_RESERVATION_TTL': 0}])
+def test_stock_changes_keep_catalog_validators(app, factory):
+    seller_id = factory.user('seller')
+    product_id = factory.product(seller_id, stock=10)
+    anonymous = app.test_client()
+    etags = {path: anonymous.get(path).headers['ETag'] for path in ('/', f'/product/{product_id}')}
+
+    user_id = factory.user('buyer')
+    with app.app_context():
+        stock.reserve(user_id, db.session.get(Product, product_id), 2)
+        stock.release_one(user_id, product_id)
+        stock.release_expired()  # CART_RESERVATION_TTL = 0: резерв уже истёк
+        stock.reserve(user_id, db.session.get(Product, product_id), 1)
+        place_order(user_id, {product_id: 1}, 'Москва', '+79991234567', 'M', 'buyer@example.com')
+        assert stock.adjust(product_id, 9, 12)
+        db.session.commit()
+    assert stock_of(app, product_id) == 12
+
+    for path, etag in etags.items():
+        assert anonymous.get(path, headers={'If-None-Match': etag}).status_code == 304
@@ -0,0 +1,74 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from models import db, Product
+from suggest import NameIndex, suggestions
+
+@pytest.fixture
+def app_config():
+    # Без фонового потока: индекс обновляется только commit'ами и refresh() в тесте
+    return {'SUGGEST_REFRESH_SECONDS': 0}
+
+
+def names(response):
+    return [item['name'] for item in response.get_json()['suggestions']]
+
+
+def test_word_prefixes_and_ranking():
+    index = NameIndex()
+    index.load([(1, 'Ремень кожаный'), (2, 'Кожаный ремень'), (3, 'Кожаный ремень'), (4, 'Чёрный ремень')])
+    assert index.suggest('кож рем') == [('Кожаный ремень', 2), ('Ремень кожаный', 1)]
+    assert index.suggest('рем') == [('Ремень кожаный', 1), ('Кожаный ремень', 2), ('Чёрный ремень', 1)]
+    assert index.suggest('черн') == [('Чёрный ремень', 1)]
+    assert index.suggest('кожа ') == []
+    assert index.suggest('!!') == []
+
+
+def test_remove_and_rename():
+    index = NameIndex()
+    index.load([(1, 'Кожаный ремень'), (2, 'Кожаный ремень')])
+    index.set(2, 'Замшевый ремень')
+    index.remove(1)
+    assert index.suggest('ремень') == [('Замшевый ремень', 1)]
+    assert index.products == 1
+
+
+def test_endpoint_follows_committed_changes(app, client, factory):
+    seller_id = factory.user('seller')
+    product_id = factory.product(seller_id, name='Кожаный ремень')
+    with app.app_context():
+        suggestions.rebuild()
+    assert names(client.get('/search/suggest?q=кож')) == ['Кожаный ремень']
+
+    factory.product(seller_id, name='Кожаная сумка')
+    with app.app_context():
+        db.session.get(Product, product_id).name = 'Замшевый ремень'
+        db.session.rollback()  # Откаченная правка в индекс не попадает
+        db.session.get(Product, product_id).name = 'Замшевый ремень'
+        db.session.commit()
+    assert names(client.get('/search/suggest?q=кож')) == ['Кожаная сумка']
+    assert names(client.get('/search/suggest?q=зам')) == ['Замшевый ремень']
+
+    with app.app_context():
+        db.session.delete(db.session.get(Product, product_id))
+        db.session.commit()
+    assert names(client.get('/search/suggest?q=зам')) == []
+    assert client.get('/search/suggest?q=').get_json()['suggestions'] == []
+
+
+def test_refresh_picks_up_writes_from_other_workers(app, client, factory):
+    product_id = factory.product(factory.user('seller'), name='Кожаный ремень')
+    with app.app_context():
+        suggestions.rebuild()
+    engine = create_engine(app.config['SQLALCHEMY_DATABASE_URI'])
+    with engine.begin() as conn:
+        conn.execute(text('UPDATE product SET name = :name, updated_at = :now WHERE id = :id'),
+                     {'name': 'Замшевый ремень', 'now': datetime.utcnow(), 'id': product_id})
+    engine.dispose()
+
+    assert names(client.get('/search/suggest?q=зам')) == []
+    with app.app_context():
+        assert suggestions.refresh()
+    assert names(client.get('/search/suggest?q=зам')) == ['Замшевый ремень']
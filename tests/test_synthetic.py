@@ -0,0 +1,63 @@
+from sqlalchemy import text
+
+from models import db, User, Product, Order, OrderItem
+from search_index import FTS_TABLE
+
+ARGS = ['seed-synthetic', '--users', '20', '--sellers', '3', '--products', '30', '--orders', '15', '--batch-size', '7']
+
+
+def scalar(sql):
+    return db.session.execute(text(sql)).scalar()
+
+
+def seed(app):
+    result = app.test_cli_runner().invoke(args=ARGS)
+    assert result.exit_code == 0, result.output
+    return dict(part.split(': ') for part in result.output.strip().split(', '))
+
+
+def test_seed_synthetic_row_counts_and_foreign_keys(app, factory):
+    factory.user('buyer')  # id генератора продолжают существующие
+    counts = seed(app)
+    assert {name: int(value) for name, value in counts.items() if name != 'order_items'} == {
+        'users': 20, 'sellers': 3, 'products': 30, 'orders': 15,
+    }
+
+    with app.app_context():
+        assert User.query.filter(User.email.like('buyer%@synthetic.test')).count() == 20
+        assert User.query.filter_by(role='seller').count() == 3
+        assert Product.query.count() == 30
+        assert Order.query.count() == 15
+        assert OrderItem.query.count() == int(counts['order_items'])
+        assert 15 <= OrderItem.query.count() <= 45
+
+        assert db.session.execute(text('PRAGMA foreign_key_check')).all() == []
+        assert scalar("SELECT count(*) FROM product p JOIN user u ON u.id = p.seller_id AND u.role = 'seller'") == 30
+        assert scalar('SELECT count(*) FROM product p JOIN category c ON c.id = p.category_id') == 30
+        assert scalar("SELECT count(*) FROM \"order\" o JOIN user u ON u.id = o.user_id AND u.role = 'buyer'") == 15
+        assert scalar('SELECT count(*) FROM order_item i JOIN product p ON p.id = i.product_id '
+                      'JOIN "order" o ON o.id = i.order_id WHERE i.price_cents = p.price_cents') \
+            == OrderItem.query.count()
+
+        # Индекс поиска и агрегаты продаж перестроены после Core-вставок
+        assert scalar(f'SELECT count(*) FROM {FTS_TABLE}') == 30
+        assert scalar('SELECT sum(units) FROM product_sales') == scalar('SELECT sum(quantity) FROM order_item')
+
+
+def test_seed_synthetic_appends_to_existing_data(app):
+    seed(app)
+    seed(app)
+    with app.app_context():
+        assert User.query.count() == 46
+        assert Product.query.count() == 60
+        assert Order.query.count() == 30
+        assert db.session.execute(text('PRAGMA foreign_key_check')).all() == []
+
+
+def test_synthetic_users_can_log_in(app, client):
+    seed(app)
+    with app.app_context():
+        email = User.query.filter_by(role='buyer').first().email
+    response = client.post('/login', data={'email': email, 'password': 'password'})
+    assert response.status_code == 302
+    assert client.get('/my_orders').status_code == 200